@@ -0,0 +1,104 @@
+import numpy as np
+from shared_subgraphs import SubgraphBundle
+from preprocessing import ChainContraction
+from demand import DemandMatrix
+
+# Группы поставщиков с одинаковой топологией подграфа и пропорциональным спросом.
+# Топология сравнивается без самого поставщика: узлы подграфа (маска без узла поставщика)
+# и соседи, к которым поставщик присоединён (с направлением ребра в ориентированном графе).
+# Спрос пропорционален, если совпадают доли спроса розничных точек в общем спросе поставщика.
+# Возвращает список групп — списков номеров строк graphs; поставщики без спроса не объединяются.
+def group_suppliers(graphs):
+    G = graphs.G
+    ptr, inc_edges, inc_nbrs = G.incidence()
+    groups = {}
+    totals = graphs.totals
+    for k, s in enumerate(graphs.suppliers.tolist()):
+        total = totals[k]
+        if total <= 0:
+            groups[k] = [k]
+            continue
+        core = graphs.node_mask[k].copy()
+        core[s] = False
+        edges = inc_edges[ptr[s]:ptr[s + 1]]
+        keep = graphs.edge_mask[k, edges]
+        outgoing = G.src[edges[keep]] == s if G.directed else np.ones(keep.sum(), dtype=bool)
+        attach = frozenset(zip(inc_nbrs[ptr[s]:ptr[s + 1]][keep].tolist(), outgoing.tolist()))
+        shares = np.where(graphs.rhs[k] > 0, graphs.rhs[k], 0) / total
+        key = (core.tobytes(), attach, np.round(shares, 9).tobytes())
+        groups.setdefault(key, []).append(k)
+    return list(groups.values())
+
+# Объединяет подграфы поставщиков по группам group_suppliers: каждая группа решается одной строкой.
+# Если объединять нечего, возвращает исходные подграфы.
+def aggregate_subgraphs(graphs):
+    groups = group_suppliers(graphs)
+    if len(groups) == len(graphs):
+        return graphs
+    return AggregatedBundle(graphs, groups)
+
+
+# Подграфы, в которых группа поставщиков с одинаковой топологией и пропорциональным спросом
+# представлена одной строкой: источники — все поставщики группы (каждый со своим объёмом),
+# спрос розничных точек — сумма спроса группы, проводимость — сумма проводимостей участников.
+# Проход по узлам, обновления потоков и дерево кратчайших путей при инициализации считаются
+# один раз на группу. expand() раскладывает решение группы по участникам пропорционально их спросу;
+# рёбра, инцидентные поставщику, несут только его собственный поток и переносятся как есть.
+# Это приближение: раскладка точна, если проводимости участников пропорциональны их спросу (тогда
+# обновление (D + |Q|) / 2 сохраняет пропорциональность). Начальные проводимости участников случайны
+# и независимы, поэтому на итерации 0 это не так; пропорциональны только потоки кратчайших путей,
+# которыми инициализация заменяет проводимость рёбер решения. Случайная часть затухает вдвое
+# за итерацию, и у сошедшегося решения, где проводимость равна модулю потока, расхождение пренебрежимо.
+class AggregatedBundle(SubgraphBundle):
+    def __init__(self, bundle, groups):
+        G = bundle.G
+        leaders = [members[0] for members in groups]
+        node_mask = np.array([bundle.node_mask[members].any(axis=0) for members in groups])
+        # спрос группы записывается на лидера: строки участников с заменённым поставщиком, повторы складываются
+        totals = bundle.totals
+        owner, targets, volumes = [], [], []
+        supply = []
+        for members in groups:
+            for k in members:
+                retail, volume = bundle.demand_data.row(bundle.s_ids[k])
+                owner.append(np.full(len(retail), bundle.s_ids[members[0]]))
+                targets.append(retail)
+                volumes.append(volume)
+            supply.append({int(bundle.suppliers[k]): totals[k] for k in members})
+        demand_data = DemandMatrix.from_entries(np.concatenate(owner), np.concatenate(targets), np.concatenate(volumes))
+        super().__init__(G, bundle.suppliers[leaders], node_mask, demand_data, bundle.reach, supply)
+        self.bundle = bundle
+        self.groups = groups
+
+        for g, members in enumerate(groups):
+            for name in ('flow', 'conductivity', 'prev_conductivity'):
+                getattr(self, name)[g] = getattr(bundle, name)[members].sum(axis=0)
+        self.fill('length', bundle.length[leaders], outside=1.0)
+        if bundle.chains is not None:
+            self.chains = ChainContraction(self)
+
+    # Сводит построчные значения участников к строкам групп (суммой)
+    def collapse(self, values):
+        return np.array([values[members].sum(axis=0) for members in self.groups])
+
+    # Раскладывает решение групп по исходным подграфам участников и возвращает их
+    def expand(self):
+        bundle = self.bundle
+        G = self.G
+        bundle.edge_mask &= G.active
+        totals = bundle.totals
+        for g, members in enumerate(self.groups):
+            total = sum(self.supply[g].values())
+            for k in members:
+                s = bundle.suppliers[k]
+                share = totals[k] / total
+                own = (G.src == s) | (G.dst == s)
+                scale = np.where(own, 1.0, share)
+                mask = bundle.edge_mask[k]
+                for name in ('flow', 'conductivity', 'prev_conductivity'):
+                    getattr(bundle, name)[k] = np.where(mask, getattr(self, name)[g] * scale, 0)
+                bundle.length[k] = np.where(mask, self.length[g], 1)
+                bundle.pressure[k] = self.pressure[g]
+        if bundle.chains is not None:
+            bundle.chains = ChainContraction(bundle)
+        return bundle
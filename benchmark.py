@@ -0,0 +1,159 @@
+# benchmark.py
+import argparse
+import contextlib
+import csv
+import importlib
+import json
+import os
+import random
+import time
+import warnings
+import numpy as np
+from scenarios import generate_scenario
+from validation import validate_flows
+from profiling import profile_run
+
+effective_distance_func = lambda Q: 5 + 3 * (2.718281828**(-0.3 * Q))
+EPSILON = 1e-2
+
+# Алгоритмы: имя → (модуль, функция, ориентированный граф, дополнительные параметры);
+# algorithm_utils без ограничения может не сойтись, поэтому число его итераций ограничено
+ALGORITHMS = {
+    'non_oriented_PPA': ('non_oriented_PPA', 'physarum_algorithm', False, {}),
+    'oriented_PPA': ('oriented_PPA', 'physarum_algorithm', True, {}),
+    'restricted_PPA': ('restricted_PPA', 'physarum_algorithm', True, {}),
+    'algorithm_utils_PPA': ('algorithm_utils', 'physarum_algorithm', False, {'max_iterations': 500}),
+    'non_oriented_ACO': ('non_oriented_ACO', 'aco_algorithm', False, {}),
+    'oriented_ACO': ('oriented_ACO', 'aco_algorithm', True, {}),
+    'restricted_ACO': ('restricted_ACO', 'aco_algorithm', True, {}),
+    'non_oriented_DJA': ('non_oriented_DJA', 'dijkstra_algorithm', False, {}),
+    'non_oriented_ASTAR': ('non_oriented_ASTAR', 'astar_algorithm', False, {}),
+}
+
+# Размеры сетей: поставщики × РЦ × розничные точки и плотности рёбер (параметры generate_scenario)
+SIZES = {
+    'tiny': [dict(n_suppliers=5, n_dcs=3, n_retailers=10)],
+    'small': [dict(n_suppliers=s, n_dcs=d, n_retailers=r, supplier_density=0.5, retail_density=0.5)
+              for s, d, r in ((10, 5, 20), (20, 5, 50), (50, 10, 100))],
+    'medium': [dict(n_suppliers=s, n_dcs=d, n_retailers=r, supplier_density=0.3, retail_density=0.3)
+               for s, d, r in ((100, 10, 100), (100, 20, 500), (200, 20, 1000))],
+    'large': [dict(n_suppliers=s, n_dcs=d, n_retailers=r, supplier_density=0.2, retail_density=0.1)
+              for s, d, r in ((200, 50, 5000), (500, 100, 20000))],
+}
+
+# Поля записи результата (порядок столбцов CSV)
+FIELDS = ('algorithm', 'n_suppliers', 'n_dcs', 'n_retailers', 'supplier_density', 'retail_density',
+          'n_nodes', 'n_edges', 'trial', 'seed', 'time', 'iterations', 'converged', 'peak_memory', 'peak_rss',
+          'supplier_error', 'consumer_error', 'max_relative_error', 'memory_breakdown', 'error')
+
+
+# memory=True — запуск под profile_run с учётом памяти; тогда вместо времени возвращается отчёт профилировщика
+def _solve(name, scenario, memory=False):
+    module, function, directed, extra = ALGORITHMS[name]
+    algo = getattr(importlib.import_module(module), function)
+    G = scenario.to_compact(directed=directed)
+    # вывод алгоритмов (построчные print) в замеры не попадает
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if memory:
+            return G, profile_run(algo, G, scenario, effective_distance_func, EPSILON, memory=True, **extra)[1]
+        start = time.perf_counter()
+        algo(G, scenario, effective_distance_func, EPSILON, **extra)
+        elapsed = time.perf_counter() - start
+    return G, elapsed
+
+# Разбивка памяти запуска: пик по фазам (байты) и размеры структур (gauges профилировщика)
+def memory_breakdown(report):
+    breakdown = {f"phase:{name}": m['peak'] for name, m in report['memory']['phases'].items()}
+    breakdown.update(report['gauges'])
+    return breakdown
+
+# Один запуск алгоритма name на сценарии seed: время, итерации, ошибка check.
+# memory=True — память в отдельном прогоне, чтобы трассировка не искажала время: пик tracemalloc,
+# пиковый RSS процесса (за всё время работы процесса, а не одного запуска) и разбивка по фазам и структурам.
+def run_trial(name, size, trial, seed, memory=True):
+    scenario = generate_scenario(**size, seed=seed)
+    record = {'algorithm': name, 'supplier_density': 1.0, 'retail_density': 1.0, **size,
+              'n_nodes': len(scenario.node_ids), 'n_edges': scenario.n_edges, 'trial': trial, 'seed': seed,
+              'time': None, 'iterations': None, 'converged': None, 'peak_memory': None, 'peak_rss': None,
+              'supplier_error': None, 'consumer_error': None, 'max_relative_error': None,
+              'memory_breakdown': None, 'error': None}
+    try:
+        random.seed(seed)
+        np.random.seed(seed)
+        G, record['time'] = _solve(name, scenario)
+        record['iterations'] = G.stats.get('iterations')
+        record['converged'] = G.stats.get('converged')
+        report = validate_flows(G, scenario)
+        record['supplier_error'] = report.supplier_error
+        record['consumer_error'] = report.consumer_error
+        record['max_relative_error'] = report.max_relative_error
+        if memory:
+            random.seed(seed)
+            np.random.seed(seed)
+            _, report = _solve(name, scenario, memory=True)
+            record['peak_memory'] = report['memory']['peak']
+            record['peak_rss'] = report['memory']['rss_peak']
+            record['memory_breakdown'] = memory_breakdown(report)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+# Прогон всех алгоритмов на всех размерах: trials запусков на сценариях с зёрнами seed, seed + 1, ...
+def run_benchmark(sizes, algorithms=tuple(ALGORITHMS), trials=3, seed=0, memory=True, verbose=True):
+    records = []
+    for size in sizes:
+        for name in algorithms:
+            for trial in range(trials):
+                record = run_trial(name, size, trial, seed + trial, memory)
+                records.append(record)
+                if verbose:
+                    print(f"{name:20s} {record['n_suppliers']}x{record['n_dcs']}x{record['n_retailers']} "
+                          f"E={record['n_edges']} trial {trial}: "
+                          + (record['error'] or f"{record['time']:.3f}s iterations={record['iterations']} "
+                                                f"error={record['supplier_error']:.3f}/{record['consumer_error']:.3f}"
+                                                + (f" peak={record['peak_memory'] / 2**20:.1f}MB" if record['peak_memory'] else '')))
+    return records
+
+def write_json(records, path):
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=1)
+
+def write_csv(records, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        # разбивка памяти — одна ячейка JSON
+        writer.writerows({**r, 'memory_breakdown': json.dumps(r['memory_breakdown']) if r['memory_breakdown'] else None}
+                         for r in records)
+
+# Размер из строки вида SxDxR или SxDxR:плотность_поставщиков:плотность_розницы
+def parse_size(text):
+    dims, *density = text.split(':')
+    s, d, r = (int(x) for x in dims.lower().split('x'))
+    size = dict(n_suppliers=s, n_dcs=d, n_retailers=r)
+    if density:
+        size['supplier_density'] = float(density[0])
+        size['retail_density'] = float(density[1] if len(density) > 1 else density[0])
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the routing algorithms')
+    parser.add_argument('--sizes', default='small', help=f"comma-separated presets ({', '.join(SIZES)}) or SxDxR[:density[:density]]")
+    parser.add_argument('--algorithms', default=','.join(ALGORITHMS), help='comma-separated algorithm names')
+    parser.add_argument('--trials', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the memory accounting run')
+    parser.add_argument('--json', help='write records to this JSON file')
+    parser.add_argument('--csv', help='write records to this CSV file')
+    args = parser.parse_args()
+
+    sizes = [size for item in args.sizes.split(',') for size in (SIZES[item] if item in SIZES else [parse_size(item)])]
+    records = run_benchmark(sizes, args.algorithms.split(','), args.trials, args.seed, not args.no_memory)
+    if args.json:
+        write_json(records, args.json)
+    if args.csv:
+        write_csv(records, args.csv)
+
+if __name__ == '__main__':
+    main()
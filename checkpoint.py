@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import numpy as np
+from shared_subgraphs import SUBGRAPH_EDGE_ATTRS
+
+# Изменяемое состояние подграфов, которое сохраняется в контрольной точке:
+# у PPA меняются потоки, проводимости, длины и давления, у ACO — только феромоны
+# (длины и эвристика муравьёв вычисляются заново при подготовке запуска).
+PPA_STATE = ('flow', 'conductivity', 'prev_conductivity', 'length', 'pressure')
+ACO_STATE = ('pheromone',)
+
+ALIGN = 64
+
+
+# Контрольная точка долгого запуска: каждые every итераций состояние решателя пишется на диск,
+# и запуск с тем же графом, спросом и параметрами продолжается с сохранённой итерации (resume=True).
+# Пишется только то, что меняется по ходу итераций: удалённые рёбра (упакованные биты G.active),
+# атрибуты подграфов (значения S × E — только на рёбрах между узлами подграфов), номер итерации,
+# состояния генераторов случайных чисел (numpy и random) и дополнительное состояние решателя
+# (лучшие решения ACO, счётчики удаления рёбер). Топология, маски и всё, что вычисляется
+# из графа и спроса, строятся заново при подготовке запуска, поэтому на диск не попадают.
+# Массивы лежат в файле path, который отображается в память (np.memmap) и обновляется на месте:
+# их размеры не меняются за запуск, поэтому файл не переписывается целиком. В файле два слота,
+# сохранения пишутся в них поочерёдно; метаданные (номер итерации, действующий слот, расположение
+# массивов, состояния ГСЧ, дополнительное состояние) — JSON в файле path + '.json', который
+# атомарно заменяется после записи слота. Прерванная запись портит только неактивный слот,
+# а загрузка не исполняет кода из файла (в отличие от pickle).
+class Checkpoint:
+    def __init__(self, path, every=10, resume=True):
+        self.path = path
+        self.meta_path = path + '.json'
+        self.every = every
+        self.resume = resume
+        self._state = None
+        self._slot = 0
+
+    # Пора ли сохранять состояние после итерации iteration
+    def due(self, iteration):
+        return iteration % self.every == 0
+
+    # Сохраняет состояние после итерации iteration: атрибуты attrs подграфов graphs и extra
+    # (небольшие значения: числа, строки, списки, кортежи, словари, массивы NumPy).
+    # solver — имя решателя для проверки при загрузке.
+    def save(self, graphs, solver, iteration, attrs, **extra):
+        G = graphs.G
+        arrays = {'active': np.packbits(G.active)}
+        for name in attrs:
+            arrays[name] = np.ascontiguousarray(_pack(graphs, name))
+        table, size = {}, 0
+        for name, a in arrays.items():
+            table[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': size}
+            size = _align(size + a.nbytes)
+        state = self._open(2 * size)
+        base = self._slot * size
+        for name, a in arrays.items():
+            offset = base + table[name]['offset']
+            state[offset:offset + a.nbytes] = a.reshape(-1).view(np.uint8)
+        state.flush()
+        meta = {'solver': solver, 'iteration': iteration, 'n_edges': G.n_edges, 's_ids': _encode(graphs.s_ids),
+                'attrs': list(attrs), 'slot': self._slot, 'slot_size': size, 'arrays': table,
+                'numpy_rng': _encode(np.random.get_state()), 'python_rng': _encode(random.getstate()),
+                'extra': _encode(extra)}
+        tmp = self.meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+        self._slot = 1 - self._slot
+
+    # Файл состояния размера size, открытый для записи. Файл прежнего размера (продолжаемый запуск)
+    # открывается как есть, и запись идёт в слот, не занятый последним сохранением; файл другого размера
+    # создаётся заново, а прежние метаданные, которые к нему уже не подходят, удаляются.
+    def _open(self, size):
+        if self._state is not None and self._state.size == size:
+            return self._state
+        if os.path.exists(self.path) and os.path.getsize(self.path) == size:
+            self._state = np.memmap(self.path, dtype=np.uint8, mode='r+')
+            if os.path.exists(self.meta_path):
+                with open(self.meta_path) as f:
+                    self._slot = 1 - json.load(f)['slot']
+        else:
+            if os.path.exists(self.meta_path):
+                os.remove(self.meta_path)
+            self._state = np.memmap(self.path, dtype=np.uint8, mode='w+', shape=(size,))
+            self._slot = 0
+        return self._state
+
+    # Восстанавливает сохранённое состояние в только что подготовленные подграфы graphs.
+    # Рёбра, удалённые к моменту сохранения, удаляются функцией remove_edges (по умолчанию
+    # graphs.remove_edges), чтобы вместе с ними обновились зависимые индексы.
+    # Возвращает номер сохранённой итерации и словарь extra; без файла (или при resume=False) — (0, None).
+    def restore(self, graphs, solver, remove_edges=None):
+        if not self.resume or not os.path.exists(self.meta_path):
+            return 0, None
+        G = graphs.G
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta['solver'] != solver or meta['n_edges'] != G.n_edges or _decode(meta['s_ids']) != graphs.s_ids:
+            raise ValueError(f"Checkpoint {self.path} does not match this run")
+        state = np.memmap(self.path, dtype=np.uint8, mode='r')
+        base = meta['slot'] * meta['slot_size']
+
+        def array(name):
+            spec = meta['arrays'][name]
+            return np.ndarray(spec['shape'], dtype=spec['dtype'], buffer=state, offset=base + spec['offset'])
+        active = np.unpackbits(array('active'), count=G.n_edges).astype(bool)
+        removed = np.flatnonzero(G.active & ~active)
+        if len(removed):
+            (remove_edges or graphs.remove_edges)(removed)
+        for name in meta['attrs']:
+            _unpack(graphs, name, array(name))
+        np.random.set_state(_decode(meta['numpy_rng']))
+        random.setstate(_decode(meta['python_rng']))
+        return meta['iteration'], _decode(meta['extra'])
+
+# Контрольная точка из аргумента checkpoint решателя: Checkpoint, путь к файлу или None
+def as_checkpoint(checkpoint):
+    if checkpoint is None or isinstance(checkpoint, Checkpoint):
+        return checkpoint
+    return Checkpoint(checkpoint)
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+# Маска значений атрибута рёбер в файле: рёбра между узлами подграфа. В отличие от edge_mask она
+# не меняется при удалении рёбер, поэтому размеры массивов постоянны за весь запуск; на удалённых
+# рёбрах значения нейтральные и при загрузке остаются такими же.
+def _stored_edges(graphs):
+    G = graphs.G
+    return graphs.node_mask[:, G.src] & graphs.node_mask[:, G.dst]
+
+# Значения атрибута для файла: у атрибутов рёбер (S × E) — только на рёбрах подграфов, остальные целиком
+def _pack(graphs, name):
+    values = getattr(graphs, name)
+    return values[_stored_edges(graphs)] if name in SUBGRAPH_EDGE_ATTRS else values
+
+def _unpack(graphs, name, values):
+    target = getattr(graphs, name)
+    if name not in SUBGRAPH_EDGE_ATTRS:
+        target[:] = values
+        return
+    stored = _stored_edges(graphs)
+    if len(values) != np.count_nonzero(stored):
+        raise ValueError("Checkpoint does not match the subgraphs of this run")
+    target[stored] = values
+
+# Значение для JSON с сохранением типов: кортежи, словари с нестроковыми ключами и массивы NumPy
+# помечаются, скаляры NumPy становятся числами Python. _decode восстанавливает исходные значения.
+def _encode(value):
+    if isinstance(value, dict):
+        return {'__dict__': [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return {'__array__': value.tolist(), 'dtype': value.dtype.str, 'shape': list(value.shape)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__dict__' in value:
+        return {_decode(k): _decode(v) for k, v in value['__dict__']}
+    if '__tuple__' in value:
+        return tuple(_decode(v) for v in value['__tuple__'])
+    return np.array(value['__array__'], dtype=value['dtype']).reshape(value['shape'])
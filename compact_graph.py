@@ -0,0 +1,285 @@
+import copy
+import functools
+import heapq
+import numpy as np
+import networkx as nx
+
+# Типы узлов хранятся кодами int8 в порядке этого кортежа
+NODE_TYPES = ('supplier', 'dc', 'retail')
+TYPE_CODE = {t: code for code, t in enumerate(NODE_TYPES)}
+
+# Атрибуты рёбер, которые хранятся типизированными массивами float64
+EDGE_ATTRS = ('flow', 'length', 'conductivity', 'pheromone')
+
+
+# Компактное представление графа для горячих циклов.
+# Идентификаторы узлов (10001, 1001, ...) заменяются индексами 0..V-1,
+# рёбра хранятся массивами src/dst, смежность — в CSR (исходящие рёбра) и CSC (входящие рёбра),
+# атрибуты рёбер — массивами NumPy длины E. Рёбра, удалённые алгоритмом, помечаются в маске active.
+# Строится один раз из результата create_graph и конвертируется обратно в networkx для draw_graph и check.
+# adjacency — готовые массивы (out_ptr, out_edges, in_ptr, in_edges), например из файла сети (network_file);
+# без них CSR/CSC строятся по src/dst.
+class CompactGraph:
+    def __init__(self, node_ids, node_type, src, dst, directed=True, edge_attrs=None, adjacency=None):
+        self.node_ids = np.asarray(node_ids)
+        self._index = None
+        self._sorted_ids = None
+        self.node_type = np.asarray(node_type, dtype=np.int8)
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.directed = directed
+        self.n_nodes = len(self.node_ids)
+        self.n_edges = len(self.src)
+        self.active = np.ones(self.n_edges, dtype=bool)
+        self.edge_attrs = {name: np.zeros(self.n_edges) for name in EDGE_ATTRS}
+        for name, values in (edge_attrs or {}).items():
+            self.edge_attrs[name] = np.asarray(values, dtype=np.float64)
+        self._edge_index = None
+        self._incidence = None
+        self._walk = None
+        # счётчики последнего запуска алгоритма (число итераций и т. п.)
+        self.stats = {}
+        if adjacency is None:
+            self._build_adjacency()
+        else:
+            self.out_ptr, self.out_edges, self.in_ptr, self.in_edges = adjacency
+
+    # Индекс узла по идентификатору; словарь строится при первом обращении
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {node: i for i, node in enumerate(self.node_ids.tolist())}
+        return self._index
+
+    # Индексы узлов для массива идентификаторов (векторно); -1 — такого узла нет
+    def indices(self, ids):
+        if self._sorted_ids is None:
+            order = np.argsort(self.node_ids, kind='stable')
+            self._sorted_ids = (self.node_ids[order], order)
+        keys, order = self._sorted_ids
+        ids = np.asarray(ids)
+        if not len(keys):
+            return np.full(ids.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+        return np.where(keys[pos] == ids, order[pos], -1)
+
+    # CSR: рёбра, выходящие из узла i, — out_edges[out_ptr[i]:out_ptr[i + 1]];
+    # CSC: рёбра, входящие в узел i, — in_edges[in_ptr[i]:in_ptr[i + 1]].
+    def _build_adjacency(self):
+        n = self.n_nodes
+        self.out_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.src, minlength=n), out=self.out_ptr[1:])
+        self.out_edges = np.argsort(self.src, kind='stable').astype(np.int32)
+        self.in_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.dst, minlength=n), out=self.in_ptr[1:])
+        self.in_edges = np.argsort(self.dst, kind='stable').astype(np.int32)
+
+    @classmethod
+    def from_networkx(cls, G, attrs=EDGE_ATTRS):
+        node_ids = list(G.nodes)
+        index = {node: i for i, node in enumerate(node_ids)}
+        node_type = [TYPE_CODE.get(t, TYPE_CODE['dc']) for _, t in G.nodes(data='type')]
+        edges = list(G.edges(data=True))
+        src = [index[u] for u, _, _ in edges]
+        dst = [index[v] for _, v, _ in edges]
+        edge_attrs = {name: [d.get(name, 0.0) for _, _, d in edges] for name in attrs}
+        return cls(node_ids, node_type, src, dst, G.is_directed(), edge_attrs)
+
+    # Строит networkx-граф из активных рёбер с атрибутами attrs
+    def to_networkx(self, attrs=EDGE_ATTRS):
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        ids = self.node_ids.tolist()
+        for code, t in enumerate(NODE_TYPES):
+            G.add_nodes_from([ids[i] for i in np.flatnonzero(self.node_type == code)], type=t)
+        values = {name: self.edge_attrs[name].tolist() for name in attrs}
+        for e in np.flatnonzero(self.active).tolist():
+            G.add_edge(ids[self.src[e]], ids[self.dst[e]], **{name: values[name][e] for name in attrs})
+        return G
+
+    # Записывает атрибуты рёбер в исходный networkx-граф и удаляет из него неактивные рёбра
+    def push_networkx(self, G, attrs=('flow',)):
+        ids = self.node_ids.tolist()
+        src, dst = self.src.tolist(), self.dst.tolist()
+        values = {name: self.edge_attrs[name].tolist() for name in attrs}
+        removed = []
+        for e, alive in enumerate(self.active.tolist()):
+            u, v = ids[src[e]], ids[dst[e]]
+            if not alive:
+                removed.append((u, v))
+                continue
+            data = G.edges[u, v]
+            for name in attrs:
+                data[name] = values[name][e]
+        G.remove_edges_from(removed)
+
+    # Читает атрибуты рёбер из networkx-графа; рёбра, которых в нём нет, становятся неактивными
+    def pull_networkx(self, G, attrs=('flow',)):
+        ids = self.node_ids.tolist()
+        for e, (i, j) in enumerate(zip(self.src.tolist(), self.dst.tolist())):
+            if not G.has_edge(ids[i], ids[j]):
+                self.active[e] = False
+                continue
+            data = G.edges[ids[i], ids[j]]
+            for name in attrs:
+                self.edge_attrs[name][e] = data.get(name, 0.0)
+
+    # Оверлей графа для отдельного запуска алгоритма вместо G.copy(): топология (узлы, рёбра, смежность)
+    # и построенные по ней индексы общие с этим графом и доступны только для чтения, а маска active
+    # и атрибуты рёбер — собственные копии текущих значений. Алгоритм меняет только массивы оверлея,
+    # поэтому несколько алгоритмов на одном графе занимают память одной топологии плюс по E значений
+    # атрибутов и маске на запуск; networkx-граф строится только при необходимости (to_networkx, draw_graph).
+    def overlay(self):
+        # индексы смежности строятся один раз здесь и переходят во все оверлеи
+        self.index
+        self.incidence()
+        self.walk_adjacency()
+        view = copy.copy(self)
+        for name in ('node_ids', 'node_type', 'src', 'dst', 'out_ptr', 'out_edges', 'in_ptr', 'in_edges'):
+            values = getattr(self, name).view()
+            values.flags.writeable = False
+            setattr(view, name, values)
+        view.active = self.active.copy()
+        view.edge_attrs = {name: values.copy() for name, values in self.edge_attrs.items()}
+        view.stats = {}
+        return view
+
+    # Номер ребра по исходным идентификаторам узлов (для неориентированного графа порядок не важен)
+    def edge_id(self, u, v):
+        if self._edge_index is None:
+            self._edge_index = {(i, j): e for e, (i, j) in enumerate(zip(self.src.tolist(), self.dst.tolist()))}
+            if not self.directed:
+                self._edge_index.update({(j, i): e for (i, j), e in list(self._edge_index.items())})
+        return self._edge_index[self.index[u], self.index[v]]
+
+    # Рёбра, выходящие из узла i (индекс)
+    def out_of(self, i):
+        return self.out_edges[self.out_ptr[i]:self.out_ptr[i + 1]]
+
+    # Рёбра, входящие в узел i (индекс)
+    def in_of(self, i):
+        return self.in_edges[self.in_ptr[i]:self.in_ptr[i + 1]]
+
+    # Индексы узлов заданного типа
+    def nodes_of_type(self, t):
+        return np.flatnonzero(self.node_type == TYPE_CODE[t])
+
+    # Все рёбра, инцидентные узлу (и входящие, и исходящие), и соседи по ним:
+    # рёбра узла i — inc_edges[inc_ptr[i]:inc_ptr[i + 1]], соседи — inc_nbrs в тех же позициях.
+    def incidence(self):
+        if self._incidence is None:
+            ends = np.concatenate([self.src, self.dst])
+            others = np.concatenate([self.dst, self.src])
+            edges = np.concatenate([np.arange(self.n_edges), np.arange(self.n_edges)])
+            order = np.argsort(ends, kind='stable')
+            ptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(ends, minlength=self.n_nodes), out=ptr[1:])
+            self._incidence = (ptr, edges[order].astype(np.int32), others[order].astype(np.int32))
+        return self._incidence
+
+    # Смежность для обхода путей: для каждого узла пара массивов (рёбра, соседи).
+    # В ориентированном графе — только исходящие рёбра, в неориентированном — все инцидентные.
+    def walk_adjacency(self):
+        if self._walk is None:
+            if self.directed:
+                ptr, edges = self.out_ptr, self.out_edges
+                nbrs = self.dst[edges]
+            else:
+                ptr, edges, nbrs = self.incidence()
+            self._walk = [(edges[ptr[i]:ptr[i + 1]], nbrs[ptr[i]:ptr[i + 1]]) for i in range(self.n_nodes)]
+        return self._walk
+
+    @property
+    def nbytes(self):
+        arrays = [self.node_ids, self.node_type, self.src, self.dst, self.active,
+                  self.out_ptr, self.out_edges, self.in_ptr, self.in_edges, *self.edge_attrs.values()]
+        return sum(a.nbytes for a in arrays)
+
+
+# Дерево кратчайших путей из source (индекс узла или несколько индексов) по рёбрам с весами weights
+# (массив длины E), разрешённым маской edge_mask. Возвращает расстояния и ребро-предшественник для каждого узла (-1 — нет).
+# С target поиск останавливается, как только до target найден кратчайший путь: дерево тогда строится
+# только для узлов не дальше target, а остальные расстояния лишь оценки сверху.
+def shortest_path_tree(G, source, weights, edge_mask, target=None):
+    dist = np.full(G.n_nodes, np.inf)
+    pred = np.full(G.n_nodes, -1, dtype=np.int64)
+    sources = np.atleast_1d(source).tolist()
+    dist[sources] = 0.0
+    adjacency = G.walk_adjacency()
+    heap = [(0.0, s) for s in sources]
+    done = np.zeros(G.n_nodes, dtype=bool)
+    while heap:
+        d, i = heapq.heappop(heap)
+        if done[i]:
+            continue
+        if i == target:
+            break
+        done[i] = True
+        edges, nbrs = adjacency[i]
+        allowed = edge_mask[edges]
+        for e, j, w in zip(edges[allowed].tolist(), nbrs[allowed].tolist(), weights[edges[allowed]].tolist()):
+            alt = d + w
+            if alt < dist[j]:
+                dist[j] = alt
+                pred[j] = e
+                heapq.heappush(heap, (alt, j))
+    return dist, pred
+
+# Рёбра пути source → target по дереву предшественников; None, если target недостижим.
+# source — индекс узла или несколько индексов (путь начинается в одном из них).
+def tree_path(G, pred, source, target):
+    sources = set(np.atleast_1d(source).tolist())
+    path = []
+    node = target
+    while node not in sources:
+        e = pred[node]
+        if e < 0:
+            return None
+        path.append(int(e))
+        node = G.src[e] if G.dst[e] == node else G.dst[e]
+    path.reverse()
+    return path
+
+# networkx-представление графа: CompactGraph конвертируется, networkx-граф возвращается как есть
+def as_networkx(G):
+    return G.to_networkx() if isinstance(G, CompactGraph) else G
+
+# Точка входа алгоритма: алгоритм принимает и networkx-граф, и CompactGraph.
+# native — представление, на котором алгоритм работает внутри. Если на вход пришло другое,
+# граф конвертируется, а после работы поток и удалённые рёбра переносятся обратно во входной граф.
+# Это только преобразование на границе и само по себе ничего не ускоряет: выигрыш дают сами алгоритмы
+# с native='compact' (PPA, ACO, Dijkstra, A*, multilevel), которые работают на массивах.
+def solver_entry(native='networkx'):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(G, *args, **kwargs):
+            if native == 'networkx' and isinstance(G, CompactGraph):
+                nx_graph = G.to_networkx()
+                result = func(nx_graph, *args, **kwargs)
+                G.pull_networkx(nx_graph)
+                G.stats.update(nx_graph.graph.get('stats', {}))
+                return G if result is nx_graph else result
+            if native == 'compact' and not isinstance(G, CompactGraph):
+                compact = CompactGraph.from_networkx(G)
+                result = func(compact, *args, **kwargs)
+                compact.push_networkx(G)
+                G.graph['stats'] = compact.stats
+                return G if result is compact else result
+            return func(G, *args, **kwargs)
+        return wrapper
+    return decorate
+
+# Точка входа генератора итераций (physarum_iter, aco_iter), который работает на CompactGraph.
+# networkx-граф конвертируется, а при завершении генератора — в том числе досрочном, когда потребитель
+# прекратил перебор, — поток, удалённые рёбра и stats переносятся обратно во входной граф.
+def solver_iter(func):
+    @functools.wraps(func)
+    def wrapper(G, *args, **kwargs):
+        if isinstance(G, CompactGraph):
+            return (yield from func(G, *args, **kwargs))
+        compact = CompactGraph.from_networkx(G)
+        try:
+            return (yield from func(compact, *args, **kwargs))
+        finally:
+            compact.push_networkx(G)
+            G.graph['stats'] = compact.stats
+    return wrapper
@@ -0,0 +1,121 @@
+from collections.abc import Mapping
+import numpy as np
+
+
+# Разреженная матрица спроса поставщик × розничная точка в формате CSR:
+# спрос поставщика suppliers[k] к узлам retail[ptr[k]:ptr[k + 1]] с объёмами volume[ptr[k]:ptr[k + 1]].
+# Суммы по строкам (весь спрос поставщика) и по столбцам (весь спрос к розничной точке) считаются один раз.
+# Работает как словарь {поставщик: {розничная точка: объём}} (словарь строки собирается при обращении),
+# по словарю спроса (from_dict) хранятся все указанные пары, в том числе с нулевым объёмом: ACO, как и раньше,
+# строит пути и к таким точкам; from_dense и from_entries нулевых объёмов не хранят.
+# поэтому принимается везде, где раньше передавался demand_data. Массивы могут быть отображены в память
+# (network_file), так что одну матрицу без копирования разделяют несколько процессов.
+class DemandMatrix(Mapping):
+    def __init__(self, suppliers, ptr, retail, volume):
+        self.suppliers = np.asarray(suppliers)
+        self.ptr = np.asarray(ptr, dtype=np.int64)
+        self.retail = np.asarray(retail)
+        self.volume = np.asarray(volume, dtype=np.float64)
+        self._row = {s: k for k, s in enumerate(self.suppliers.tolist())}
+        # целые объёмы отдаются целыми, как в исходных словарях
+        self._integral = bool(np.all(self.volume == np.round(self.volume)))
+        self._supplier_totals = None
+        self._retail_totals = None
+
+    @classmethod
+    def from_dict(cls, demand_data):
+        suppliers = list(demand_data)
+        rows = [list(demand_data[s].items()) for s in suppliers]
+        ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in rows], out=ptr[1:])
+        retail = [r for row in rows for r, _ in row]
+        volume = [v for row in rows for _, v in row]
+        return cls(suppliers, ptr, retail, volume)
+
+    # Матрица из плотного массива S × R (нулевые элементы не хранятся)
+    @classmethod
+    def from_dense(cls, suppliers, retail, matrix):
+        matrix = np.asarray(matrix)
+        rows, cols = np.nonzero(matrix)
+        ptr = np.zeros(len(suppliers) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(suppliers)), out=ptr[1:])
+        return cls(suppliers, ptr, np.asarray(retail)[cols], matrix[rows, cols])
+
+    # Матрица из троек (поставщик, розничная точка, объём); объёмы повторяющихся пар складываются
+    @classmethod
+    def from_entries(cls, suppliers, retail, volume):
+        suppliers, retail = np.asarray(suppliers), np.asarray(retail)
+        s_ids, rows = np.unique(suppliers, return_inverse=True)
+        r_ids, cols = np.unique(retail, return_inverse=True)
+        keys, inverse = np.unique(rows.ravel() * len(r_ids) + cols.ravel(), return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=volume, minlength=len(keys))
+        keys, summed = keys[summed != 0], summed[summed != 0]
+        ptr = np.zeros(len(s_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // len(r_ids), minlength=len(s_ids)), out=ptr[1:])
+        return cls(s_ids, ptr, r_ids[keys % len(r_ids)], summed)
+
+    # Массивы строки поставщика: (розничные точки, объёмы); пустые, если поставщика нет
+    def row(self, supplier):
+        k = self._row.get(supplier)
+        if k is None:
+            return self.retail[:0], self.volume[:0]
+        a, b = self.ptr[k], self.ptr[k + 1]
+        return self.retail[a:b], self.volume[a:b]
+
+    def __getitem__(self, supplier):
+        if supplier not in self._row:
+            raise KeyError(supplier)
+        retail, volume = self.row(supplier)
+        volume = volume.astype(np.int64) if self._integral else volume
+        return dict(zip(retail.tolist(), volume.tolist()))
+
+    def __iter__(self):
+        return iter(self._row)
+
+    def __len__(self):
+        return len(self._row)
+
+    def __contains__(self, supplier):
+        return supplier in self._row
+
+    @property
+    def nnz(self):
+        return len(self.volume)
+
+    # Весь спрос каждого поставщика (в порядке suppliers)
+    @property
+    def supplier_totals(self):
+        if self._supplier_totals is None:
+            cumulative = np.concatenate([[0.0], np.cumsum(self.volume)])
+            self._supplier_totals = cumulative[self.ptr[1:]] - cumulative[self.ptr[:-1]]
+        return self._supplier_totals
+
+    # Розничные точки и весь спрос к каждой из них
+    @property
+    def retail_totals(self):
+        if self._retail_totals is None:
+            ids, inverse = np.unique(self.retail, return_inverse=True)
+            self._retail_totals = (ids, np.bincount(inverse, weights=self.volume, minlength=len(ids)))
+        return self._retail_totals
+
+    # Весь спрос поставщика
+    def total(self, supplier):
+        k = self._row.get(supplier)
+        if k is None:
+            return 0
+        total = self.supplier_totals[k]
+        return int(total) if self._integral else float(total)
+
+    def csr(self):
+        return self.suppliers, self.ptr, self.retail, self.volume
+
+    def to_dict(self):
+        return {s: self[s] for s in self}
+
+# Приводит спрос к DemandMatrix: словарь словарей, DemandMatrix или объект с методом csr()
+def as_demand(demand_data):
+    if isinstance(demand_data, DemandMatrix):
+        return demand_data
+    if hasattr(demand_data, 'csr'):
+        return DemandMatrix(*demand_data.csr())
+    return DemandMatrix.from_dict(demand_data)
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+# Общий поток по рёбрам графа как сумма потоков подграфов поставщиков.
+# total — сам массив G.edge_attrs['flow'] (обновляется на месте); при positive=True суммируются
+# только положительные потоки строк, иначе потоки со знаком.
+# При incremental=True (ACO) хранится contrib — вклад каждой строки (S × E): update(rows) пересчитывает
+# вклад изменившихся строк и добавляет к total только разницу, add(k, edges, volume) добавляет поток
+# строке k на отдельных рёбрах и меняет total лишь на них. PPA меняет все строки на каждой итерации
+# и пересчитывает total целиком (update()), поэтому создаёт агрегатор с incremental=False —
+# без contrib и без лишнего массива S × E.
+# При удалении рёбер из подграфов (SubgraphBundle.remove_edges) их вклад обнуляется через drop.
+# В networkx поток переносится только при выходе из алгоритма (solver_entry) или по to_networkx.
+class FlowAggregator:
+    def __init__(self, graphs, positive=True, incremental=True):
+        self.graphs = graphs
+        self.positive = positive
+        self.total = graphs.G.edge_attrs['flow']
+        self.contrib = np.zeros(graphs.flow.shape) if incremental else None
+        graphs.aggregator = self
+        self.update()
+
+    def _part(self, flow):
+        return np.where(flow > 0, flow, 0) if self.positive else np.array(flow, dtype=float)
+
+    # Пересчитывает вклад строк rows (по умолчанию всех) по текущим graphs.flow;
+    # без contrib доступен только полный пересчёт
+    def update(self, rows=None):
+        if self.contrib is None:
+            if rows is not None:
+                raise ValueError("Row updates need an incremental FlowAggregator")
+            if self.positive:
+                self.total[:] = self._part(self.graphs.flow).sum(axis=0)
+            else:
+                self.graphs.flow.sum(axis=0, out=self.total)
+        elif rows is None:
+            self.contrib[:] = self._part(self.graphs.flow)
+            self.total[:] = self.contrib.sum(axis=0)
+        else:
+            rows = np.atleast_1d(rows)
+            new = self._part(self.graphs.flow[rows])
+            self.total += (new - self.contrib[rows]).sum(axis=0)
+            self.contrib[rows] = new
+        return self.total
+
+    # Добавляет поток volume строке k на рёбрах edges (повторы рёбер складываются)
+    def add(self, k, edges, volume):
+        edges = np.asarray(edges, dtype=np.int64)
+        np.add.at(self.graphs.flow[k], edges, volume)
+        touched = np.unique(edges)
+        new = self._part(self.graphs.flow[k, touched])
+        self.total[touched] += new - self.contrib[k, touched]
+        self.contrib[k, touched] = new
+
+    # Обнуляет вклад удалённых рёбер
+    def drop(self, edges):
+        if self.contrib is not None:
+            self.contrib[:, edges] = 0
+        self.total[edges] = 0
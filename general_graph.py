@@ -1,41 +1,38 @@
 import networkx as nx
 import matplotlib.pyplot as plt
-import random
-
-# Узлы
-suppliers_nodes_list = list(range(10001,10101))
-dc_nodes_list = list(range(101, 111))
-retail_nodes_list = list(range(1001, 1101))
-
-# Рёбра
-edgelist = []
-
-# 1) Поставщики -> все DC
-for supplier in suppliers_nodes_list:
-    for dc in dc_nodes_list:
-        edgelist.append((supplier, dc))
-
-# 2) DC -> все DC (полносвязь с обоих направлений, кроме самих себя)
-for i, dc1 in enumerate(dc_nodes_list):
-    for dc2 in dc_nodes_list:
-        if dc1 != dc2:
-            edgelist.append((dc1, dc2))
-
-# 3) DC -> все ритейлы
-for dc in dc_nodes_list:
-    for retail in retail_nodes_list:
-        edgelist.append((dc, retail))
-
-# Создаём ориентированный граф
-G = nx.DiGraph()
-G.add_nodes_from(suppliers_nodes_list + dc_nodes_list + retail_nodes_list)
-G.add_edges_from(edgelist)
-
-# --- Спрос (без рандома) ---
-# Например, все поставщики требуют у всех ритейлов 10 единиц
-demand_data = {}
-for supplier in suppliers_nodes_list:
-    demand_data[supplier] = {retail: random.randint(1, 100) for retail in retail_nodes_list}
+from scenarios import preset
+from validation import validate_flows
+
+# Экземпляр по умолчанию — пресет 'general' генератора сценариев (scenarios.py):
+# 100 поставщиков → все 10 РЦ, полносвязные РЦ, РЦ → все 100 розничных точек, спрос от 1 до 100.
+# Он строится при первом обращении к suppliers_nodes_list, dc_nodes_list, retail_nodes_list,
+# edgelist, demand_data или G, а не при импорте, и с фиксированным зерном SEED одинаков при каждом запуске.
+PRESET = 'general'
+SEED = 0
+
+_scenario = None
+_LAZY = ('suppliers_nodes_list', 'dc_nodes_list', 'retail_nodes_list', 'edgelist', 'demand_data', 'G')
+
+def scenario():
+    global _scenario
+    if _scenario is None:
+        _scenario = preset(PRESET, seed=SEED)
+    return _scenario
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    sc = scenario()
+    if name == 'G':
+        # ориентированный граф без атрибутов, как раньше
+        value = nx.DiGraph()
+        value.add_nodes_from(sc.node_ids.tolist())
+        value.add_edges_from(sc.edgelist)
+    else:
+        value = getattr(sc, name)
+    # значение запоминается в модуле, следующие обращения идут мимо __getattr__
+    globals()[name] = value
+    return value
 
 # suppliers_nodes_list = [1, 2, 3, 4, 5, 6, 7]
 # dc_nodes_list = [11, 12, 13]
@@ -99,48 +96,8 @@ def spread(nodes, y, shift=1, margin=0.05):
         for i, node in enumerate(nodes)
     }
 
-def check(G):
-    node_types = dict(G.nodes(data='type'))
-
-    supplier_total_flow = {}
-    consumer_total_flow = {}
-
-    for u, v, data in G.edges(data=True):
-        flow = data.get('flow', 0)
-        if node_types.get(u) == 'supplier':          # u → ...
-            supplier_total_flow[u] = supplier_total_flow.get(u, 0) + flow
-        if node_types.get(v) == 'retail':            # ... → v
-            consumer_total_flow[v] = consumer_total_flow.get(v, 0) + flow
-
-    sum_supplier_error = 0.0
-    sum_consumer_error = 0.0
-    total_supplier_checks = 0
-    total_consumer_checks = 0
-    # Проверка по поставщикам
-    for supplier, consumer_dict in demand_data.items():
-        expected_total = sum(consumer_dict.values())
-        actual_total = round(supplier_total_flow.get(supplier, 0))
-        total_supplier_checks += 1
-        if actual_total != expected_total:
-            sum_supplier_error += abs(actual_total - expected_total)/expected_total
-            # print(f"Mismatch for supplier {supplier}: expected {expected_total}, got {actual_total}")
-            # return False
-
-    # Проверка по потребителям
-    # Сначала суммируем ожидаемые значения для каждого получателя
-    expected_consumer_totals = {}
-    for consumer_dict in demand_data.values():
-        for consumer, flow in consumer_dict.items():
-            expected_consumer_totals[consumer] = expected_consumer_totals.get(consumer, 0) + flow
-
-    for consumer, expected_flow in expected_consumer_totals.items():
-        actual_flow = round(consumer_total_flow.get(consumer, 0))
-        total_consumer_checks += 1
-        if actual_flow != expected_flow:
-            sum_consumer_error += abs(actual_flow - expected_flow)/expected_flow
-            # print(f"Mismatch for consumer {consumer}: expected {expected_flow}, got {actual_flow}")
-            # return False
-    persent_supplier = sum_supplier_error/total_supplier_checks*100
-    persent_consumer = sum_consumer_error/total_consumer_checks*100
-    print(f"Flow check passed with sum_supplier_error {persent_supplier:.3f} and sum_consumer_error {persent_consumer:.3f}.")
-    return (persent_supplier + persent_consumer) == 0
\ No newline at end of file
+# Проверка сохранения потока (validation.validate_flows); demand_data по умолчанию — спрос экземпляра модуля
+def check(G, demand_data=None):
+    report = validate_flows(G, scenario() if demand_data is None else demand_data)
+    print(f"Flow check {'passed' if report.passed else 'failed'} with {report.summary()}.")
+    return report.passed
\ No newline at end of file
@@ -1,7 +1,10 @@
 # graph_utils.py
 import networkx as nx
-import random
+import numpy as np
 import matplotlib.pyplot as plt
+from compact_graph import TYPE_CODE, as_networkx
+from shared_subgraphs import SubgraphBundle
+from preprocessing import preprocess_subgraphs
 
 # Создаёт граф с узлами разных типов (поставщики, распределительные центры, розничные точки)
 # и рёбрами с начальными значениями потока (flow = 0).
@@ -15,24 +18,16 @@ def create_graph(suppliers_nodes_list, dc_nodes_list, retail_nodes_list, edgelis
 
 # Создаёт подграфы для каждого поставщика, который соединяется с распределительными центрами и розничными точками,
 # и добавляет характеристики рёбер и узлов.
+# G — CompactGraph; подграфы — маски над его общей топологией (SubgraphBundle), а не копии графа.
 def create_subgraphs(G, demand_data):
-    graphs = []
-    dc_and_retail = [n for n, t in G.nodes(data='type') if t in ('dc', 'retail')]
-    suppliers = [n for n, t in G.nodes(data='type') if t == 'supplier']
-    for supplier in suppliers:
-        g = nx.subgraph(G, [supplier] + dc_and_retail).copy()
-        g.graph["s_id"] = supplier
-        g.nodes[supplier]['demand'] = demand_data[supplier]
-        for i, j in g.edges:
-            g.edges[i, j].update({
-                'flow': 0,
-                'conductivity': random.uniform(1e-6, 1),
-                'prev_conductivity': 0,
-                'length': 1
-            })
-        for node in g.nodes:
-            g.nodes[node]['pressure'] = 0
-        graphs.append(g)
+    suppliers = G.nodes_of_type('supplier')
+    node_mask = np.zeros((len(suppliers), G.n_nodes), dtype=bool)
+    node_mask[:, G.node_type != TYPE_CODE['supplier']] = True
+    node_mask[np.arange(len(suppliers)), suppliers] = True
+    graphs = SubgraphBundle(G, suppliers, node_mask, demand_data)
+    # Оставляем только узлы на путях к потребителям со спросом и стягиваем цепочки узлов степени 2
+    preprocess_subgraphs(graphs)
+    graphs.fill('conductivity', np.random.uniform(1e-6, 1, graphs.edge_mask.shape))
     return graphs
 
 # Функция для равномерного распределения по оси X
@@ -50,6 +45,7 @@ def spread(nodes, y, shift=1, margin=0.05):
 
 # Вывод графа
 def draw_graph(G, edge_label_attr='flow'):
+    G = as_networkx(G)
     fig, ax = plt.subplots(figsize=(16, 8))
     
     # Группируем узлы по типам
@@ -0,0 +1,155 @@
+import itertools
+import numpy as np
+from compact_graph import CompactGraph, NODE_TYPES, TYPE_CODE
+from demand import DemandMatrix
+
+# Сколько строк файла разбирается за один шаг
+CHUNK_LINES = 1 << 20
+
+# Ключ пары индексов узлов в одном int64 (индексы меньше 2**31)
+_SHIFT = np.int64(1 << 32)
+
+
+# Таблица узлов, пополняемая по ходу чтения: идентификатор узла → индекс 0..V-1.
+# Идентификаторы блока сначала сводятся к уникальным, в словарь идут только они.
+class NodeTable:
+    def __init__(self):
+        self.index = {}
+        self.ids = []
+
+    def intern(self, values):
+        unique, inverse = np.unique(values, return_inverse=True)
+        index = self.index
+        codes = np.empty(len(unique), dtype=np.int64)
+        for n, node in enumerate(unique.tolist()):
+            code = index.get(node)
+            if code is None:
+                code = index[node] = len(self.ids)
+                self.ids.append(node)
+            codes[n] = code
+        return codes[inverse.reshape(np.shape(values))]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+# Читает файл блоками по chunk_lines строк; каждый блок разбирается np.loadtxt по столбцам cols.
+# Возвращает генератор массивов формы (строки блока, len(cols)).
+def read_chunks(path, cols, dtype, delimiter=',', skip_header=1, chunk_lines=CHUNK_LINES):
+    with open(path) as f:
+        for _ in range(skip_header):
+            next(f, None)
+        while True:
+            lines = list(itertools.islice(f, chunk_lines))
+            if not lines:
+                return
+            yield np.loadtxt(lines, delimiter=delimiter, usecols=cols, dtype=dtype, ndmin=2)
+
+# Уникальные ключи (и суммы значений по ключам) из блоков. Ключи блоков копятся в списке и сливаются
+# одним np.unique с уже слитыми, только когда их накопилось больше, чем слитых: каждый ключ
+# пересортировывается O(log) раз за всё чтение, а не на каждом блоке. result() — (ключи, суммы или None).
+class KeyAccumulator:
+    def __init__(self, weighted=False):
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros(0) if weighted else None
+        self.pending = []
+        self.pending_values = []
+        self.n_pending = 0
+
+    def add(self, keys, values=None):
+        self.pending.append(keys)
+        if self.values is not None:
+            self.pending_values.append(values)
+        self.n_pending += len(keys)
+        if self.n_pending > len(self.keys):
+            self._compact()
+
+    def _compact(self):
+        keys = np.concatenate([self.keys] + self.pending)
+        if self.values is None:
+            self.keys = np.unique(keys)
+        else:
+            self.keys, inverse = np.unique(keys, return_inverse=True)
+            values = np.concatenate([self.values] + self.pending_values)
+            self.values = np.bincount(inverse, weights=values, minlength=len(self.keys))
+        self.pending, self.pending_values, self.n_pending = [], [], 0
+
+    def result(self):
+        if self.pending:
+            self._compact()
+        return self.keys, self.values
+
+
+# Потоковая загрузка сети из CSV-файлов.
+# edge_path — полосы (откуда, куда) в столбцах edge_cols; повторяющиеся полосы сливаются в одно ребро,
+# в неориентированном графе (u, v) и (v, u) — тоже.
+# demand_path — строки заказов (поставщик, розничная точка, объём) в столбцах demand_cols;
+# объёмы повторяющихся пар складываются.
+# node_path — таблица узлов (идентификатор, тип: supplier, dc или retail) в столбцах node_cols;
+# её узлы входят в граф, даже если у них нет полос. Без node_path тип узла определяется по спросу:
+# поставщики — источники заказов, розничные точки — получатели, остальные узлы — РЦ (так РЦ окажутся
+# и поставщики или розничные точки без заказов в demand_path).
+# Идентификаторы узлов нумеруются по мере появления (сначала узлы node_path).
+# В памяти одновременно держатся текущий блок строк, слитые уникальные рёбра и пары спроса
+# и ещё не слитые уникальные ключи последних блоков (не больше, чем слитых).
+# Возвращает (CompactGraph, DemandMatrix); результат можно сохранить через network_file.save_network.
+def ingest_network(edge_path, demand_path=None, directed=True, edge_cols=(0, 1), demand_cols=(0, 1, 2),
+                   node_path=None, node_cols=(0, 1), id_dtype=np.int64, delimiter=',', skip_header=1,
+                   chunk_lines=CHUNK_LINES):
+    nodes = NodeTable()
+
+    typed = []
+    if node_path is not None:
+        ids = read_chunks(node_path, node_cols[:1], id_dtype, delimiter, skip_header, chunk_lines)
+        types = read_chunks(node_path, node_cols[1:2], str, delimiter, skip_header, chunk_lines)
+        for block, names in zip(ids, types):
+            names = np.char.strip(names[:, 0])
+            unknown = np.setdiff1d(names, NODE_TYPES)
+            if len(unknown):
+                raise ValueError(f"Unknown node type {unknown[0]!r} in {node_path}")
+            codes = np.select([names == t for t in NODE_TYPES], [TYPE_CODE[t] for t in NODE_TYPES])
+            typed.append((nodes.intern(block[:, 0]), codes))
+
+    edges = KeyAccumulator()
+    for block in read_chunks(edge_path, edge_cols, id_dtype, delimiter, skip_header, chunk_lines):
+        ends = nodes.intern(block)
+        u, v = ends[:, 0], ends[:, 1]
+        if not directed:
+            u, v = np.minimum(u, v), np.maximum(u, v)
+        edges.add(np.unique(u * _SHIFT + v))
+    edge_keys, _ = edges.result()
+
+    demand = KeyAccumulator(weighted=True)
+    if demand_path is not None:
+        id_cols, volume_col = demand_cols[:2], demand_cols[2]
+        pairs = read_chunks(demand_path, id_cols, id_dtype, delimiter, skip_header, chunk_lines)
+        amounts = read_chunks(demand_path, (volume_col,), np.float64, delimiter, skip_header, chunk_lines)
+        for block, amount in zip(pairs, amounts):
+            ends = nodes.intern(block)
+            keys, inverse = np.unique(ends[:, 0] * _SHIFT + ends[:, 1], return_inverse=True)
+            summed = np.bincount(inverse, weights=amount[:, 0], minlength=len(keys))
+            demand.add(keys, summed)
+    demand_keys, volumes = demand.result()
+    keep = volumes != 0
+    demand_keys, volumes = demand_keys[keep], volumes[keep]
+
+    node_ids = np.asarray(nodes.ids, dtype=id_dtype)
+    suppliers, retail = demand_keys // _SHIFT, demand_keys % _SHIFT
+    node_type = np.full(len(node_ids), TYPE_CODE['dc'], dtype=np.int8)
+    if node_path is None:
+        node_type[retail] = TYPE_CODE['retail']
+        node_type[suppliers] = TYPE_CODE['supplier']
+    else:
+        listed = np.zeros(len(node_ids), dtype=bool)
+        for index, codes in typed:
+            node_type[index] = codes
+            listed[index] = True
+        if not listed.all():
+            raise ValueError(f"Node {node_ids[np.argmin(listed)]} is missing from {node_path}")
+    G = CompactGraph(node_ids, node_type, edge_keys // _SHIFT, edge_keys % _SHIFT, directed)
+
+    # ключи спроса отсортированы, поэтому строки поставщиков уже сгруппированы
+    rows, counts = np.unique(suppliers, return_counts=True)
+    ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=ptr[1:])
+    return G, DemandMatrix(node_ids[rows], ptr, node_ids[retail], volumes)
@@ -0,0 +1,218 @@
+import time
+import numpy as np
+from sympy import symbols, diff, lambdify
+from seeding import seed_conductivities
+from checkpoint import as_checkpoint, PPA_STATE
+from flow_aggregation import FlowAggregator
+from pruning import EdgePruner
+from aggregation import aggregate_subgraphs
+from demand import as_demand
+from validation import validate_flows
+from profiling import current
+import tracing
+
+
+# Состояние решателя после очередной итерации — элемент генераторов physarum_iter и aco_iter.
+# iteration — номер итерации (с 1); residual — изменение проводимостей за итерацию (PPA),
+# cost — суммарная стоимость путей муравьёв за итерацию (ACO); у другого семейства — None.
+# converged — на этой итерации выполнен критерий остановки (следующей не будет).
+# flow, subgraph_flow и active_edges читаются из решателя при обращении, без копирования:
+# flow (E) и subgraph_flow (S × E) — представления только для чтения, их значения меняются
+# на следующих итерациях, поэтому для сохранения нужна копия (np.array(snapshot.flow)).
+class Snapshot:
+    def __init__(self, G, graphs, iteration, residual=None, cost=None, converged=False):
+        self.G = G
+        self.graphs = graphs
+        self.iteration = iteration
+        self.residual = residual
+        self.cost = cost
+        self.converged = converged
+
+    @property
+    def flow(self):
+        return _readonly(self.G.edge_attrs['flow'])
+
+    @property
+    def subgraph_flow(self):
+        return _readonly(self.graphs.flow)
+
+    @property
+    def active_edges(self):
+        return int(np.count_nonzero(self.G.active))
+
+    def __repr__(self):
+        value = f"residual={self.residual:.6g}" if self.residual is not None else f"cost={self.cost}"
+        return f"Snapshot(iteration={self.iteration}, {value}, converged={self.converged})"
+
+def _readonly(values):
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+# Срок работы решателя: time_limit секунд от создания (по time.perf_counter); None — без ограничения.
+# Решатели проверяют expired() между итерациями, PPA — ещё и между фазами итерации (после расчёта давлений),
+# ACO — между поставщиками внутри итерации, Dijkstra и A* — между парами спроса, поэтому срок может быть
+# превышен не больше чем на одну фазу PPA, один подграф ACO или один поиск пути.
+class Deadline:
+    def __init__(self, time_limit=None):
+        self.time_limit = time_limit
+        self.end = None if time_limit is None else time.perf_counter() + time_limit
+
+    def expired(self):
+        return self.end is not None and time.perf_counter() >= self.end
+
+    def remaining(self):
+        return None if self.end is None else max(0.0, self.end - time.perf_counter())
+
+# Лучшая итерация PPA для режима time_limit: решение с наименьшей ошибкой сохранения потока
+# по validate_flows (сумма supplier_error и consumer_error), при равной ошибке — с меньшей стоимостью cost.
+# Малое изменение проводимостей (residual) ещё не значит, что спрос выполнен, поэтому оно здесь не используется.
+# Последняя итерация перед исчерпанием времени может быть хуже более ранней, поэтому при каждом улучшении
+# сохраняются копии общего потока, маски активных рёбер и потоков подграфов, а restore() возвращает их в G
+# и подграфы. Внутренние массивы решателя (проводимости, длины, маски подграфов) не восстанавливаются:
+# после restore() итерации не продолжаются.
+class BestIterate:
+    def __init__(self, G, graphs, demand_data):
+        self.G = G
+        self.graphs = graphs
+        self.demand_data = as_demand(demand_data)
+        self.error = np.inf
+        self.cost = np.inf
+        self.iteration = None
+
+    def update(self, iteration, cost):
+        report = validate_flows(self.G, self.demand_data)
+        error = report.supplier_error + report.consumer_error
+        if (error, cost) < (self.error, self.cost):
+            self.error = error
+            self.cost = cost
+            self.iteration = iteration
+            self.flow = self.G.edge_attrs['flow'].copy()
+            self.active = self.G.active.copy()
+            self.subgraph_flow = self.graphs.flow.copy()
+
+    def restore(self):
+        if self.iteration is None:
+            return
+        self.G.edge_attrs['flow'][:] = self.flow
+        self.G.active[:] = self.active
+        self.graphs.flow[:] = self.subgraph_flow
+        self.G.stats['best_iteration'] = self.iteration
+
+# Цикл итераций PPA, общий для non_oriented_PPA, oriented_PPA, restricted_PPA и algorithm_utils.
+# Вариант передаёт только свои шаги: create_subgraphs(G, demand_data) строит подграфы, pressures(graphs) считает
+# давления в узлах, flow_conductivity(graphs) — потоки и проводимости подграфов, edge_length(G, graphs, E_func, dE_func) —
+# длины рёбер, residual(graphs) — изменение проводимостей за итерацию, converged(residual) — критерий остановки.
+# Остальное одинаково для всех: замеры фаз и размеров (profiling), объединение поставщиков (aggregate),
+# начальные проводимости (init), общий поток (FlowAggregator; positive — сумма только положительных потоков),
+# удаление рёбер после итераций, для которых prune_when(iteration) истинно (prune — параметры EdgePruner
+# (threshold, patience, margin) или None — без удаления), time_limit с возвратом лучшей итерации (BestIterate;
+# стоимость решения — Σ Q·E(Q) по активным рёбрам) и сохранение состояния в checkpoint под именем решателя name.
+# Срок проверяется и в начале итерации, и после расчёта давлений (самой долгой фазы): если он истёк там,
+# итерация не засчитывается, и G содержит поток предыдущей (или лучшей) итерации.
+# Выдаёт Snapshot после каждой итерации; значение return — подграфы (SubgraphBundle).
+def physarum_loop(G, demand_data, effective_distance_function, name, create_subgraphs, pressures, flow_conductivity,
+                  edge_length, residual, converged, positive=True, init='default', aggregate=False, max_iterations=None,
+                  prune=None, prune_when=None, time_limit=None, checkpoint=None):
+    deadline = Deadline(time_limit)
+    G.stats['converged'] = G.stats['timed_out'] = False
+    # замеры фаз и размеров (при выключенном профилировании — пустые контексты, см. profiling)
+    prof = current()
+    # события трассировки (по умолчанию только предупреждения, см. tracing)
+    tr = tracing.current()
+    with prof.phase('subgraphs'):
+        graphs = create_subgraphs(G, demand_data)
+    # размеры общего графа и массивов подграфов (для учёта памяти)
+    prof.gauge('graph_bytes', G.nbytes)
+    prof.gauge('subgraph_bytes', graphs.nbytes)
+    # aggregate=True — поставщики с одинаковой топологией и пропорциональным спросом решаются одной строкой
+    if aggregate:
+        graphs = aggregate_subgraphs(graphs)
+    # init='shortest_path' — начальные проводимости по решению с кратчайшими путями
+    seed_conductivities(graphs, effective_distance_function, init)
+    flows = FlowAggregator(graphs, positive=positive, incremental=False)
+    pruner = EdgePruner(graphs, *prune) if prune is not None else None
+    # checkpoint — checkpoint.Checkpoint или путь к файлу: каждые checkpoint.every итераций состояние
+    # сохраняется в файл, а если файл уже есть, запуск продолжается с сохранённой итерации
+    checkpoint = as_checkpoint(checkpoint)
+    iteration = 0
+    if checkpoint is not None:
+        iteration, extra = checkpoint.restore(graphs, name)
+        if extra is not None:
+            if pruner is not None:
+                pruner.edges, pruner.below = extra['pruner']
+            flows.update()
+    # функция E(Q) и её производная по Q превращаются в NumPy-функции один раз на весь запуск
+    Q = symbols('Q')
+    E_func = lambdify(Q, effective_distance_function(Q), 'numpy')
+    dE_func = lambdify(Q, diff(effective_distance_function(Q), Q), 'numpy')
+    # при time_limit отслеживается лучшая итерация: по исчерпании времени возвращается она, а не последняя
+    best = BestIterate(G, graphs, demand_data) if time_limit is not None else None
+
+    def stop(completed):
+        G.stats['timed_out'] = True
+        G.stats['iterations'] = completed
+        if best is not None:
+            best.restore()
+        tr.info('time_limit', iteration=completed)
+
+    # max_iterations=None — до выполнения условия завершения
+    while max_iterations is None or iteration < max_iterations:
+        # срок мог истечь на удалении рёбер или сохранении состояния после прошлой итерации
+        if deadline.expired():
+            stop(iteration)
+            break
+        iteration += 1
+        G.stats['iterations'] = iteration
+        with prof.phase('pressures'):
+            pressures(graphs)
+        if deadline.expired():
+            stop(iteration - 1)
+            break
+        with prof.phase('flow_conductivity'):
+            flow_conductivity(graphs)
+        with prof.phase('total_flow'):
+            flows.update()
+        with prof.phase('edge_length'):
+            edge_length(G, graphs, E_func, dE_func)
+        with prof.phase('term_criteria'):
+            change = residual(graphs)
+        done = converged(change)
+        # поток по активным рёбрам — отладочное событие на выбранных итерациях
+        if tr.sampled(iteration, tracing.DEBUG):
+            active = np.flatnonzero(G.active)
+            tr.debug('edge_flow', iteration=iteration, src=G.node_ids[G.src[active]], dst=G.node_ids[G.dst[active]],
+                     flow=G.edge_attrs['flow'][active])
+        if best is not None:
+            flow = np.where(G.active, G.edge_attrs['flow'], 0)
+            best.update(iteration, float(flow @ np.broadcast_to(E_func(flow), flow.shape)))
+        yield Snapshot(G, graphs, iteration, residual=change, converged=done)
+        if done:
+            G.stats['converged'] = True
+            tr.info('converged', iteration=iteration)
+            break
+        if deadline.expired():
+            stop(iteration)
+            break
+
+        if pruner is not None and prune_when(iteration):
+            # удаляем рёбра с малым потоком из общего графа и из подграфов
+            with prof.phase('pruning'):
+                edges_to_remove = pruner.prune()
+            prof.count('removed_edges', len(edges_to_remove))
+            if tr.sampled(iteration):
+                tr.info('pruning', iteration=iteration, removed=len(edges_to_remove))
+
+        if checkpoint is not None and checkpoint.due(iteration):
+            extra = {'pruner': (pruner.edges, pruner.below)} if pruner is not None else {}
+            with prof.phase('checkpoint'):
+                checkpoint.save(graphs, name, iteration, PPA_STATE, **extra)
+    return graphs
+
+# Выполняет генератор итераций до конца и возвращает его результат (значение return генератора)
+def run_to_end(iterator):
+    while True:
+        try:
+            next(iterator)
+        except StopIteration as stop:
+            return stop.value
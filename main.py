@@ -30,7 +30,7 @@ def main():
 
     for g in graphs:
         print(f"Subnetwork = {g.graph['s_id']}")
-        print(sorted(g.edges.data('flow'), key=lambda x: x[2], reverse=True))
+        print(sorted(g.edge_data('flow'), key=lambda x: x[2], reverse=True))
     print("Global edges flow:")
     print(sorted(G.edges.data('flow'), key=lambda x: x[2], reverse=True))
 
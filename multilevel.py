@@ -0,0 +1,109 @@
+import numpy as np
+from compact_graph import CompactGraph, EDGE_ATTRS, solver_entry
+from demand import DemandMatrix, as_demand
+
+# Многоуровневый режим для сетей с очень большим числом розничных точек.
+# Розничные точки с одинаковым набором соседей (обычно — одинаковым набором обслуживающих их РЦ)
+# объединяются в один агрегированный узел со суммарным спросом. Грубая задача решается тем же алгоритмом,
+# её решение продолжается на исходный граф (поток агрегированного ребра делится между рёбрами участников
+# пропорционально их спросу у поставщика) и используется как начальное состояние (init) для решения исходной задачи.
+
+
+# Грубый граф: агрегированный узел кластера получает идентификатор и тип первой розничной точки кластера,
+# параллельные рёбра участников сливаются в одно. Поля:
+# graph — CompactGraph грубого уровня, demand_data — спрос поставщиков к узлам грубого графа,
+# edge_map — номер ребра грубого графа для каждого ребра исходного (-1 у неактивных рёбер),
+# share — доля спроса узла внутри его кластера у каждого поставщика (S × V, вне кластеров 1).
+class RetailCoarsening:
+    def __init__(self, G, demand_data):
+        self.fine = G
+        demand_data = as_demand(demand_data)
+        clusters = self._clusters(G)
+        leader = np.arange(G.n_nodes)
+        for members in clusters:
+            leader[members] = members[0]
+        keep = np.flatnonzero(leader == np.arange(G.n_nodes))
+        coarse_index = np.full(G.n_nodes, -1, dtype=np.int64)
+        coarse_index[keep] = np.arange(len(keep))
+        self.node_map = coarse_index[leader]
+
+        # рёбра грубого графа: образы активных рёбер без повторов
+        active = np.flatnonzero(G.active)
+        cs, cd = self.node_map[G.src[active]], self.node_map[G.dst[active]]
+        if not G.directed:
+            cs, cd = np.minimum(cs, cd), np.maximum(cs, cd)
+        pairs, first, inverse = np.unique(np.stack([cs, cd], axis=1), axis=0, return_index=True, return_inverse=True)
+        self.edge_map = np.full(G.n_edges, -1, dtype=np.int64)
+        self.edge_map[active] = inverse.ravel()
+        attrs = {name: G.edge_attrs[name][active[first]] for name in EDGE_ATTRS if name != 'flow'}
+        self.graph = CompactGraph(G.node_ids[keep], G.node_type[keep], pairs[:, 0], pairs[:, 1], G.directed, attrs)
+
+        # спрос к участникам кластера переносится на его первую розничную точку
+        owners = np.repeat(demand_data.suppliers, np.diff(demand_data.ptr))
+        i = G.indices(demand_data.retail)
+        targets = np.where(i >= 0, G.node_ids[leader[np.maximum(i, 0)]], demand_data.retail)
+        self.demand_data = DemandMatrix.from_entries(owners, targets, demand_data.volume)
+        self.share = self._shares(G, clusters, demand_data)
+
+    @property
+    def reduced(self):
+        return self.graph.n_nodes < self.fine.n_nodes
+
+    # Кластеры розничных точек с одинаковыми соседями (в ориентированном графе — с учётом направления рёбер)
+    @staticmethod
+    def _clusters(G):
+        ptr, inc_edges, inc_nbrs = G.incidence()
+        groups = {}
+        for r in G.nodes_of_type('retail').tolist():
+            edges = inc_edges[ptr[r]:ptr[r + 1]]
+            alive = G.active[edges]
+            incoming = G.dst[edges[alive]] == r if G.directed else np.ones(alive.sum(), dtype=bool)
+            key = frozenset(zip(inc_nbrs[ptr[r]:ptr[r + 1]][alive].tolist(), incoming.tolist()))
+            groups.setdefault(key, []).append(r)
+        return [members for members in groups.values() if len(members) > 1]
+
+    # Доли спроса участников кластера у каждого поставщика; без спроса к кластеру — поровну
+    def _shares(self, G, clusters, demand_data):
+        suppliers = G.nodes_of_type('supplier')
+        share = np.ones((len(suppliers), G.n_nodes))
+        # плотный спрос S × V по строкам поставщиков графа
+        row = np.full(G.n_nodes, -1, dtype=np.int64)
+        row[suppliers] = np.arange(len(suppliers))
+        s = G.indices(np.repeat(demand_data.suppliers, np.diff(demand_data.ptr)))
+        i = G.indices(demand_data.retail)
+        keep = (s >= 0) & (i >= 0)
+        keep[keep] = row[s[keep]] >= 0
+        volume = np.zeros((len(suppliers), G.n_nodes))
+        np.add.at(volume, (row[s[keep]], i[keep]), demand_data.volume[keep])
+        for members in clusters:
+            total = volume[:, members].sum(axis=1, keepdims=True)
+            safe = np.where(total > 0, total, 1)
+            share[:, members] = np.where(total > 0, volume[:, members] / safe, 1 / len(members))
+        return share
+
+    # Продолжает построчные потоки грубого уровня (S × E грубого графа) на исходный граф (S × E)
+    def prolong(self, coarse_flow):
+        G = self.fine
+        alive = self.edge_map >= 0
+        flow = np.zeros((coarse_flow.shape[0], G.n_edges))
+        flow[:, alive] = coarse_flow[:, self.edge_map[alive]]
+        return flow * self.share[:, G.src] * self.share[:, G.dst]
+
+
+# Многоуровневое решение: algorithm — physarum_algorithm или aco_algorithm любого модуля.
+# Грубая задача решается с get_subgraphs=True, продолженные потоки поставщиков передаются
+# в исходную задачу как init, и на исходном графе выполняется не больше fine_iterations итераций
+# (None — сколько потребует сам алгоритм). Остальные параметры (kwargs) передаются алгоритму на обоих уровнях.
+@solver_entry(native='compact')
+def multilevel_solve(G, algorithm, demand_data, effective_distance_function, epsilon, fine_iterations=10, **kwargs):
+    demand_data = as_demand(demand_data)
+    coarsening = RetailCoarsening(G, demand_data)
+    if not coarsening.reduced:
+        return algorithm(G, demand_data, effective_distance_function, epsilon, **kwargs)
+    coarse_kwargs = dict(kwargs, get_subgraphs=True)
+    coarse_kwargs.pop('init', None)
+    coarse = algorithm(coarsening.graph, coarsening.demand_data, effective_distance_function, epsilon, **coarse_kwargs)
+    init = coarsening.prolong(coarse.flow)
+    if fine_iterations is not None:
+        kwargs['max_iterations'] = fine_iterations
+    return algorithm(G, demand_data, effective_distance_function, epsilon, init=init, **kwargs)
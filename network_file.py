@@ -0,0 +1,96 @@
+import json
+import numpy as np
+from compact_graph import CompactGraph, EDGE_ATTRS
+from demand import DemandMatrix, as_demand
+
+# Двоичный формат сети и спроса.
+# Файл: сигнатура MAGIC, длина заголовка (uint64, little-endian), заголовок JSON и массивы.
+# Заголовок описывает каждый массив: тип, форму и смещение от начала файла; смещения кратны ALIGN,
+# поэтому массивы читаются через np.memmap без копирования.
+# Массивы: node_ids, node_type — таблица узлов; src, dst — рёбра (индексы узлов);
+# out_ptr, out_edges, in_ptr, in_edges — готовая смежность CompactGraph; active — маска рёбер;
+# flow, length, conductivity, pheromone — атрибуты рёбер (решённые потоки, если граф уже посчитан);
+# demand_suppliers, demand_ptr, demand_retail, demand_volume — спрос в формате CSR:
+# спрос поставщика demand_suppliers[k] к узлам demand_retail[demand_ptr[k]:demand_ptr[k + 1]].
+MAGIC = b'GOANET01'
+ALIGN = 64
+
+# Массивы, которые алгоритмы изменяют: загружаются в режиме copy-on-write,
+# изменения остаются в памяти процесса и не попадают в файл
+_WRITABLE = ('active',) + EDGE_ATTRS
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+# Записывает граф (CompactGraph или networkx) и спрос в файл path.
+# demand_data — словарь спроса, demand.DemandMatrix или scenarios.Scenario.
+def save_network(path, G, demand_data=None):
+    if not isinstance(G, CompactGraph):
+        G = CompactGraph.from_networkx(G)
+    arrays = {
+        'node_ids': G.node_ids.astype(np.int64), 'node_type': G.node_type,
+        'src': G.src, 'dst': G.dst,
+        'out_ptr': G.out_ptr, 'out_edges': G.out_edges, 'in_ptr': G.in_ptr, 'in_edges': G.in_edges,
+        'active': G.active,
+    }
+    arrays.update(G.edge_attrs)
+    if demand_data is not None:
+        csr = as_demand(demand_data).csr()
+        for name, values in zip(('demand_suppliers', 'demand_ptr', 'demand_retail', 'demand_volume'), csr):
+            arrays[name] = values
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    # смещения считаются до записи: длина заголовка зависит от них, поэтому место под него
+    # резервируется с запасом и дополняется пробелами
+    def layout(start):
+        offset, table = start, {}
+        for name, a in arrays.items():
+            offset = _align(offset)
+            table[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+            offset += a.nbytes
+        return table
+    meta = {'directed': bool(G.directed), 'n_nodes': G.n_nodes, 'n_edges': G.n_edges}
+    reserve = len(json.dumps({**meta, 'arrays': layout(0)})) + 1024
+    start = _align(len(MAGIC) + 8 + reserve)
+    table = layout(start)
+    header = json.dumps({**meta, 'arrays': table}).encode().ljust(start - len(MAGIC) - 8)
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.array(len(header), dtype='<u8').tobytes())
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(table[name]['offset'])
+            a.tofile(f)
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a network file")
+        size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+        return json.loads(f.read(size))
+
+# Загружает граф и спрос из файла path через отображение в память.
+# Топология отображается только для чтения и разделяется всеми процессами, открывшими файл;
+# маска active и атрибуты рёбер — copy-on-write. Возвращает (CompactGraph, DemandMatrix или None).
+def load_network(path):
+    header = read_header(path)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if not np.prod(shape):
+            arrays[name] = np.zeros(shape, dtype=spec['dtype'])
+            continue
+        mode = 'c' if name in _WRITABLE else 'r'
+        arrays[name] = np.memmap(path, dtype=spec['dtype'], mode=mode, offset=spec['offset'], shape=shape)
+    adjacency = tuple(arrays[name] for name in ('out_ptr', 'out_edges', 'in_ptr', 'in_edges'))
+    attrs = {name: arrays[name] for name in EDGE_ATTRS if name in arrays}
+    G = CompactGraph(arrays['node_ids'], arrays['node_type'], arrays['src'], arrays['dst'],
+                     header['directed'], attrs, adjacency=adjacency)
+    G.active = arrays['active']
+    demand = None
+    if 'demand_ptr' in arrays:
+        demand = DemandMatrix(arrays['demand_suppliers'], arrays['demand_ptr'],
+                              arrays['demand_retail'], arrays['demand_volume'])
+    return G, demand
@@ -1,7 +1,13 @@
-import networkx as nx
 import numpy as np
-from random import choices, random
+from random import choices, choice
 from non_oriented_graph import create_subgraphs
+from seeding import seed_pheromones
+from flow_aggregation import FlowAggregator
+from compact_graph import solver_entry, solver_iter
+from profiling import current
+from iteration import Snapshot, Deadline, run_to_end
+from checkpoint import as_checkpoint, ACO_STATE
+import tracing
 
 # -------- constants ----------
 ALPHA = 1
@@ -17,139 +23,186 @@ STALL_ITERS = 2     # ранний выход, если нет улучшени
 LEVEL = {'supplier': 0, 'dc': 1, 'retail': 2}
 
 def init_feromones(graphs):
-    for g in graphs:
-        supplier = g.graph['s_id']
-        demand_nodes = g.nodes[supplier]['demand'].keys()
-
-        for u, v in g.edges:
-            # Усиливаем феромон на ребре, если оно ведёт напрямую от поставщика к потребителю
-            if (u == supplier and v in demand_nodes) or (v == supplier and u in demand_nodes):
-                g.edges[u, v]['pheromone'] = 5.0  # усиленный феромон
-            else:
-                g.edges[u, v]['pheromone'] = 1.0 + np.random.rand() * 0.1  # базовый феромон немного случайный
-
-# Подсчитывает общий поток по всему графу, суммируя потоки, вычисленные на уровне подграфов.
-# Это позволяет обновить потоки на уровне всего графа с учётом всех локальных решений.
-def calculate_total_flow(G, graphs):
-    for edge in G.edges:
-        G.edges[edge]['flow'] = 0
-    for g in graphs:
-        for i, j, flow in g.edges.data('flow'):
-            if flow > 0:
-                G.edges[i, j]['flow'] += flow
-    return G
-                
-def aco_algorithm(G, demand_data, effective_distance_function, epsilon):
-    graphs = create_subgraphs(G, demand_data)
+    G = graphs.G
+    ptr, inc_edges, inc_nbrs = G.incidence()
+    # базовый феромон немного случайный
+    pheromone = 1.0 + np.random.rand(*graphs.edge_mask.shape) * 0.1
+    for k, supplier in enumerate(graphs.suppliers):
+        demand_nodes = [G.index[n] for n in graphs.demand[k] if n in G.index]
+        # Усиливаем феромон на ребре, если оно ведёт напрямую от поставщика к потребителю
+        edges = inc_edges[ptr[supplier]:ptr[supplier + 1]]
+        direct = np.isin(inc_nbrs[ptr[supplier]:ptr[supplier + 1]], demand_nodes)
+        pheromone[k, edges[direct]] = 5.0  # усиленный феромон
+    graphs.fill('pheromone', pheromone)
+
+# Итерации муравьиного алгоритма по одной: после каждой выдаётся Snapshot (номер итерации, суммарная
+# стоимость путей муравьёв); потребитель может прекратить перебор в любой момент. Лучшие найденные решения
+# переносятся в поток G при завершении генератора, в том числе досрочном, поэтому во время перебора
+# flow снимка нулевой. Значение return генератора — подграфы (SubgraphBundle).
+@solver_iter
+def aco_iter(G, demand_data, effective_distance_function, epsilon, init='default', max_iterations=ITER_MAX, time_limit=None, checkpoint=None):
+    # time_limit — бюджет времени в секундах на весь запуск (None — без ограничения);
+    # по его исчерпании возвращается текущее решение, в G.stats отмечается, сошёлся ли алгоритм
+    deadline = Deadline(time_limit)
+    G.stats['converged'] = G.stats['timed_out'] = False
+    # замеры фаз, размеров и шагов муравьёв (при выключенном профилировании — пустые вызовы, см. profiling)
+    prof = current()
+    # события трассировки (по умолчанию только предупреждения, см. tracing)
+    tr = tracing.current()
+    with prof.phase('subgraphs'):
+        graphs = create_subgraphs(G, demand_data)
+    # размеры общего графа и массивов подграфов (для учёта памяти)
+    prof.gauge('graph_bytes', G.nbytes)
+    prof.gauge('subgraph_bytes', graphs.nbytes)
     init_feromones(graphs)    
+    # init='shortest_path' — феромоны пропорциональны потокам решения с кратчайшими путями
+    seed_pheromones(graphs, effective_distance_function, init)
     
-    # Словарь для хранения лучших решений по каждому графу
-    best_solutions = {g.graph['s_id']: {'cost': float('inf'), 'solution': {}, 'graph': g} for g in graphs}
+    # Словарь для хранения лучших решений по каждому подграфу; путь — список номеров рёбер
+    best_solutions = {s_id: {'cost': float('inf'), 'solution': {}} for s_id in graphs.s_ids}
     prev_cost = 0
-    for it in range(ITER_MAX):
-        total_g_cost = 0
-        for graph in graphs:
-            supplier = graph.graph['s_id']
-            demand = graph.nodes[supplier]['demand']
-            all_paths = []
-            all_costs = []
-
-            for _ in range(num_ants):
-                ant_paths = {}
-                total_cost = 0
-
-                for target, required_flow in demand.items():
-                    if required_flow == 0:
-                        continue
-                    path = construct_path(graph, supplier, target)
-                    if not path:
-                        continue
-                    ant_paths[target] = path
-
-                    flow_sum = 0
-                    for i in range(len(path) - 1):
-                        u, v = path[i], path[i + 1]
-                        flow_sum += effective_distance_function(graph.edges[u, v]['flow'])
-                    total_cost += flow_sum * required_flow
-
-                all_paths.append(ant_paths)
-                all_costs.append(total_cost)
-
-                # Проверяем, что все потребители обслужены
-                required_targets = {target for target, req in demand.items() if req > 0}
-                if required_targets.issubset(ant_paths.keys()):
-                    if total_cost < best_solutions[supplier]['cost']:
-                        best_solutions[supplier]['cost'] = total_cost
-                        best_solutions[supplier]['solution'] = ant_paths
+    # checkpoint — checkpoint.Checkpoint или путь к файлу: каждые checkpoint.every итераций состояние
+    # сохраняется в файл, а если файл уже есть, запуск продолжается с сохранённой итерации
+    checkpoint = as_checkpoint(checkpoint)
+    start = 0
+    if checkpoint is not None:
+        start, extra = checkpoint.restore(graphs, 'non_oriented_ACO')
+        if extra is not None:
+            best_solutions, prev_cost = extra['best_solutions'], extra['prev_cost']
+    try:
+        for it in range(start, max_iterations):
+            G.stats['iterations'] = it + 1
+            total_g_cost = 0
+            for k, supplier in enumerate(graphs.suppliers):
+                if deadline.expired():
+                    break
+                s_id = graphs.s_ids[k]
+                demand = graphs.demand[k]
+                all_paths = []
+                all_costs = []
+
+                for _ in range(NUM_ANTS):
+                    ant_paths = {}
+                    total_cost = 0
+
+                    for target, required_flow in demand.items():
+                        if required_flow == 0 or target not in G.index:
+                            continue
+                        with prof.phase('construct_path'):
+                            path = construct_path(graphs, k, supplier, G.index[target])
+                        if not path:
+                            prof.count('failed_paths')
+                            continue
+                        prof.count('ant_steps', len(path))
+                        ant_paths[target] = path
+
+                        with prof.phase('cost'):
+                            flow_sum = np.sum(effective_distance_function(graphs.flow[k, path]))
+                        total_cost += flow_sum * required_flow
+
+                    all_paths.append(ant_paths)
+                    all_costs.append(total_cost)
+
+                    # Проверяем, что все потребители обслужены
+                    required_targets = {target for target, req in demand.items() if req > 0}
+                    if required_targets.issubset(ant_paths.keys()):
+                        if total_cost < best_solutions[s_id]['cost']:
+                            best_solutions[s_id]['cost'] = total_cost
+                            best_solutions[s_id]['solution'] = ant_paths
             
-            total_g_cost += sum(all_costs)   # суммируем ВСЕ стоимости
-            # Обновление феромонов после всех муравьёв
-            evaporate_pheromones(graph)
-            reinforce_pheromones(graph, all_paths, all_costs)
+                total_g_cost += sum(all_costs)   # суммируем ВСЕ стоимости
+                # рёбра путей всех муравьёв поставщика, хранимые до обновления феромонов
+                if prof.enabled:
+                    prof.gauge('ant_path_edges', sum(len(p) for paths in all_paths for p in paths.values()))
+                # Обновление феромонов после всех муравьёв
+                with prof.phase('pheromone'):
+                    evaporate_pheromones(graphs, k)
+                    reinforce_pheromones(graphs, k, all_paths, all_costs)
             
-        # print(f"Iteration {it+1}/{iterations}. Total cost: {total_g_cost}")
-        if abs(prev_cost - total_g_cost) <= epsilon:
-            break
-        prev_cost = total_g_cost
-
-    # Применение лучших решений
-    for graph in graphs:
-        supplier = graph.graph['s_id']
-        best_solution = best_solutions[supplier]['solution']
-        demand = graph.nodes[supplier]['demand']
-
-        required_targets = {target for target, req in demand.items() if req > 0}
-        if not best_solution or not required_targets.issubset(best_solution.keys()):
-            print(f"WARNING: No complete solution found for supplier {supplier}")
-            continue
-
-        for target, path in best_solution.items():
-            demand_val = demand[target]
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i + 1]
-                graph.edges[u, v]['flow'] += demand_val
-
-    return calculate_total_flow(G, graphs)
-
-
-def construct_path(graph, start, end, retries=3):
-    max_len = len(graph)
+            if deadline.expired():
+                # итерация могла быть прервана между поставщиками; решения остальных подграфов — прежние лучшие
+                G.stats['timed_out'] = True
+                tr.info('time_limit', iteration=it + 1)
+                break
+            if tr.sampled(it + 1):
+                tr.info('iteration', iteration=it + 1, total_cost=total_g_cost)
+            converged = abs(prev_cost - total_g_cost) <= epsilon
+            yield Snapshot(G, graphs, it + 1, cost=total_g_cost, converged=converged)
+            if converged:
+                G.stats['converged'] = True
+                break
+            prev_cost = total_g_cost
+            if checkpoint is not None and checkpoint.due(it + 1):
+                with prof.phase('checkpoint'):
+                    checkpoint.save(graphs, 'non_oriented_ACO', it + 1, ACO_STATE,
+                                    best_solutions=best_solutions, prev_cost=prev_cost)
+    finally:
+        # Применение лучших решений (в том числе при досрочной остановке перебора)
+        # общий поток по рёбрам G обновляется по мере добавления путей
+        flows = FlowAggregator(graphs)
+        for k, s_id in enumerate(graphs.s_ids):
+            best_solution = best_solutions[s_id]['solution']
+            demand = graphs.demand[k]
+
+            required_targets = {target for target, req in demand.items() if req > 0}
+            if not best_solution or not required_targets.issubset(best_solution.keys()):
+                tr.warning('no_solution', supplier=s_id)
+                continue
+
+            with prof.phase('apply_solutions'):
+                for target, path in best_solution.items():
+                    flows.add(k, path, demand[target])
+
+    return graphs
+
+@solver_entry(native='compact')
+def aco_algorithm(G, demand_data, effective_distance_function, epsilon, init='default', get_subgraphs=False, max_iterations=ITER_MAX, time_limit=None, checkpoint=None):
+    graphs = run_to_end(aco_iter(G, demand_data, effective_distance_function, epsilon, init, max_iterations, time_limit, checkpoint))
+    return graphs if get_subgraphs else G
+
+
+# Строит путь муравья от start до end (индексы узлов) в подграфе поставщика k.
+# Возвращает список номеров рёбер пути или None.
+def construct_path(graphs, k, start, end, retries=3):
+    # шаг по стянутой цепочке ведёт сразу в её дальний конец (hops — номер пути цепочки или -1)
+    adjacency = graphs.walk_adjacency()
+    mask = graphs.edge_mask[k]
+    hop_ok = graphs.hop_mask(mask)
+    pheromone = graphs.pheromone[k]
+    length = graphs.length[k]
+    max_len = int(graphs.node_mask[k].sum())
     for _ in range(retries):
-        path, visited = [start], {start}
+        path, visited = [], np.zeros(graphs.G.n_nodes, dtype=bool)
+        visited[start] = True
         current = start
-        while current != end and len(path) < max_len:
-            neighbors = [n for n in graph.neighbors(current) if n not in visited]
-            if not neighbors:
+        while current != end and len(path) + 1 < max_len:
+            edges, nbrs, hops = adjacency[current]
+            keep = mask[edges] & hop_ok[hops] & ~visited[nbrs]
+            edges, nbrs, hops = edges[keep], nbrs[keep], hops[keep]
+            if not len(edges):
                 break
-            weights = [
-                (graph.edges[current, n]['pheromone'] ** alpha) *
-                ((1 / graph.edges[current, n]['length']) ** beta)
-                for n in neighbors
-            ]
+            weights = (pheromone[edges] ** ALPHA) * ((1 / length[edges]) ** BETA)
             try:
-                next_node = choices(neighbors, weights)[0]
+                n = choices(range(len(edges)), weights)[0]
             except ValueError:
-                next_node = random.choice(neighbors)
+                n = choice(range(len(edges)))
 
-            current = next_node            # ← ОБЯЗАТЕЛЬНО
-            path.append(current)
-            visited.add(current)
+            current = int(nbrs[n])            # ← ОБЯЗАТЕЛЬНО
+            path.extend(graphs.hop_edges(int(edges[n]), int(hops[n])))
+            visited[current] = True
 
         if current == end:
             return path
     return None
 
-def evaporate_pheromones(graph):
-    for u, v in graph.edges:
-        graph.edges[u, v]['pheromone'] = max(MIN_PHER, graph.edges[u, v]['pheromone'] * (1 - rho))
+def evaporate_pheromones(graphs, k):
+    graphs.pheromone[k] = np.where(graphs.edge_mask[k], np.maximum(MIN_PHER, graphs.pheromone[k] * (1 - RHO)), 0)
 
 
-def reinforce_pheromones(graph, paths_list, costs_list):
+def reinforce_pheromones(graphs, k, paths_list, costs_list):
     for paths, cost in zip(paths_list, costs_list):
         if cost == 0:
             continue
+        delta = Q / max(cost, 1e-3)   # клиппинг
         for path in paths.values():
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i + 1]
-                delta = Q_const / max(cost, 1e-3)   # клиппинг
-                graph.edges[u, v]['pheromone'] += delta
\ No newline at end of file
+            graphs.pheromone[k, path] += delta
@@ -1,98 +1,111 @@
-import math
-from collections import defaultdict
+import heapq
+import numpy as np
 import networkx as nx
-
-
-# ---------- «голый» A* на циклах ------------------------------------
-def astar_shortest_path_loops(G, source, target, heuristic, effective_distance_func):
-    open_set = {source}                       # вершины, которые нужно обработать
-    came_from = {}                            # j ← i (предок j – это i)
-    g_score = {i: math.inf for i in G.nodes}  # стоимость пути source → i
-    f_score = {i: math.inf for i in G.nodes}  # g + heuristic
-
+from compact_graph import TYPE_CODE, tree_path, solver_entry
+from demand import as_demand
+from iteration import Deadline
+from profiling import current as current_profiler
+import tracing
+
+
+# Координаты узлов для эвристики: поставщики в столбце x = 0, РЦ — x = 1, магазины — x = 2,
+# внутри столбца узлы идут по порядку с шагом 1, 1/3 и 1/2 соответственно
+def node_positions(G):
+    x = np.zeros(G.n_nodes)
+    y = np.zeros(G.n_nodes)
+    for t, column, step in (('supplier', 0, 1), ('dc', 1, 1 / 3), ('retail', 2, 1 / 2)):
+        nodes = G.nodes_of_type(t)
+        x[nodes] = column
+        y[nodes] = np.arange(len(nodes)) * step
+    return x, y
+
+
+# ---------- A* по массивам CompactGraph -----------------------------
+# source, target — индексы узлов, weights — длины рёбер (массив длины E), heuristic — оценка
+# расстояния от каждого узла до target (массив длины V). Как и прежде, узел может открываться
+# повторно, если к нему найден более короткий путь. Возвращает номера рёбер пути.
+# Во внутреннем цикле — списки Python: поэлементный доступ к массивам NumPy здесь заметно медленнее.
+def astar_shortest_path(G, source, target, heuristic, weights):
+    adjacency = G.walk_adjacency()
+    heuristic = heuristic.tolist()
+    lengths = np.where(G.active, weights, np.inf).tolist()  # удалённые рёбра непроходимы
+    g_score = [np.inf] * G.n_nodes            # стоимость пути source → i
+    pred = [-1] * G.n_nodes                   # ребро-предшественник (см. tree_path)
     g_score[source] = 0.0
-    f_score[source] = heuristic(source, target)
+    open_set = [(heuristic[source], source)]  # (g + heuristic, i)
+    # число релаксаций рёбер передаётся в активный профилировщик (см. profiling)
+    relaxations = 0
 
     while open_set:
-        # 1. выбираем i с минимальным f_score
-        current = None
-        current_f = math.inf
-        for i in open_set:                     # <- i
-            if f_score[i] < current_f:
-                current_f = f_score[i]
-                current = i
+        # 1. выбираем i с минимальным f_score; устаревшие записи пропускаем
+        f, current = heapq.heappop(open_set)
+        if f > g_score[current] + heuristic[current]:
+            continue
 
         if current == target:                  # найден кратчайший путь
-            path = [current]
-            while path[-1] in came_from:
-                path.append(came_from[path[-1]])
-            path.reverse()
-            return path
-
-        open_set.remove(current)
+            current_profiler().count('edge_relaxations', relaxations)
+            return tree_path(G, pred, source, target)
 
         # 2. релаксация рёбер current → j
-        neighbours = G.successors(current) if G.is_directed() else G.neighbors(current)
-        for j in neighbours:                   # <- j
-            tentative_g = g_score[current] + effective_distance_func(G.edges[current, j]['flow'])
+        edges, nbrs = adjacency[current]
+        for e, j in zip(edges.tolist(), nbrs.tolist()):
+            w = lengths[e]
+            if w == np.inf:
+                continue
+            relaxations += 1
+            tentative_g = g_score[current] + w
             if tentative_g < g_score[j]:
-                came_from[j] = current
+                pred[j] = e
                 g_score[j] = tentative_g
-                f_score[j] = tentative_g + heuristic(j, target)
-                open_set.add(j)
+                heapq.heappush(open_set, (tentative_g + heuristic[j], j))
 
-    raise nx.NetworkXNoPath(f"No path between {source} and {target}")
+    current_profiler().count('edge_relaxations', relaxations)
+    raise nx.NetworkXNoPath(f"No path between {G.node_ids[source]} and {G.node_ids[target]}")
 
 
-def astar_algorithm(G, demand_data, effective_distance_func, EPSILON, get_subgraphs=False):
+@solver_entry(native='compact')
+def astar_algorithm(G, demand_data, effective_distance_func, EPSILON, get_subgraphs=False, time_limit=None):
+    # time_limit — бюджет времени в секундах (None — без ограничения): по его исчерпании оставшиеся пары
+    # спроса не обслуживаются; stats['timed_out'] отмечает такой запуск, а stats['partial'] — что поток
+    # в G неполный: маршруты построены только для части пар
+    deadline = Deadline(time_limit)
+    stats = G.stats
+    stats['timed_out'] = stats['partial'] = False
     # 1. обнуляем потоки на рёбрах
-    for i, j in G.edges():                     # <- i, j
-        G.edges[i, j]['flow'] = 0.0
-
-    # 2. расставляем координаты, если их нет (для эвристики)
-    if not all('pos' in G.nodes[i] for i in G.nodes):           # <- i
-        suppliers = [i for i in G.nodes if G.nodes[i]['type'] == 'supplier']
-        retailers = [i for i in G.nodes if G.nodes[i]['type'] == 'retail']
-        dcs       = [i for i in G.nodes if G.nodes[i]['type'] == 'dc']
-
-        pos = {}
-        for i, node in enumerate(suppliers):
-            pos[node] = (0, i)
-        for i, node in enumerate(retailers):
-            pos[node] = (2, i / 2)
-        for i, node in enumerate(dcs):
-            pos[node] = (1, i / 3)
-
-        nx.set_node_attributes(G, pos, 'pos')
-
-    # 3. эвристика – евклидово расстояние между координатами
-    def heuristic(i, j):
-        return math.dist(G.nodes[i]['pos'], G.nodes[j]['pos'])
-
-    fulfilled = defaultdict(lambda: defaultdict(float))
-
-    # 4. один проход: обслуживаем все пары спроса
-    for supplier, retail_map in demand_data.items():             # <- supplier ≡ i
-        for retail_node, volume in retail_map.items():           # <- retail_node ≡ j
+    flow = G.edge_attrs['flow']
+    flow[:] = 0.0
+
+    # 2. эвристика – евклидово расстояние между координатами узлов
+    x, y = node_positions(G)
+
+    # замеры фаз (при выключенном профилировании — пустые контексты, см. profiling)
+    prof = current_profiler()
+
+    # 3. один проход: обслуживаем все пары спроса
+    demand_data = as_demand(demand_data)
+    for supplier in demand_data:                                 # <- supplier ≡ i
+        if stats['timed_out']:
+            break
+        retail_nodes, volumes = demand_data.row(supplier)
+        for retail_node, volume in zip(retail_nodes.tolist(), volumes.tolist()):  # <- retail_node ≡ j
+            if deadline.expired():
+                stats['timed_out'] = stats['partial'] = True
+                break
             if volume <= 0:
                 continue
 
-            # 4.1. ищем кратчайший путь A*
+            # 3.1. ищем кратчайший путь A*
             try:
-                path = astar_shortest_path_loops(G, supplier, retail_node,
-                                                 heuristic, effective_distance_func)
-            except nx.NetworkXNoPath:
-                print(f"Путь не найден: {supplier} -> {retail_node}")
+                with prof.phase('shortest_path'):
+                    i, j = G.index[supplier], G.index[retail_node]
+                    weights = np.broadcast_to(np.asarray(effective_distance_func(flow), dtype=float), flow.shape)
+                    path = astar_shortest_path(G, i, j, np.hypot(x - x[j], y - y[j]), weights)
+            except (nx.NetworkXNoPath, KeyError):
+                tracing.current().warning('no_path', supplier=supplier, retail=retail_node)
                 continue
 
-            # 4.2. добавляем поток вдоль найденного пути
-            for k in range(len(path) - 1):
-                i, j = path[k], path[k + 1]                     # <- i, j
-                if G.has_edge(i, j):
-                    G.edges[i, j]['flow'] += float(volume)
-                else:                                           # обратное направление
-                    G.edges[j, i]['flow'] += float(volume)
-
-            fulfilled[supplier][retail_node] += volume
+            # 3.2. добавляем поток вдоль найденного пути
+            flow[path] += float(volume)
 
+    stats['converged'] = not stats['timed_out']
     return G
@@ -1,97 +1,87 @@
+import numpy as np
 import networkx as nx
-import math
-
-def dijkstra_shortest_path_loops(G, source, target, weight_attr='weight'):
-    dist = {i: math.inf for i in G.nodes}
-    prev = {}
-    visited = set()
-    dist[source] = 0
-
-    while True:
-        i_min = None
-        d_min = math.inf
-        for i in G.nodes:
-            if i not in visited and dist[i] < d_min:
-                d_min = dist[i]
-                i_min = i
-
-        if i_min is None:
-            break
-        if i_min == target:
-            break
-
-        visited.add(i_min)
-
-        for j in G.successors(i_min):
-            if j in visited:
-                continue
-            weight = G.edges[i_min, j][weight_attr]
-            alt = dist[i_min] + weight
-            if alt < dist[j]:
-                dist[j] = alt
-                prev[j] = i_min
-
-    if target not in prev and target != source:
-        raise nx.NetworkXNoPath(f"No path between {source} and {target}")
-
-    path = [target]
-    while path[-1] != source:
-        path.append(prev[path[-1]])
-    path.reverse()
+from compact_graph import CompactGraph, TYPE_CODE, shortest_path_tree, tree_path, solver_entry
+from demand import as_demand
+from iteration import Deadline
+from profiling import current
+import tracing
+
+SUPPLIER, DC, RETAIL = TYPE_CODE['supplier'], TYPE_CODE['dc'], TYPE_CODE['retail']
+
+
+# Ориентированная сеть для поиска путей: ребро проходится только от поставщика к РЦ или магазину
+# и от РЦ к магазину, в какую бы сторону оно ни было записано во входном графе; остальные рёбра
+# (между узлами одного типа) в маршруты не входят. Возвращает CompactGraph на тех же узлах
+# и номер ребра входного графа для каждого его ребра.
+def routing_graph(G):
+    edges = np.flatnonzero(G.active)
+    ts, td = G.node_type[G.src[edges]], G.node_type[G.dst[edges]]
+    forward = ((ts == SUPPLIER) & (td != SUPPLIER)) | ((ts == DC) & (td == RETAIL))
+    backward = ~forward & (((td == SUPPLIER) & (ts != SUPPLIER)) | ((td == DC) & (ts == RETAIL)))
+    src = np.concatenate([G.src[edges[forward]], G.dst[edges[backward]]])
+    dst = np.concatenate([G.dst[edges[forward]], G.src[edges[backward]]])
+    origin = np.concatenate([edges[forward], edges[backward]])
+    # пара встречных рёбер ориентированного графа даёт одно ребро маршрута — по прямому ребру
+    _, first = np.unique(src.astype(np.int64) * G.n_nodes + dst, return_index=True)
+    first.sort()
+    route = CompactGraph(G.node_ids, G.node_type, src[first], dst[first], directed=True)
+    return route, origin[first]
+
+
+# Кратчайший путь source → target (индексы узлов) по весам рёбер weights.
+# Возвращает номера рёбер пути; nx.NetworkXNoPath, если target недостижим.
+def dijkstra_shortest_path(G, source, target, weights):
+    dist, pred = shortest_path_tree(G, source, weights, G.active, target=target)
+    # поиск просматривает рёбра узлов, закрытых до target
+    done = dist < dist[target] if np.isfinite(dist[target]) else np.isfinite(dist)
+    current().count('edge_relaxations', int(np.diff(G.out_ptr)[done].sum()))
+    path = tree_path(G, pred, source, target)
+    if path is None:
+        raise nx.NetworkXNoPath(f"No path between {G.node_ids[source]} and {G.node_ids[target]}")
     return path
 
 
-def dijkstra_algorithm(G, demand_data, effective_distance_func, EPSILON, get_subgraphs=False):
-    for i, j in G.edges():
-        G.edges[i, j]['flow'] = 0
-
-    temp_G = nx.DiGraph()
-    for i, j in G.edges():
-        type_i = G.nodes[i]['type']
-        type_j = G.nodes[j]['type']
-
-        def add_dir(u, v):
-            w = effective_distance_func(G.edges[u, v]['flow'])
-            temp_G.add_edge(u, v, weight=w)
+@solver_entry(native='compact')
+def dijkstra_algorithm(G, demand_data, effective_distance_func, EPSILON, get_subgraphs=False, time_limit=None):
+    # time_limit — бюджет времени в секундах (None — без ограничения): по его исчерпании оставшиеся пары
+    # спроса не обслуживаются; stats['timed_out'] отмечает такой запуск, а stats['partial'] — что поток
+    # в G неполный: маршруты построены только для части пар
+    deadline = Deadline(time_limit)
+    stats = G.stats
+    stats['timed_out'] = stats['partial'] = False
+    flow = G.edge_attrs['flow']
+    flow[:] = 0
 
-        if type_i == 'supplier' and type_j in ['dc', 'retail']:
-            add_dir(i, j)
-        elif type_j == 'supplier' and type_i in ['dc', 'retail']:
-            add_dir(j, i)
-        elif type_i == 'dc' and type_j == 'retail':
-            add_dir(i, j)
-        elif type_j == 'dc' and type_i == 'retail':
-            add_dir(j, i)
+    route, origin = routing_graph(G)
 
+    # замеры фаз (при выключенном профилировании — пустые контексты, см. profiling)
+    prof = current()
+    demand_data = as_demand(demand_data)
     for supplier, retail_map in demand_data.items():
-        remaining = sum(retail_map.values())
+        if stats['timed_out']:
+            break
+        remaining = demand_data.total(supplier)
 
         for retail_node, volume in retail_map.items():
+            if deadline.expired():
+                stats['timed_out'] = stats['partial'] = True
+                break
             if volume <= 0 or remaining <= 0:
                 continue
 
-            for i, j in temp_G.edges():
-                if G.has_edge(i, j):
-                    flow_edge = G.edges[i, j]
-                else:
-                    flow_edge = G.edges[j, i]
-                temp_G.edges[i, j]['weight'] = effective_distance_func(flow_edge['flow'])
+            with prof.phase('edge_weights'):
+                weights = np.broadcast_to(np.asarray(effective_distance_func(flow[origin]), dtype=float), origin.shape)
 
             try:
-                path = dijkstra_shortest_path_loops(temp_G, supplier, retail_node, weight_attr='weight')
-            except nx.NetworkXNoPath:
-                print(f"Нет пути от поставщика {supplier} к точке {retail_node}")
+                with prof.phase('shortest_path'):
+                    path = dijkstra_shortest_path(route, G.index[supplier], G.index[retail_node], weights)
+            except (nx.NetworkXNoPath, KeyError):
+                tracing.current().warning('no_path', supplier=supplier, retail=retail_node)
                 continue
 
             send_vol = min(volume, remaining)
-
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i + 1]
-                if G.has_edge(u, v):
-                    G.edges[u, v]['flow'] += send_vol
-                else:
-                    G.edges[v, u]['flow'] += send_vol
-
+            flow[origin[path]] += send_vol
             remaining -= send_vol
 
+    stats['converged'] = not stats['timed_out']
     return G
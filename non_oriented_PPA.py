@@ -1,147 +1,83 @@
-from sympy import symbols, diff, lambdify 
+import numpy as np
 from non_oriented_graph import create_subgraphs
+from compact_graph import solver_entry, solver_iter
+from iteration import physarum_loop, run_to_end
 
 # Рассчитывает давление в каждом узле на основе связей и спроса (или предложения) с учётом проводимости рёбер.
 # Для каждого узла вычисляется давление с использованием системы уравнений, аналогичной уравнению Пуассона,
 # где давление зависит от связей с соседями и спроса/предложения.
-def calculate_node_pressures(g):
-    # Перебор узлов в подграфе g: node: текущий узел.
-    # type - тип узла (например, supplier, retail или другие типы, например, dc — распределительные центры).
-    nodes = g._nodes
-    for node in g._node_list:
-        equation_right = g._rhs[node]
-        numerator = 0
-        denominator = 0
-        # Для каждого соседа:
-        # Числитель рассчитывается как сумма произведений проводимости ребра,
-        # делённой на длину ребра, и давления на соседнем узле:
-        # Знаменатель — это сумма значений проводимости рёбер, делённой на их длину для всех соседей:
-        for neighbour, data in g[node].items():
-            w = data['conductivity'] / data['length']
-            numerator   += w * nodes[neighbour]['pressure']
-            denominator += w
-        if denominator == 0:
-            nodes[node]['pressure'] = 0  # или пропустить узел
-        else:
-            nodes[node]['pressure'] = (numerator - equation_right) / denominator
+# Проход Гаусса — Зейделя по узлам выполняется сразу для всех подграфов: строка k массивов — поставщик k.
+def calculate_node_pressures(graphs):
+    # стянутые цепочки узлов степени 2 входят в проход как одно ребро (номер E + c)
+    ptr, inc_edges, inc_nbrs = graphs.sweep_incidence()
+    # Вес ребра: проводимость, делённая на длину (у рёбер вне подграфа проводимость 0)
+    edge_weight = graphs.conductivity / graphs.length
+    weight = graphs.sweep_weights(edge_weight)
+    pressure = graphs.pressure
+    rhs = graphs.rhs
+    for node in graphs.sweep_nodes:
+        edges = inc_edges[ptr[node]:ptr[node + 1]]
+        # Числитель — сумма весов рёбер, умноженных на давление в соседних узлах,
+        # знаменатель — сумма весов рёбер узла
+        w = weight[:, edges]
+        numerator = np.einsum('ij,ij->i', w, pressure[:, inc_nbrs[ptr[node]:ptr[node + 1]]])
+        denominator = w.sum(axis=1)
+        # если у узла нет рёбер, давление 0
+        safe = np.where(denominator == 0, 1, denominator)
+        pressure[:, node] = np.where(denominator == 0, 0, (numerator - rhs[:, node]) / safe)
+    # давления внутренних узлов цепочек восстанавливаются по давлениям их концов
+    graphs.finish_sweep(edge_weight)
 
 # Обновляет значения потока и проводимости для рёбер графа.
 # Поток между двумя узлами пропорционален разности их давлений,
 # а проводимость рёбер обновляется с учётом текущего потока.
-def update_flow_and_conductivity(g):
-    nodes = g._nodes
-    edata = g._edata
-    for i, j in g._edge_list:
-        data = edata[i, j]
-        # Поток через ребро между узлами 𝑖 и 𝑗 рассчитывается с учётом разницы их давлений:
-        # Где: conductivity — проводимость рёбер, которая влияет на способность передавать поток,
-        # length — длина ребра, которая может быть метафорой для "стоимости" или "удобства" пути,
-        # pressure_i и pressure_j — давление в узлах 𝑖 и 𝑗, которые связаны этим ребром.
-        pressure_diff = nodes[i]['pressure'] - nodes[j]['pressure']
-        flow = data['conductivity'] / data['length'] * pressure_diff
-        edata[i, j]['flow'] = flow
-        prev = data['conductivity']
-        edata[i, j]['prev_conductivity'] = prev
-        edata[i, j]['conductivity'] = (prev + abs(flow)) / 2
-
-# Подсчитывает общий поток по всему графу, суммируя потоки, вычисленные на уровне подграфов.
-# Это позволяет обновить потоки на уровне всего графа с учётом всех локальных решений.
-def calculate_total_flow(G, graphs):
-    for edge in G.edges:
-        G.edges[edge]['flow'] = 0
-    for g in graphs:
-        for i, j, flow in g.edges.data('flow'):
-            if flow > 0:
-                G.edges[i, j]['flow'] += flow
-
+def update_flow_and_conductivity(graphs):
+    G = graphs.G
+    # Где: conductivity — проводимость рёбер, которая влияет на способность передавать поток,
+    # length — длина ребра, которая может быть метафорой для "стоимости" или "удобства" пути,
+    # pressure_i и pressure_j — давление в узлах 𝑖 и 𝑗, которые связаны этим ребром.
+    pressure_diff = graphs.pressure[:, G.src] - graphs.pressure[:, G.dst]
+    graphs.flow[:] = graphs.conductivity / graphs.length * pressure_diff
+    graphs.prev_conductivity[:] = graphs.conductivity
+    graphs.conductivity[:] = (graphs.prev_conductivity + np.abs(graphs.flow)) / 2
 
 # Обновляет длину рёбер с учётом потока и функции эффективного расстояния E(Q).
-def update_edge_length(G, g, E_func, dE_func):
-    edata = g._edata
-    for i, j in g._edge_list:
-        data = edata[i, j]
-        flow = G.edges[i, j]['flow']
-        edata[i, j]['length'] = (data['length'] + E_func(flow) + data['flow'] * dE_func(flow)) / 2
+# E(Q) и E'(Q) считаются один раз для каждого ребра общего графа и применяются ко всем подграфам.
+def update_edge_length(G, graphs, E_func, dE_func):
+    flow = G.edge_attrs['flow']
+    E_values = np.broadcast_to(E_func(flow), flow.shape)
+    dE_values = np.broadcast_to(dE_func(flow), flow.shape)
+    graphs.fill('length', (graphs.length + E_values + graphs.flow * dE_values) / 2, outside=1.0)
 
-def term_criteria(graphs, tol):
-    diff, total = 0.0, 0.0
-    for g in graphs:
-        for i, j, d in g.edges(data=True):
-            diff  += abs(d['conductivity'] - d['prev_conductivity'])
-            total += d['prev_conductivity']
-    return diff / (total + 1e-12) < tol
+# Относительное изменение проводимостей за итерацию
+def conductivity_change(graphs):
+    diff = np.abs(graphs.conductivity - graphs.prev_conductivity).sum()
+    total = graphs.prev_conductivity.sum()
+    return diff / (total + 1e-12)
 
-def _unpack_graph(g):
-    # списки узлов и рёбер
-    g._node_list = list(g.nodes())
-    g._edge_list = list(g.edges())
-    g._nodes     = g.nodes      # быстрая ссылка
-    g._edata     = g.edges
-
-    # --------- вычисляем правую часть b_i один раз -----------
-    rhs = {}
-    s_id = g.graph['s_id']      # «свой» поставщик для retail-узлов
-    for node in g._node_list:
-        ntype = g._nodes[node]['type']
-        if ntype == 'supplier':
-            rhs[node] = -sum(g._nodes[node]['demand'].values())
-        elif ntype == 'retail':
-            rhs[node] = g._nodes[s_id]['demand'].get(node, 0.0)
-        else:
-            rhs[node] = 0
-    g._rhs = rhs            # кэш
+def term_criteria(graphs, tol):
+    return conductivity_change(graphs) < tol
 
-def _refresh_cache(g):
-    """пересчитать списки после удаления рёбер"""
-    g._edge_list = list(g.edges())
-    g._edata     = g.edges
+# Итерации алгоритма по одной: после каждой выдаётся Snapshot (номер итерации, относительное изменение
+# проводимостей, поток); потребитель может прекратить перебор в любой момент — G при этом содержит поток
+# последней выполненной итерации. Значение return генератора — подграфы (SubgraphBundle).
+@solver_iter
+def physarum_iter(G, demand_data, effective_distance_function, epsilon, init='default', aggregate=False, max_iterations=100, prune_patience=1, prune_margin=0.0, time_limit=None, checkpoint=None):
+    # time_limit — бюджет времени в секундах на весь запуск (None — без ограничения);
+    # по его исчерпании возвращается итерация с наименьшей ошибкой validate_flows (номер — G.stats['best_iteration']),
+    # в G.stats отмечается, сошёлся ли алгоритм.
+    # Общий поток — сумма положительных потоков подграфов; со второй итерации удаляются рёбра с потоком
+    # меньше 1, prune_patience и prune_margin — гистерезис удаления (см. pruning). Цикл — iteration.physarum_loop.
+    return physarum_loop(G, demand_data, effective_distance_function, 'non_oriented_PPA', create_subgraphs,
+                         calculate_node_pressures, update_flow_and_conductivity, update_edge_length, conductivity_change,
+                         converged=lambda residual: residual < epsilon, init=init, aggregate=aggregate,
+                         max_iterations=max_iterations, prune=(1, prune_patience, prune_margin),
+                         prune_when=lambda iteration: iteration > 1, time_limit=time_limit, checkpoint=checkpoint)
 
 # Алгоритм выполняет несколько итераций, в каждой из которых рассчитывает давление в узлах,
 # обновляет потоки и проводимости рёбер, а затем обновляет длины рёбер.
-def physarum_algorithm(G, demand_data, effective_distance_function, epsilon):
-    graphs = create_subgraphs(G, demand_data)
-    for g in graphs:
-        _unpack_graph(g)
-    # Создаём символьную переменную Q для функции E(Q), которая будет использоваться для вычисления расстояния.
-    # Функция E(Q) используется для расчёта расстояния с учётом потока, а её производная помогает учитывать изменения в длине рёбер.
-    # Вычисляем производную функции E(Q) по Q. Это даст нам информацию о том, как функция E(Q) изменяется
-    # при изменении потока (Q). Производная будет использоваться для уточнения длины рёбер в зависимости от потока.
-    Q = symbols('Q')
-    E_sym  = effective_distance_function(Q)
-    dE_sym = diff(E_sym, Q)
-    # lambdify → превращаем в быстрые NumPy-функции
-    E_func  = lambdify(Q, E_sym,  'numpy')
-    dE_func = lambdify(Q, dE_sym, 'numpy')
-    max_iterations = 100
-    check_every = 10
-    for iter_num in range(max_iterations):
-        for g in graphs:
-            calculate_node_pressures(g)
-            update_flow_and_conductivity(g)
-
-        calculate_total_flow(G, graphs)
-
-        for g in graphs:
-            update_edge_length(G, g, E_func, dE_func)
-            
-        if term_criteria(graphs, epsilon):
-            # print(f"PPA converged in {iter_num} iterations")
-            break
-        
-        if iter_num > 0:
-                # 1. собираем список удаляемых рёбер
-                edges_to_remove = [(i, j) for i, j in list(G.edges)
-                                if G.edges[i, j]['flow'] < 1]
-
-                if edges_to_remove:
-                    # 2. удаляем из исходного графа
-                    G.remove_edges_from(edges_to_remove)
-
-                    # 3. удаляем из подграфов и обновляем кэш
-                    for g in graphs:
-                        g.remove_edges_from([e for e in edges_to_remove if g.has_edge(*e)])
-                        _refresh_cache(g)                       #  <-- главное!
-
-                    # print(f"Iteration {iter_num}: removed {len(edges_to_remove)} edges")
-        
-    return G
\ No newline at end of file
+@solver_entry(native='compact')
+def physarum_algorithm(G, demand_data, effective_distance_function, epsilon, init='default', aggregate=False, get_subgraphs=False, max_iterations=100, prune_patience=1, prune_margin=0.0, time_limit=None, checkpoint=None):
+    graphs = run_to_end(physarum_iter(G, demand_data, effective_distance_function, epsilon, init, aggregate,
+                                      max_iterations, prune_patience, prune_margin, time_limit, checkpoint))
+    return graphs.expand() if get_subgraphs else G
@@ -1,6 +1,10 @@
 import networkx as nx
-import random
+import numpy as np
 import matplotlib.pyplot as plt
+from compact_graph import TYPE_CODE, as_networkx
+from shared_subgraphs import SubgraphBundle
+from preprocessing import preprocess_subgraphs
+from reachability import ReachabilityIndex
 import general_graph as gen
 
 # Создаёт граф с узлами разных типов (поставщики, распределительные центры, розничные точки)
@@ -21,34 +25,25 @@ def create_graph():
 
 # Создаёт подграфы для каждого поставщика, который соединяется с распределительными центрами и розничными точками,
 # и добавляет характеристики рёбер и узлов.
+# G — CompactGraph; подграфы — маски над его общей топологией (SubgraphBundle), а не копии графа.
 def create_subgraphs(G, demand_data):
-    graphs = []
-    suppliers = [n for n, t in G.nodes(data='type') if t == 'supplier']
-    for supplier in suppliers:
-        # Найдём все узлы, достижимые от поставщика supplier
-        reachable_nodes = nx.node_connected_component(G, supplier)
-        # Оставим только dc и retail из reachable
-        reachable_dc_retail = [n for n in reachable_nodes if G.nodes[n]['type'] in ('dc', 'retail')]
-        
-        g = nx.subgraph(G, [supplier] + reachable_dc_retail).copy()
-        g.graph["s_id"] = supplier
-        g.nodes[supplier]['demand'] = demand_data[supplier]
-        
-        for i, j in g.edges:
-            g.edges[i, j].update({
-                'flow': 0,
-                'conductivity': random.uniform(1e-6, 1),
-                'pheromone': G.edges[i, j].get('pheromone', 1.0),  # копия из оригинала
-                'prev_conductivity': 0,
-                'length': 1
-            })
-        for node in g.nodes:
-            g.nodes[node]['pressure'] = 0
-        graphs.append(g)
+    suppliers = G.nodes_of_type('supplier')
+    not_supplier = G.node_type != TYPE_CODE['supplier']
+    # Компоненты связности считаются один раз на весь граф
+    reach = ReachabilityIndex(G)
+    # Все узлы компоненты поставщика supplier, из которых оставим только dc и retail
+    node_mask = reach.masks(suppliers) & not_supplier
+    node_mask[np.arange(len(suppliers)), suppliers] = True
+    graphs = SubgraphBundle(G, suppliers, node_mask, demand_data, reach)
+    # Оставляем только узлы на путях к потребителям со спросом и стягиваем цепочки узлов степени 2
+    preprocess_subgraphs(graphs)
+    graphs.fill('conductivity', np.random.uniform(1e-6, 1, graphs.edge_mask.shape))
+    graphs.fill('pheromone', G.edge_attrs['pheromone'])  # копия из оригинала
     return graphs
 
 # Вывод графа
 def draw_graph(G, edge_label_attr='flow', title = 'optimisation algorithm', solution = True, time = 0):
+    G = as_networkx(G)
     fig, ax = plt.subplots(figsize=(16, 8))
     
     # Группируем узлы по типам
@@ -1,7 +1,13 @@
-import networkx as nx
 import numpy as np
 from random import choices
 from oriented_graph import create_subgraphs
+from seeding import seed_pheromones
+from flow_aggregation import FlowAggregator
+from compact_graph import solver_entry, solver_iter, shortest_path_tree, tree_path
+from profiling import current
+from iteration import Snapshot, Deadline, run_to_end
+from checkpoint import as_checkpoint, ACO_STATE
+import tracing
 
 # ---------------------- параметры -----------------------------
 alpha = 1
@@ -18,165 +24,205 @@ STAGNATE   = 1          # стоп, если нет улучшения N эпо
 
 def init_feromones(graphs):
     """ставим pheromone и сразу кешируем эвристику eta=1/length."""
-    for g in graphs:
-        supplier = g.graph['s_id']
-        demand_nodes = g.nodes[supplier]['demand'].keys()
-
-        for u, v, d in g.edges(data=True):
-            if u == supplier and v in demand_nodes:
-                d['pheromone'] = 5.0
-            else:
-                d['pheromone'] = 1.0 + np.random.rand() * 0.1
-            d['eta'] = 1.0 / d['length'] if d['length'] > 0 else 1.0
-            d.setdefault('flow', 0.0)      # чтобы дальше не проверять
-
-
-def calculate_total_flow(G, graphs):
-    for edge in G.edges:
-        G.edges[edge]['flow'] = 0.0
-    for g in graphs:
-        for u, v, d in g.edges(data=True):
-            if d['flow'] > 0:
-                G.edges[u, v]['flow'] += d['flow']
-    return G
-
-
-def aco_algorithm(G, demand_data, effective_distance_function, epsilon):
-    graphs = create_subgraphs(G, demand_data)
+    G = graphs.G
+    pheromone = 1.0 + np.random.rand(*graphs.edge_mask.shape) * 0.1
+    for k, supplier in enumerate(graphs.suppliers):
+        demand_nodes = [G.index[n] for n in graphs.demand[k] if n in G.index]
+        edges = G.out_of(supplier)
+        pheromone[k, edges[np.isin(G.dst[edges], demand_nodes)]] = 5.0
+    graphs.fill('pheromone', pheromone)
+    graphs.eta = np.where(graphs.length > 0, 1.0 / graphs.length, 1.0)
+
+
+# Итерации муравьиного алгоритма по одной: после каждой выдаётся Snapshot (номер итерации, суммарная
+# стоимость путей муравьёв); потребитель может прекратить перебор в любой момент. Лучшие найденные решения
+# переносятся в поток G при завершении генератора, в том числе досрочном, поэтому во время перебора
+# flow снимка нулевой. Значение return генератора — подграфы (SubgraphBundle).
+@solver_iter
+def aco_iter(G, demand_data, effective_distance_function, epsilon, init='default', max_iterations=iterations, time_limit=None, checkpoint=None):
+    # time_limit — бюджет времени в секундах на весь запуск (None — без ограничения);
+    # по его исчерпании возвращается текущее решение, в G.stats отмечается, сошёлся ли алгоритм
+    deadline = Deadline(time_limit)
+    G.stats['converged'] = G.stats['timed_out'] = False
+    # замеры фаз, размеров и шагов муравьёв (при выключенном профилировании — пустые вызовы, см. profiling)
+    prof = current()
+    # события трассировки (по умолчанию только предупреждения, см. tracing)
+    tr = tracing.current()
+    with prof.phase('subgraphs'):
+        graphs = create_subgraphs(G, demand_data)
+    # размеры общего графа и массивов подграфов (для учёта памяти)
+    prof.gauge('graph_bytes', G.nbytes)
+    prof.gauge('subgraph_bytes', graphs.nbytes)
     init_feromones(graphs)
+    seed_pheromones(graphs, effective_distance_function, init)
 
-    best_solutions = {g.graph['s_id']: {'cost': float('inf'), 'solution': {}}
-                      for g in graphs}
+    best_solutions = {s_id: {'cost': float('inf'), 'solution': {}}
+                      for s_id in graphs.s_ids}
 
     best_global   = float('inf')   # для критерия стагнации
     stagnation_it = 0
+    # checkpoint — checkpoint.Checkpoint или путь к файлу: каждые checkpoint.every итераций состояние
+    # сохраняется в файл, а если файл уже есть, запуск продолжается с сохранённой итерации
+    checkpoint = as_checkpoint(checkpoint)
+    start = 0
+    if checkpoint is not None:
+        start, extra = checkpoint.restore(graphs, 'oriented_ACO')
+        if extra is not None:
+            best_solutions, best_global, stagnation_it = extra['best_solutions'], extra['best_global'], extra['stagnation_it']
 
-    for it in range(iterations):
-        total_epoch_cost = 0.0
-
-        for graph in graphs:
-            supplier = graph.graph['s_id']
-            demand   = graph.nodes[supplier]['demand']
-
-            # --- динамически подбираем число муравьёв -----------------
-            # num_ants = min(len([d for d in demand.values() if d > 0]) + 5, 5)
-            # ----------------------------------------------------------
-
-            all_paths, all_costs = [], []
-
-            for _ in range(num_ants):
-                ant_paths = {}
-                approx_cost = 0.0     # считаем только по длинам
-
-                for target, required_flow in demand.items():
-                    if required_flow == 0:
-                        continue
-                    path = construct_path(graph, supplier, target)
-                    if not path:
-                        continue
-                    ant_paths[target] = path
-
-                    path_len = sum(
-                        graph.edges[path[i], path[i + 1]]['length']
-                        for i in range(len(path) - 1)
-                    )
-                    approx_cost += path_len * required_flow
-
-                all_paths.append(ant_paths)
-                all_costs.append(approx_cost)
-
-            # -- выбираем top-k лучших по approx_cost -------------------
-            k = max(1, int(TOP_RATIO * len(all_costs)))
-            top_idx = np.argsort(all_costs)[:k]
-            # -----------------------------------------------------------
-
-            # пересчитываем «точную» цену для top-k и усиливаем
-            evaporate_pheromones(graph)
-            for idx in top_idx:
-                ant_paths = all_paths[idx]
-                exact_cost = 0.0
-                for target, path in ant_paths.items():
-                    required_flow = demand[target]
-                    flow_sum = 0.0
-                    for i in range(len(path) - 1):
-                        u, v = path[i], path[i + 1]
-                        flow_sum += effective_distance_function(
-                            graph.edges[u, v]['flow']
-                        )
-                    exact_cost += flow_sum * required_flow
-
-                reinforce_pheromones(graph, ant_paths, exact_cost)
-                total_epoch_cost += exact_cost
-
-                # запоминаем лучшее решение
-                if exact_cost < best_solutions[supplier]['cost']:
-                    best_solutions[supplier]['cost'] = exact_cost
-                    best_solutions[supplier]['solution'] = ant_paths
-
-        # ---------- критерий раннего выхода ----------------------------
-        if total_epoch_cost < best_global - 1e-3:
-            best_global   = total_epoch_cost
-            stagnation_it = 0
-        else:
-            stagnation_it += 1
-            if stagnation_it >= STAGNATE or best_global < epsilon:
+    try:
+        for it in range(start, max_iterations):
+            G.stats['iterations'] = it + 1
+            total_epoch_cost = 0.0
+
+            for k, supplier in enumerate(graphs.suppliers):
+                if deadline.expired():
+                    break
+                s_id     = graphs.s_ids[k]
+                demand   = graphs.demand[k]
+
+                # --- динамически подбираем число муравьёв -----------------
+                # num_ants = min(len([d for d in demand.values() if d > 0]) + 5, 5)
+                # ----------------------------------------------------------
+
+                all_paths, all_costs = [], []
+
+                for _ in range(num_ants):
+                    ant_paths = {}
+                    approx_cost = 0.0     # считаем только по длинам
+
+                    for target, required_flow in demand.items():
+                        if required_flow == 0 or target not in G.index:
+                            continue
+                        with prof.phase('construct_path'):
+                            path = construct_path(graphs, k, supplier, G.index[target])
+                        if not path:
+                            prof.count('failed_paths')
+                            continue
+                        prof.count('ant_steps', len(path))
+                        ant_paths[target] = path
+
+                        path_len = graphs.length[k, path].sum()
+                        approx_cost += path_len * required_flow
+
+                    all_paths.append(ant_paths)
+                    all_costs.append(approx_cost)
+
+                # рёбра путей всех муравьёв поставщика, хранимые до обновления феромонов
+                if prof.enabled:
+                    prof.gauge('ant_path_edges', sum(len(p) for paths in all_paths for p in paths.values()))
+
+                # -- выбираем top-k лучших по approx_cost -------------------
+                top = max(1, int(TOP_RATIO * len(all_costs)))
+                top_idx = np.argsort(all_costs)[:top]
+                # -----------------------------------------------------------
+
+                # пересчитываем «точную» цену для top-k и усиливаем
+                with prof.phase('pheromone'):
+                    evaporate_pheromones(graphs, k)
+                for idx in top_idx:
+                    ant_paths = all_paths[idx]
+                    exact_cost = 0.0
+                    with prof.phase('cost'):
+                        for target, path in ant_paths.items():
+                            required_flow = demand[target]
+                            flow_sum = np.sum(effective_distance_function(graphs.flow[k, path]))
+                            exact_cost += flow_sum * required_flow
+
+                    with prof.phase('pheromone'):
+                        reinforce_pheromones(graphs, k, ant_paths, exact_cost)
+                    total_epoch_cost += exact_cost
+
+                    # запоминаем лучшее решение
+                    if exact_cost < best_solutions[s_id]['cost']:
+                        best_solutions[s_id]['cost'] = exact_cost
+                        best_solutions[s_id]['solution'] = ant_paths
+
+            if deadline.expired():
+                # итерация могла быть прервана между поставщиками; решения остальных подграфов — прежние лучшие
+                G.stats['timed_out'] = True
+                tr.info('time_limit', iteration=it + 1)
                 break
-        # ----------------------------------------------------------------
-
-    # --- применяем лучшие найденные пути к потокам ----------------------
-    for graph in graphs:
-        supplier = graph.graph['s_id']
-        demand   = graph.nodes[supplier]['demand']
-        best_sol = best_solutions[supplier]['solution']
-
-        for target, path in best_sol.items():
-            req = demand[target]
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i + 1]
-                graph.edges[u, v]['flow'] += req
-
-    return calculate_total_flow(G, graphs)
-
-
-def construct_path(graph, start, end, retries=3):
-    """использует кешированную эвристику edge['eta']."""
+            if tr.sampled(it + 1):
+                tr.info('iteration', iteration=it + 1, total_cost=total_epoch_cost)
+            # ---------- критерий раннего выхода ----------------------------
+            converged = False
+            if total_epoch_cost < best_global - 1e-3:
+                best_global   = total_epoch_cost
+                stagnation_it = 0
+            else:
+                stagnation_it += 1
+                converged = stagnation_it >= STAGNATE or best_global < epsilon
+            yield Snapshot(G, graphs, it + 1, cost=total_epoch_cost, converged=converged)
+            if converged:
+                G.stats['converged'] = True
+                break
+            # ----------------------------------------------------------------
+            if checkpoint is not None and checkpoint.due(it + 1):
+                with prof.phase('checkpoint'):
+                    checkpoint.save(graphs, 'oriented_ACO', it + 1, ACO_STATE, best_solutions=best_solutions,
+                                    best_global=best_global, stagnation_it=stagnation_it)
+    finally:
+        # --- применяем лучшие найденные пути к потокам (и при досрочной остановке) ---
+        # общий поток по рёбрам G обновляется по мере добавления путей
+        flows = FlowAggregator(graphs)
+        for k, s_id in enumerate(graphs.s_ids):
+            demand   = graphs.demand[k]
+            best_sol = best_solutions[s_id]['solution']
+
+            with prof.phase('apply_solutions'):
+                for target, path in best_sol.items():
+                    flows.add(k, path, demand[target])
+
+    return graphs
+
+@solver_entry(native='compact')
+def aco_algorithm(G, demand_data, effective_distance_function, epsilon, init='default', get_subgraphs=False, max_iterations=iterations, time_limit=None, checkpoint=None):
+    graphs = run_to_end(aco_iter(G, demand_data, effective_distance_function, epsilon, init, max_iterations, time_limit, checkpoint))
+    return graphs if get_subgraphs else G
+
+
+def construct_path(graphs, k, start, end, retries=3):
+    """использует кешированную эвристику graphs.eta; возвращает номера рёбер пути."""
+    G = graphs.G
+    # шаг по стянутой цепочке ведёт сразу в её дальний конец (hops — номер пути цепочки или -1)
+    adjacency = graphs.walk_adjacency()
+    mask = graphs.edge_mask[k]
+    hop_ok = graphs.hop_mask(mask)
+    pheromone = graphs.pheromone[k]
+    eta = graphs.eta[k]
     for _ in range(retries):
-        path = [start]
+        path = []
         visited, current = {start}, start
 
         while current != end:
-            neighbors = [n for n in graph.neighbors(current)
-                         if n not in visited and graph.has_edge(current, n)]
-            if not neighbors:
+            edges, nbrs, hops = adjacency[current]
+            keep = mask[edges] & hop_ok[hops]
+            candidates = [(e, n, h) for e, n, h in zip(edges[keep].tolist(), nbrs[keep].tolist(), hops[keep].tolist())
+                          if n not in visited]
+            if not candidates:
                 break
-            weights = []
-            for n in neighbors:
-                d = graph.edges[current, n]
-                weights.append((d['pheromone'] ** alpha) * (d['eta'] ** beta))
+            chosen = [e for e, _, _ in candidates]
+            weights = (pheromone[chosen] ** alpha) * (eta[chosen] ** beta)
 
-            next_node = choices(neighbors, weights)[0]
-            path.append(next_node)
+            edge, next_node, hop = choices(candidates, weights)[0]
+            path.extend(graphs.hop_edges(edge, hop))
             visited.add(next_node)
             current = next_node
 
         if current == end:
             return path
 
-    try:
-        return nx.shortest_path(graph, start, end, weight='length')
-    except nx.NetworkXNoPath:
-        return None
+    _, pred = shortest_path_tree(G, start, graphs.length[k], mask)
+    return tree_path(G, pred, start, end)
 
 
-def evaporate_pheromones(graph):
-    for _, _, d in graph.edges(data=True):
-        d['pheromone'] *= (1 - rho)
+def evaporate_pheromones(graphs, k):
+    graphs.pheromone[k] *= (1 - rho)
 
 
-def reinforce_pheromones(graph, paths_dict, cost):
+def reinforce_pheromones(graphs, k, paths_dict, cost):
     if cost == 0:
         return
     for path in paths_dict.values():
-        for i in range(len(path) - 1):
-            u, v = path[i], path[i + 1]
-            graph.edges[u, v]['pheromone'] += Q_const / cost
+        graphs.pheromone[k, path] += Q_const / cost
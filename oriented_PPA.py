@@ -1,122 +1,73 @@
-from sympy import symbols, diff, lambdify
+import numpy as np
 from oriented_graph import create_subgraphs
-from itertools import chain
+from compact_graph import solver_entry, solver_iter
+from iteration import physarum_loop, run_to_end
 
-def calculate_node_pressures(g):
+def calculate_node_pressures(graphs):
     """
     Решаем уравнение Σ w_ij (p_i - p_j) = b_i
     по всем соседям j независимо от ориентации ребра.
+    Проход по узлам выполняется сразу для всех подграфов (строка k — поставщик k).
     """
-    nodes = g._nodes
-    for node in g._node_list:
-        b_i = g._rhs[node]          # правая часть
-        num = 0.0
-        den = 0.0
-
-        # объединяем предшественников и последователей
-        for nbr in set(chain(g.predecessors(node), g.successors(node))):
-            # корректно берём атрибуты для (nbr,node) или (node,nbr)
-            data = g[nbr][node] if g.has_edge(nbr, node) else g[node][nbr]
-            w = data['conductivity'] / data['length']
-            num += w * nodes[nbr]['pressure']
-            den += w
+    # стянутые цепочки узлов степени 2 входят в проход как одно ребро (номер E + c)
+    ptr, inc_edges, inc_nbrs = graphs.sweep_incidence()
+    edge_weight = graphs.conductivity / graphs.length
+    weight = graphs.sweep_weights(edge_weight)
+    pressure = graphs.pressure
+    rhs = graphs.rhs                # правая часть
+    for node in graphs.sweep_nodes:
+        # входящие и исходящие рёбра узла
+        edges = inc_edges[ptr[node]:ptr[node + 1]]
+        w = weight[:, edges]
+        num = np.einsum('ij,ij->i', w, pressure[:, inc_nbrs[ptr[node]:ptr[node + 1]]])
+        den = w.sum(axis=1)
 
         # если у узла нет рёбер, оставляем давление 0
-        nodes[node]['pressure'] = 0.0 if den == 0 else (num - b_i) / den
-
-def update_flow_and_conductivity(g):
-    nodes = g._nodes
-    edata = g._edata
-    for i, j in g._edge_list:
-        data = edata[i, j]
-        pressure_diff = nodes[i]['pressure'] - nodes[j]['pressure']
-        flow = data['conductivity'] / data['length'] * pressure_diff
-        edata[i, j]['flow'] = flow
-        prev = data['conductivity']
-        edata[i, j]['prev_conductivity'] = prev
-        edata[i, j]['conductivity'] = (prev + abs(flow)) / 2
-
-def calculate_total_flow(G, graphs):
-    for edge in G.edges:
-        G.edges[edge]['flow'] = 0
-    for g in graphs:
-        for i, j, flow in g.edges.data('flow'):
-            # if flow > 0:
-            G.edges[i, j]['flow'] += flow
-
-def update_edge_length(G, g, E_func, dE_func):
-    edata = g._edata
-    for i, j in g._edge_list:
-        data = edata[i, j]
-        flow = G.edges[i, j]['flow']
-        edata[i, j]['length'] = (data['length'] + E_func(flow) + data['flow'] * dE_func(flow)) / 2
+        safe = np.where(den == 0, 1, den)
+        pressure[:, node] = np.where(den == 0, 0.0, (num - rhs[:, node]) / safe)
+    # давления внутренних узлов цепочек восстанавливаются по давлениям их концов
+    graphs.finish_sweep(edge_weight)
+
+def update_flow_and_conductivity(graphs):
+    G = graphs.G
+    pressure_diff = graphs.pressure[:, G.src] - graphs.pressure[:, G.dst]
+    graphs.flow[:] = graphs.conductivity / graphs.length * pressure_diff
+    graphs.prev_conductivity[:] = graphs.conductivity
+    graphs.conductivity[:] = (graphs.prev_conductivity + np.abs(graphs.flow)) / 2
+
+def update_edge_length(G, graphs, E_func, dE_func):
+    flow = G.edge_attrs['flow']
+    E_values = np.broadcast_to(E_func(flow), flow.shape)
+    dE_values = np.broadcast_to(dE_func(flow), flow.shape)
+    graphs.fill('length', (graphs.length + E_values + graphs.flow * dE_values) / 2, outside=1.0)
+
+# Относительное изменение проводимостей за итерацию
+def conductivity_change(graphs):
+    diff = np.abs(graphs.conductivity - graphs.prev_conductivity).sum()
+    total = graphs.prev_conductivity.sum()
+    return diff / (total + 1e-12)
 
 def term_criteria(graphs, tol):
-    diff, total = 0.0, 0.0
-    for g in graphs:
-        for i, j, d in g.edges(data=True):
-            diff += abs(d['conductivity'] - d['prev_conductivity'])
-            total += d['prev_conductivity']
-    return diff / (total + 1e-12) < tol
-
-def _unpack_graph(g):
-    g._node_list = list(g.nodes())
-    g._edge_list = list(g.edges())
-    g._nodes     = g.nodes
-    g._edata     = g.edges
-    rhs = {}
-    s_id = g.graph['s_id']
-    for node in g._node_list:
-        ntype = g._nodes[node]['type']
-        if ntype == 'supplier':
-            rhs[node] = -sum(g._nodes[node]['demand'].values())
-        elif ntype == 'retail':
-            rhs[node] = g._nodes[s_id]['demand'].get(node, 0.0)
-        else:
-            rhs[node] = 0
-    g._rhs = rhs
-
-def _refresh_cache(g):
-    g._edge_list = list(g.edges())
-    g._edata     = g.edges
-
-def physarum_algorithm(G, demand_data, effective_distance_function, epsilon):
-    graphs = create_subgraphs(G, demand_data)
-    for g in graphs:
-        _unpack_graph(g)
-
-    Q = symbols('Q')
-    E_sym  = effective_distance_function(Q)
-    dE_sym = diff(E_sym, Q)
-    E_func  = lambdify(Q, E_sym,  'numpy')
-    dE_func = lambdify(Q, dE_sym, 'numpy')
-
-    max_iterations = 5
-
-    for iter_num in range(max_iterations):
-        for g in graphs:
-            calculate_node_pressures(g)
-            update_flow_and_conductivity(g)
-
-        calculate_total_flow(G, graphs)
-
-        for g in graphs:
-            update_edge_length(G, g, E_func, dE_func)
-
-        if term_criteria(graphs, epsilon):
-            # print(f"PPA converged in {iter_num} iterations")
-            break
-
-        if iter_num > 0:
-            edges_to_remove = [(i, j) for i, j in list(G.edges)
-                               if G.edges[i, j]['flow'] < 1]
-
-            if edges_to_remove:
-                G.remove_edges_from(edges_to_remove)
-                for g in graphs:
-                    g.remove_edges_from([e for e in edges_to_remove if g.has_edge(*e)])
-                    _refresh_cache(g)
-                # print(f"Iteration {iter_num}: removed {len(edges_to_remove)} edges")
-        
-
-    return G
+    return conductivity_change(graphs) < tol
+
+# Итерации алгоритма по одной: после каждой выдаётся Snapshot (номер итерации, относительное изменение
+# проводимостей, поток); потребитель может прекратить перебор в любой момент — G при этом содержит поток
+# последней выполненной итерации. Значение return генератора — подграфы (SubgraphBundle).
+@solver_iter
+def physarum_iter(G, demand_data, effective_distance_function, epsilon, init='default', aggregate=False, max_iterations=5, prune_patience=1, prune_margin=0.0, time_limit=None, checkpoint=None):
+    # time_limit — бюджет времени в секундах на весь запуск (None — без ограничения);
+    # по его исчерпании возвращается итерация с наименьшей ошибкой validate_flows (номер — G.stats['best_iteration']),
+    # в G.stats отмечается, сошёлся ли алгоритм.
+    # Общий поток — сумма потоков подграфов со знаком; со второй итерации удаляются рёбра с потоком
+    # меньше 1, prune_patience и prune_margin — гистерезис удаления (см. pruning). Цикл — iteration.physarum_loop.
+    return physarum_loop(G, demand_data, effective_distance_function, 'oriented_PPA', create_subgraphs,
+                         calculate_node_pressures, update_flow_and_conductivity, update_edge_length, conductivity_change,
+                         converged=lambda residual: residual < epsilon, positive=False, init=init, aggregate=aggregate,
+                         max_iterations=max_iterations, prune=(1, prune_patience, prune_margin),
+                         prune_when=lambda iteration: iteration > 1, time_limit=time_limit, checkpoint=checkpoint)
+
+@solver_entry(native='compact')
+def physarum_algorithm(G, demand_data, effective_distance_function, epsilon, init='default', aggregate=False, get_subgraphs=False, max_iterations=5, prune_patience=1, prune_margin=0.0, time_limit=None, checkpoint=None):
+    graphs = run_to_end(physarum_iter(G, demand_data, effective_distance_function, epsilon, init, aggregate,
+                                      max_iterations, prune_patience, prune_margin, time_limit, checkpoint))
+    return graphs.expand() if get_subgraphs else G
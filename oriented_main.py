@@ -5,6 +5,7 @@ from oriented_PPA import physarum_algorithm
 from oriented_ACO import aco_algorithm
 # from oriented_DJA import dijkstra_algorithm
 # from oriented_ASTAR import astar_algorithm
+from compact_graph import CompactGraph
 import general_graph as gen
 
 def time_counter(G, algo, algo_name):
@@ -16,12 +17,13 @@ def time_counter(G, algo, algo_name):
     return new_g, result, (end_time - start_time)
 
 def main():
-    G = create_graph()
+    # общая топология; каждый алгоритм работает на своём оверлее (потоки, длины, удалённые рёбра)
+    G = CompactGraph.from_networkx(create_graph())
     
-    # dja_G, dja_G_correct, dja_G_time = time_counter(G.copy(), dijkstra_algorithm, 'dijkstra algorithm')
-    # astar_G, astar_G_correct, astar_G_time = time_counter(G.copy(), astar_algorithm, 'astar algorithm')
-    aco_G, aco_G_correct, aco_G_time = time_counter(G.copy(), aco_algorithm, 'ant colony algorithm')
-   # ppa_G, ppa_G_correct, ppa_G_time = time_counter(G.copy(), physarum_algorithm, 'physarum algorithm') #   File "<lambdifygenerated-1>", line 2, in _lambdifygenerated OverflowError: (34, 'Result too large')
+    # dja_G, dja_G_correct, dja_G_time = time_counter(G.overlay(), dijkstra_algorithm, 'dijkstra algorithm')
+    # astar_G, astar_G_correct, astar_G_time = time_counter(G.overlay(), astar_algorithm, 'astar algorithm')
+    aco_G, aco_G_correct, aco_G_time = time_counter(G.overlay(), aco_algorithm, 'ant colony algorithm')
+   # ppa_G, ppa_G_correct, ppa_G_time = time_counter(G.overlay(), physarum_algorithm, 'physarum algorithm') #   File "<lambdifygenerated-1>", line 2, in _lambdifygenerated OverflowError: (34, 'Result too large')
  
     # draw_graph(dja_G, edge_label_attr='flow', title='dijkstra algorithm', solution = dja_G_correct, time = dja_G_time)
     # draw_graph(astar_G, edge_label_attr='flow', title='astar algorithm', solution = astar_G_correct, time = astar_G_time)
@@ -0,0 +1,306 @@
+import numpy as np
+
+# Предобработка подграфов поставщиков (SubgraphBundle) перед итерациями PPA и ACO:
+# 1) из подграфа убираются узлы и рёбра, не лежащие ни на одном пути от поставщика
+#    к розничной точке с положительным спросом этого поставщика;
+# 2) цепочки из транзитных узлов степени 2 стягиваются: проход по узлам (давление в PPA)
+#    и обход муравьёв (ACO) перескакивают цепочку целиком.
+# Атрибуты всех исходных рёбер сохраняются, поэтому потоки и феромоны по-прежнему считаются по рёбрам G.
+def preprocess_subgraphs(graphs):
+    prune_irrelevant(graphs)
+    graphs.chains = ChainContraction(graphs)
+    return graphs
+
+# Оставляет в подграфах только узлы, лежащие на путях поставщик → потребитель с положительным спросом.
+# Ориентированный граф: узел остаётся, если из него достижим хотя бы один такой потребитель
+# (по индексу достижимости graphs.reach; достижимость из поставщика уже учтена в маске).
+# Неориентированный граф: остаются блоки (компоненты двусвязности), лежащие в дереве блоков и точек
+# сочленения на путях от поставщика к его потребителям (см. _block_path_nodes).
+def prune_irrelevant(graphs):
+    G = graphs.G
+    node_mask = graphs.node_mask.copy()
+    terminal = graphs.rhs != 0
+    terminal[np.arange(len(graphs)), graphs.suppliers] = True
+    for k in range(len(graphs)):
+        if G.directed:
+            node_mask[k] &= _reaches_terminal(graphs, k, terminal[k])
+        else:
+            node_mask[k] = _block_path_nodes(G, node_mask[k], terminal[k], graphs.suppliers[k])
+        node_mask[k, graphs.suppliers[k]] = True
+    graphs.restrict(node_mask)
+
+def _reaches_terminal(graphs, k, terminal):
+    reach = graphs.reach
+    targets = 0
+    for c in np.unique(reach.component[np.flatnonzero(terminal & graphs.node_mask[k])]).tolist():
+        targets |= 1 << c
+    keep = np.zeros(reach.next_id, dtype=bool)
+    for c in np.unique(reach.component[graphs.node_mask[k]]).tolist():
+        keep[c] = reach.reach[c] & targets != 0
+    return keep[reach.component]
+
+# Узлы подграфа mask, лежащие на простых путях от source к узлам terminal (неориентированный граф).
+# Простой путь между двумя узлами проходит ровно по блокам на пути между ними в дереве блоков
+# и точек сочленения, поэтому остаются узлы этих блоков; висячие деревья и циклы, присоединённые
+# к пути одной точкой сочленения, отбрасываются.
+# Блоки находятся обходом в глубину из source (алгоритм Тарьяна, без рекурсии): блок закрывается,
+# когда low[c] >= disc[p] для ребра дерева p — c; p — голова блока (ближайший к source узел),
+# остальные узлы блока выходят из стека. У каждого узла, кроме source, ровно один блок, где он
+# не голова, поэтому путь к source в дереве блоков — цепочка блок узла → голова → блок головы → ...
+def _block_path_nodes(G, mask, terminal, source):
+    ptr, inc_edges, inc_nbrs = G.incidence()
+    allowed = (mask[G.src] & mask[G.dst] & G.active).tolist()
+    ptr, inc_edges, inc_nbrs = ptr.tolist(), inc_edges.tolist(), inc_nbrs.tolist()
+    disc = [-1] * G.n_nodes
+    low = [0] * G.n_nodes
+    block_of = [-1] * G.n_nodes
+    heads, members = [], []
+    disc[source] = 0
+    counter = 1
+    stack = []
+    # кадр обхода: узел, ребро дерева, по которому в него пришли, следующая позиция в инцидентности
+    work = [[source, -1, ptr[source]]]
+    while work:
+        frame = work[-1]
+        i, via, pos = frame
+        if pos < ptr[i + 1]:
+            frame[2] = pos + 1
+            e = inc_edges[pos]
+            if e == via or not allowed[e]:
+                continue
+            j = inc_nbrs[pos]
+            if disc[j] < 0:
+                disc[j] = low[j] = counter
+                counter += 1
+                stack.append(j)
+                work.append([j, e, ptr[j]])
+            elif disc[j] < low[i]:
+                low[i] = disc[j]
+            continue
+        work.pop()
+        if not work:
+            break
+        p = work[-1][0]
+        if low[i] < low[p]:
+            low[p] = low[i]
+        if low[i] >= disc[p]:
+            block = len(heads)
+            nodes = []
+            while True:
+                node = stack.pop()
+                block_of[node] = block
+                nodes.append(node)
+                if node == i:
+                    break
+            heads.append(p)
+            members.append(nodes)
+
+    keep = np.zeros(G.n_nodes, dtype=bool)
+    keep[source] = True
+    marked = [False] * len(heads)
+    for t in np.flatnonzero(terminal & mask).tolist():
+        block = block_of[t]
+        while block >= 0 and not marked[block]:
+            marked[block] = True
+            keep[members[block]] = True
+            keep[heads[block]] = True
+            block = block_of[heads[block]]
+    return keep
+
+
+# Стягивание цепочек u — a — b — ... — v, у которых все внутренние узлы:
+# не поставщики и без спроса ни у одного поставщика, имеют ровно два ребра в объединении подграфов
+# (в ориентированном графе — одно входящее и одно исходящее) и входят ровно в те же подграфы, что и оба их ребра.
+# Внутренние узлы выпадают из прохода Гаусса — Зейделя: цепочка заменяется одним ребром u — v
+# с последовательным весом 1 / Σ(1 / w), а давления внутри цепочки восстанавливаются после прохода
+# линейной интерполяцией по сопротивлениям. Для муравьёв цепочка — один шаг из u в v по всем её рёбрам.
+class ChainContraction:
+    def __init__(self, graphs):
+        self.graphs = graphs
+        G = graphs.G
+        interior, ends = self._find_interior()
+        paths, nodes, endpoints = self._build_chains(interior, ends)
+
+        self.n_chains = len(paths)
+        self.chain_ptr = np.zeros(self.n_chains + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in paths], out=self.chain_ptr[1:])
+        self.chain_edges = np.array([e for p in paths for e in p], dtype=np.int64)
+        self.chain_nodes = np.array([i for n in nodes for i in n], dtype=np.int64)
+        self.endpoints = np.array(endpoints, dtype=np.int64).reshape(-1, 2)
+        self.in_chain = np.zeros(G.n_edges, dtype=bool)
+        self.in_chain[self.chain_edges] = True
+
+        # позиции рёбер цепочек, за которыми следует внутренний узел (все, кроме последнего ребра цепочки)
+        last = self.chain_ptr[1:] - 1
+        inner = np.ones(len(self.chain_edges), dtype=bool)
+        inner[last] = False
+        self.inner_pos = np.flatnonzero(inner)
+        self.inner_chain = np.repeat(np.arange(self.n_chains), np.diff(self.chain_ptr) - 1)
+
+        skip = np.zeros(G.n_nodes, dtype=bool)
+        skip[self.chain_nodes] = True
+        self.sweep_nodes = graphs.active_nodes[~skip[graphs.active_nodes]]
+        self.incidence = self._build_incidence()
+        # пути муравьёв: цепочка c проходится из u (paths[c]) и, в неориентированном графе, из v (paths[C + c])
+        self.paths = paths if G.directed else paths + [p[::-1] for p in paths]
+        self._walk = None
+
+    # Кандидаты во внутренние узлы и их два ребра (в ориентированном графе — входящее и исходящее)
+    def _find_interior(self):
+        graphs = self.graphs
+        G = graphs.G
+        union = graphs.edge_mask.any(axis=0)
+        candidate = graphs.node_mask.any(axis=0) & ~(graphs.rhs != 0).any(axis=0)
+        candidate[graphs.suppliers] = False
+        out_deg = np.bincount(G.src[union], minlength=G.n_nodes)
+        in_deg = np.bincount(G.dst[union], minlength=G.n_nodes)
+        if G.directed:
+            candidate &= (in_deg == 1) & (out_deg == 1)
+        else:
+            candidate &= (in_deg + out_deg) == 2
+        ptr, inc_edges, _ = G.incidence()
+        ends = {}
+        for i in np.flatnonzero(candidate).tolist():
+            edges = inc_edges[ptr[i]:ptr[i + 1]]
+            edges = edges[union[edges]]
+            if G.directed and G.dst[edges[0]] != i:
+                edges = edges[::-1]  # сначала входящее ребро
+            # в каждом подграфе узел либо есть вместе с обоими рёбрами, либо его нет
+            present = graphs.node_mask[:, i]
+            if (graphs.edge_mask[:, edges[0]] == present).all() and (graphs.edge_mask[:, edges[1]] == present).all():
+                ends[i] = (int(edges[0]), int(edges[1]))
+        return set(ends), ends
+
+    # Собирает цепочки: рёбра от u к v, внутренние узлы по порядку и концы (u, v).
+    # Цепочки, у которых концы совпадают, и циклы из одних внутренних узлов не стягиваются.
+    def _build_chains(self, interior, ends):
+        seen = set()
+        paths, nodes, endpoints = [], [], []
+        for start in sorted(interior):
+            if start in seen:
+                continue
+            # от start идём в обе стороны до первого узла, не являющегося внутренним
+            left, left_inner, u = self._extend(start, ends[start][0], ends)
+            right, right_inner, v = self._extend(start, ends[start][1], ends)
+            seen.add(start)
+            seen.update(left_inner)
+            seen.update(right_inner)
+            if u == start or u == v:
+                continue
+            paths.append(left[::-1] + right)
+            nodes.append(left_inner[::-1] + [start] + right_inner)
+            endpoints.append((u, v))
+        return paths, nodes, endpoints
+
+    # Идёт от start по ребру edge, пока встречаются внутренние узлы.
+    # Возвращает пройденные рёбра, внутренние узлы (без start) и первый невнутренний узел (или start, если цепочка — цикл).
+    def _extend(self, start, edge, ends):
+        G = self.graphs.G
+        edges, inner, node = [], [], start
+        while True:
+            edges.append(edge)
+            node = int(G.src[edge]) if G.dst[edge] == node else int(G.dst[edge])
+            if node not in ends or node == start:
+                return edges, inner, node
+            inner.append(node)
+            a, b = ends[node]
+            edge = b if a == edge else a
+
+    # Инцидентность для прохода по узлам: обычные рёбра вне цепочек (номер e)
+    # и стянутые цепочки (номер E + c). Формат тот же, что у CompactGraph.incidence().
+    def _build_incidence(self):
+        G = self.graphs.G
+        plain = np.flatnonzero(~self.in_chain)
+        u, v = self.endpoints[:, 0], self.endpoints[:, 1]
+        chains = G.n_edges + np.arange(self.n_chains)
+        ends = np.concatenate([G.src[plain], G.dst[plain], u, v])
+        others = np.concatenate([G.dst[plain], G.src[plain], v, u])
+        items = np.concatenate([plain, plain, chains, chains])
+        order = np.argsort(ends, kind='stable')
+        ptr = np.zeros(G.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ends, minlength=G.n_nodes), out=ptr[1:])
+        return ptr, items[order], others[order]
+
+    # Накопленные от начала каждой цепочки сопротивления рёбер (S × L), полное сопротивление цепочек (S × C)
+    # и признак разрыва (S × C): ребро с нулевым весом — цепочки нет в подграфе или она не проводит.
+    def _resistance(self, weight):
+        w = weight[:, self.chain_edges]
+        broken = w <= 0
+        resistance = 1 / np.where(broken, 1, w)
+        resistance[broken] = 0
+        cumulative = np.cumsum(resistance, axis=1)
+        start = self.chain_ptr[:-1]
+        base = np.where(start > 0, cumulative[:, np.maximum(start - 1, 0)], 0)
+        cumulative -= np.repeat(base, np.diff(self.chain_ptr), axis=1)
+        total = cumulative[:, self.chain_ptr[1:] - 1]
+        return cumulative, total, np.logical_or.reduceat(broken, start, axis=1)
+
+    # Веса для прохода по узлам: веса рёбер (S × E) и последовательные веса цепочек (S × C)
+    def weights(self, weight):
+        if not self.n_chains:
+            return weight
+        _, total, broken = self._resistance(weight)
+        chain_weight = np.where(broken, 0, 1 / np.where(broken, 1, total))
+        return np.hstack([weight, chain_weight])
+
+    # Восстанавливает давления внутренних узлов цепочек по давлениям их концов:
+    # давление падает вдоль цепочки пропорционально накопленному сопротивлению.
+    def interpolate(self, pressure, weight):
+        if not self.n_chains:
+            return
+        cumulative, total, broken = self._resistance(weight)
+        c = self.inner_chain
+        p_u = pressure[:, self.endpoints[c, 0]]
+        p_v = pressure[:, self.endpoints[c, 1]]
+        share = cumulative[:, self.inner_pos] / np.where(broken, 1, total)[:, c]
+        # узлы вне подграфа и узлы разорванных цепочек получают давление 0
+        pressure[:, self.chain_nodes] = np.where(broken[:, c], 0, p_u - (p_u - p_v) * share)
+
+    # Смежность для обхода муравьёв: для каждого узла (первые рёбра шагов, соседи, номера путей цепочек).
+    # Шаг по обычному ребру имеет номер пути -1, шаг по цепочке ведёт сразу в её дальний конец.
+    def walk_adjacency(self):
+        if self._walk is None:
+            G = self.graphs.G
+            plain_ptr, plain_edges, plain_nbrs = self._plain_walk()
+            starts = self.endpoints[:, 0]
+            targets = self.endpoints[:, 1]
+            if not G.directed:
+                starts, targets = np.concatenate([starts, targets]), np.concatenate([targets, starts])
+            first = np.array([p[0] for p in self.paths], dtype=np.int64)
+            hops = [[] for _ in range(G.n_nodes)]
+            for hop, i in enumerate(starts.tolist()):
+                hops[i].append(hop)
+            self._walk = []
+            for i in range(G.n_nodes):
+                here = np.array(hops[i], dtype=np.int64)
+                s = slice(plain_ptr[i], plain_ptr[i + 1])
+                self._walk.append((np.concatenate([plain_edges[s], first[here]]),
+                                   np.concatenate([plain_nbrs[s], targets[here]]),
+                                   np.concatenate([np.full(s.stop - s.start, -1), here])))
+        return self._walk
+
+    def _plain_walk(self):
+        G = self.graphs.G
+        if G.directed:
+            ptr, edges = G.out_ptr, G.out_edges
+            nbrs = G.dst[edges]
+        else:
+            ptr, edges, nbrs = G.incidence()
+        # рёбра цепочек из узлов-концов доступны только как шаг по цепочке
+        keep = ~self.in_chain[edges]
+        kept_before = np.concatenate([[0], np.cumsum(keep)])
+        return kept_before[ptr], edges[keep], nbrs[keep]
+
+    # Какие шаги разрешены маской рёбер mask: для путей цепочек — все рёбра цепочки разрешены.
+    # Последний элемент (номер -1) соответствует обычному ребру и всегда True.
+    def hop_mask(self, mask):
+        if not self.n_chains:
+            return np.ones(1, dtype=bool)
+        ok = np.logical_and.reduceat(mask[self.chain_edges], self.chain_ptr[:-1])
+        if not self.graphs.G.directed:
+            ok = np.concatenate([ok, ok])
+        return np.append(ok, True)
+
+    # Нужно ли перестроить стягивание после удаления рёбер edges
+    def touches(self, edges):
+        return bool(self.in_chain[edges].any())
@@ -0,0 +1,184 @@
+import contextlib
+import cProfile
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError:  # Windows: пиковый RSS недоступен
+    resource = None
+
+
+# Замеры фаз и счётчики одного запуска алгоритма.
+# phases — {фаза: [суммарное время, число вызовов]}, counters — {счётчик: значение},
+# gauges — {показатель: наибольшее значение} (размеры структур: байты подграфов, число хранимых путей).
+# Алгоритмы получают активный профилировщик через current() и оборачивают фазы итерации
+# в `with prof.phase('pressures'):`, события считают через prof.count('removed_edges', n),
+# а размеры — через prof.gauge('subgraph_bytes', graphs.nbytes).
+class Profiler:
+    enabled = True
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.gauges = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = max(self.gauges.get(name, value), value)
+
+    # Результат в виде словаря: {'phases': {фаза: {'time', 'calls'}}, 'counters': {...}, 'gauges': {...}}
+    def report(self):
+        return {'phases': {name: {'time': t, 'calls': calls} for name, (t, calls) in self.phases.items()},
+                'counters': dict(self.counters), 'gauges': dict(self.gauges)}
+
+
+# Профилировщик с учётом памяти Python (tracemalloc должен быть запущен).
+# Для каждой фазы дополнительно копятся allocated — суммарный прирост занятой памяти за вызовы фазы
+# и peak — наибольший пик внутри одного вызова над уровнем на входе в фазу.
+# Пик отслеживается сбросом tracemalloc.reset_peak на входе в фазу, поэтому фазы не должны быть вложенными;
+# общий пик запуска (peak) собирается из пиков между сбросами.
+class MemoryProfiler(Profiler):
+    def __init__(self):
+        super().__init__()
+        self.memory = {}
+        self.peak = tracemalloc.get_traced_memory()[1]
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        before, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        tracemalloc.reset_peak()
+        with super().phase(name):
+            try:
+                yield
+            finally:
+                after, peak = tracemalloc.get_traced_memory()
+                self.peak = max(self.peak, peak)
+                entry = self.memory.setdefault(name, [0, 0])
+                entry[0] += after - before
+                entry[1] = max(entry[1], peak - before)
+
+    def report(self):
+        report = super().report()
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        report['memory'] = {'peak': self.peak,
+                            'phases': {name: {'allocated': allocated, 'peak': peak}
+                                       for name, (allocated, peak) in self.memory.items()}}
+        return report
+
+
+# Профилировщик по умолчанию: ничего не замеряет. phase возвращает один и тот же пустой контекст,
+# поэтому выключенные замеры стоят один вызов метода на фазу.
+class _Disabled:
+    enabled = False
+    _null = contextlib.nullcontext()
+
+    def phase(self, name):
+        return self._null
+
+    def count(self, name, n=1):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+_current = _Disabled()
+
+# Активный профилировщик (выключенный, если запуск не профилируется)
+def current():
+    return _current
+
+# Делает profiler активным на время блока with
+@contextlib.contextmanager
+def profiling(profiler):
+    global _current
+    previous, _current = _current, profiler
+    try:
+        yield profiler
+    finally:
+        _current = previous
+
+
+# Пиковый RSS процесса в байтах за всё время его работы (None, если модуля resource нет)
+def peak_rss():
+    if resource is None:
+        return None
+    # ru_maxrss в Linux — в килобайтах, в macOS — в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+# Запуск алгоритма algo(G, *args, **kwargs) с замером фаз и счётчиков.
+# cprofile=True — дополнительно весь запуск выполняется под cProfile, в отчёт попадает
+# текстовая сводка top самых затратных по суммарному времени функций (ключ 'cprofile').
+# memory=True — память по фазам под tracemalloc (MemoryProfiler) и пиковый RSS процесса (ключ 'memory');
+# трассировка замедляет запуск, поэтому время такого прогона не сравнивается с обычным.
+# Возвращает (результат алгоритма, отчёт); отчёт также сохраняется в stats графа
+# (G.stats['profile'] у CompactGraph, G.graph['stats']['profile'] у networkx-графа).
+def profile_run(algo, G, *args, cprofile=False, top=30, memory=False, **kwargs):
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    try:
+        profiler = MemoryProfiler() if memory else Profiler()
+        runner = cProfile.Profile() if cprofile else None
+        with profiling(profiler):
+            start = time.perf_counter()
+            if runner is not None:
+                runner.enable()
+            try:
+                result = algo(G, *args, **kwargs)
+            finally:
+                if runner is not None:
+                    runner.disable()
+            elapsed = time.perf_counter() - start
+        report = profiler.report()
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    report['time'] = elapsed
+    if memory:
+        report['memory']['rss_peak'] = peak_rss()
+    if runner is not None:
+        out = io.StringIO()
+        pstats.Stats(runner, stream=out).sort_stats('cumulative').print_stats(top)
+        report['cprofile'] = out.getvalue()
+    stats = G.stats if hasattr(G, 'stats') else G.graph.setdefault('stats', {})
+    stats['profile'] = report
+    return result, report
+
+# Таблица фаз отчёта по убыванию времени
+def format_report(report):
+    total = report.get('time') or sum(p['time'] for p in report['phases'].values()) or 1.0
+    lines = [f"{'phase':24s} {'time, s':>10s} {'share':>7s} {'calls':>8s}"]
+    for name, p in sorted(report['phases'].items(), key=lambda item: -item[1]['time']):
+        lines.append(f"{name:24s} {p['time']:10.4f} {p['time'] / total:7.1%} {p['calls']:8d}")
+    if 'time' in report:
+        # подготовка (подграфы, начальные значения) и всё, что не обёрнуто в фазы
+        other = report['time'] - sum(p['time'] for p in report['phases'].values())
+        lines.append(f"{'(outside phases)':24s} {other:10.4f} {other / total:7.1%}")
+    lines += [f"{name:24s} {value:>10}" for name, value in report['counters'].items()]
+    lines += [f"{name:24s} {value:>10} (max)" for name, value in report.get('gauges', {}).items()]
+    if 'memory' in report:
+        memory = report['memory']
+        lines.append(f"{'memory phase':24s} {'alloc, MB':>10s} {'peak, MB':>10s}")
+        for name, m in sorted(memory['phases'].items(), key=lambda item: -item[1]['peak']):
+            lines.append(f"{name:24s} {m['allocated'] / 2**20:10.2f} {m['peak'] / 2**20:10.2f}")
+        lines.append(f"{'peak (tracemalloc)':24s} {'':10s} {memory['peak'] / 2**20:10.2f}")
+        if memory.get('rss_peak') is not None:
+            lines.append(f"{'peak RSS (process)':24s} {'':10s} {memory['rss_peak'] / 2**20:10.2f}")
+    return '\n'.join(lines)
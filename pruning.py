@@ -0,0 +1,40 @@
+import numpy as np
+
+
+# Планировщик удаления рёбер с малым потоком для PPA.
+# Ребро удаляется, когда общий поток по нему меньше threshold на patience проверках подряд.
+# Гистерезис: счётчик проверок сбрасывается, только если поток поднялся до threshold + margin;
+# поток в полосе [threshold, threshold + margin) счётчик не меняет, поэтому ребро, колеблющееся
+# около порога, не удаляется на одной итерации, чтобы понадобиться на следующей.
+# При patience=1 и margin=0 удаляются ровно рёбра с потоком меньше threshold, как раньше.
+# Проверяются только ещё не удалённые рёбра (edges), поэтому стоимость проверки падает вместе с графом;
+# удаление из подграфов затрагивает только столбцы удаляемых рёбер (SubgraphBundle.remove_edges).
+class EdgePruner:
+    def __init__(self, graphs, threshold, patience=1, margin=0.0):
+        self.graphs = graphs
+        self.threshold = threshold
+        self.patience = patience
+        self.margin = margin
+        self.edges = np.flatnonzero(graphs.G.active)
+        self.below = np.zeros(len(self.edges), dtype=np.int64)
+
+    # Рёбра, которые пора удалить по текущему потоку G (счётчики обновляются)
+    def candidates(self):
+        G = self.graphs.G
+        alive = G.active[self.edges]
+        if not alive.all():
+            # рёбра, удалённые в обход планировщика
+            self.edges, self.below = self.edges[alive], self.below[alive]
+        flow = G.edge_attrs['flow'][self.edges]
+        low = flow < self.threshold
+        self.below = np.where(low, self.below + 1, np.where(flow >= self.threshold + self.margin, 0, self.below))
+        return self.edges[low & (self.below >= self.patience)]
+
+    # Удаляет из G и подграфов рёбра, которые пора удалить; возвращает их
+    def prune(self):
+        edges = self.candidates()
+        if len(edges):
+            self.graphs.remove_edges(edges)
+            keep = ~np.isin(self.edges, edges, assume_unique=True)
+            self.edges, self.below = self.edges[keep], self.below[keep]
+        return edges
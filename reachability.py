@@ -0,0 +1,263 @@
+import numpy as np
+
+# Индекс достижимости узлов графа (CompactGraph) по активным рёбрам.
+# Строится один раз на граф и отвечает на вопрос «какие узлы достижимы из узла i» без обхода графа:
+# в неориентированном графе это компонента связности узла,
+# в ориентированном — объединение компонент сильной связности, достижимых в конденсации графа.
+# Достижимость в конденсации хранится битовыми масками (целые числа Python): бит c маски reach[c']
+# означает, что из компоненты c' достижима компонента c.
+# При удалении рёбер индекс обновляется локально: перестраиваются только компоненты,
+# содержащие удалённые рёбра, и маски их предков в конденсации.
+class ReachabilityIndex:
+    def __init__(self, G):
+        self.G = G
+        self.directed = G.directed
+        self.component = np.full(G.n_nodes, -1, dtype=np.int64)
+        self.members = {}
+        self.next_id = 0
+        # только для ориентированного графа: рёбра конденсации и их кратность, маски достижимости
+        self.dag_count = {}
+        self.succ = {}
+        self.pred = {}
+        self.reach = {}
+        self._masks = {}
+        self._build()
+
+    def _new_component(self, nodes):
+        c = self.next_id
+        self.next_id += 1
+        nodes = np.asarray(nodes, dtype=np.int64)
+        self.component[nodes] = c
+        self.members[c] = nodes
+        return c
+
+    def _build(self):
+        nodes = np.arange(self.G.n_nodes)
+        if not self.directed:
+            for piece in self._connected_pieces(nodes):
+                self._new_component(piece)
+            return
+        # Тарьян выдаёт компоненты в обратном топологическом порядке (сначала стоки),
+        # поэтому маска компоненты собирается из уже готовых масок её потомков
+        created = [self._new_component(scc) for scc in self._strong_components(nodes)]
+        for c in created:
+            self.succ[c] = set()
+            self.pred[c] = set()
+        for c in created:
+            self._link_component(c, outside=None)
+        for c in created:
+            self._update_reach(c)
+
+    # Соседи узла i по активным рёбрам внутри множества inside
+    def _neighbours(self, i, inside):
+        G = self.G
+        edges = G.out_of(i)
+        nbrs = G.dst[edges[G.active[edges]]]
+        if not self.directed:
+            back = G.in_of(i)
+            nbrs = np.concatenate([nbrs, G.src[back[G.active[back]]]])
+        return nbrs[inside[nbrs]].tolist()
+
+    # Компоненты связности подграфа на узлах nodes (неориентированный граф)
+    def _connected_pieces(self, nodes):
+        inside = np.zeros(self.G.n_nodes, dtype=bool)
+        inside[nodes] = True
+        seen = np.zeros(self.G.n_nodes, dtype=bool)
+        pieces = []
+        for root in nodes.tolist():
+            if seen[root]:
+                continue
+            seen[root] = True
+            piece = [root]
+            stack = [root]
+            while stack:
+                for j in self._neighbours(stack.pop(), inside):
+                    if not seen[j]:
+                        seen[j] = True
+                        piece.append(j)
+                        stack.append(j)
+            pieces.append(piece)
+        return pieces
+
+    # Компоненты сильной связности подграфа на узлах nodes (итеративный алгоритм Тарьяна)
+    def _strong_components(self, nodes):
+        inside = np.zeros(self.G.n_nodes, dtype=bool)
+        inside[nodes] = True
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        result = []
+        for root in nodes.tolist():
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self._neighbours(root, inside)))]
+            while work:
+                v, nbrs = work[-1]
+                for w in nbrs:
+                    if w not in index:
+                        index[w] = low[w] = len(index)
+                        stack.append(w)
+                        on_stack.add(w)
+                        work.append((w, iter(self._neighbours(w, inside))))
+                        break
+                    if w in on_stack:
+                        low[v] = min(low[v], index[w])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[v])
+                    if low[v] == index[v]:
+                        scc = []
+                        while True:
+                            w = stack.pop()
+                            on_stack.discard(w)
+                            scc.append(w)
+                            if w == v:
+                                break
+                        result.append(scc)
+        return result
+
+    # Добавляет в конденсацию рёбра, выходящие из компоненты c, и рёбра, входящие в неё
+    # из узлов вне множества outside (рёбра из узлов outside учитываются при их собственном обходе)
+    def _link_component(self, c, outside):
+        G = self.G
+        for i in self.members[c].tolist():
+            edges = G.out_of(i)
+            for j in G.dst[edges[G.active[edges]]].tolist():
+                self._add_dag_edge(c, self.component[j])
+            if outside is not None:
+                edges = G.in_of(i)
+                for j in G.src[edges[G.active[edges]]].tolist():
+                    if not outside[j]:
+                        self._add_dag_edge(self.component[j], c)
+
+    def _add_dag_edge(self, cu, cv):
+        if cu == cv:
+            return
+        key = (int(cu), int(cv))
+        self.dag_count[key] = self.dag_count.get(key, 0) + 1
+        self.succ[key[0]].add(key[1])
+        self.pred[key[1]].add(key[0])
+
+    def _drop_dag_edge(self, cu, cv, count=1):
+        key = (cu, cv)
+        self.dag_count[key] -= count
+        if self.dag_count[key] <= 0:
+            del self.dag_count[key]
+            self.succ[cu].discard(cv)
+            self.pred[cv].discard(cu)
+            return True
+        return False
+
+    def _update_reach(self, c):
+        mask = 1 << c
+        for s in self.succ[c]:
+            mask |= self.reach[s]
+        self.reach[c] = mask
+
+    # Учитывает удаление рёбер edges (индексы), уже помеченных неактивными в G.active
+    def remove_edges(self, edges):
+        edges = np.asarray(edges, dtype=np.int64)
+        if not len(edges):
+            return
+        self._masks.clear()
+        cu = self.component[self.G.src[edges]]
+        cv = self.component[self.G.dst[edges]]
+        if not self.directed:
+            for c in np.unique(cu).tolist():
+                self._split_connected(c)
+            return
+
+        changed = set()
+        for a, b in zip(cu.tolist(), cv.tolist()):
+            if a != b and self._drop_dag_edge(a, b):
+                changed.add(a)
+        for c in np.unique(cu[cu == cv]).tolist():
+            changed.update(self._split_strong(c))
+        self._refresh_ancestors(changed)
+
+    def _split_connected(self, c):
+        pieces = self._connected_pieces(self.members[c])
+        if len(pieces) == 1:
+            return
+        del self.members[c]
+        for piece in pieces:
+            self._new_component(piece)
+
+    # Перестраивает компоненту c после удаления рёбер внутри неё.
+    # Возвращает компоненты, маски которых нужно пересчитать.
+    def _split_strong(self, c):
+        sccs = self._strong_components(self.members[c])
+        if len(sccs) == 1:
+            return {c}
+        # убираем компоненту c из конденсации и заменяем её частями
+        for s in list(self.succ[c]):
+            self._drop_dag_edge(c, s, self.dag_count[c, s])
+        for p in list(self.pred[c]):
+            self._drop_dag_edge(p, c, self.dag_count[p, c])
+        del self.members[c], self.succ[c], self.pred[c], self.reach[c]
+        outside = np.zeros(self.G.n_nodes, dtype=bool)
+        created = [self._new_component(scc) for scc in sccs]
+        for n in created:
+            self.succ[n] = set()
+            self.pred[n] = set()
+            outside[self.members[n]] = True
+        for n in created:
+            self._link_component(n, outside)
+        # предки старой компоненты теперь ссылаются на новые части
+        return set(created) | {p for n in created for p in self.pred[n]}
+
+    # Пересчитывает маски достижимости компонент changed и всех их предков,
+    # начиная с потомков (порядок Кана по рёбрам конденсации внутри затронутого множества)
+    def _refresh_ancestors(self, changed):
+        affected = set()
+        stack = [c for c in changed if c in self.members]
+        while stack:
+            c = stack.pop()
+            if c in affected:
+                continue
+            affected.add(c)
+            stack.extend(self.pred[c])
+        pending = {c: sum(1 for s in self.succ[c] if s in affected) for c in affected}
+        ready = [c for c, n in pending.items() if n == 0]
+        while ready:
+            c = ready.pop()
+            self._update_reach(c)
+            for p in self.pred[c]:
+                if p in pending:
+                    pending[p] -= 1
+                    if pending[p] == 0:
+                        ready.append(p)
+
+    # Достижима ли компонента target из компоненты source
+    def component_reaches(self, source, target):
+        if not self.directed:
+            return source == target
+        return bool(self.reach[source] >> int(target) & 1)
+
+    # Маска узлов (длины V), достижимых из узла i
+    def reachable(self, i):
+        c = int(self.component[i])
+        if not self.directed:
+            return self.component == c
+        if c not in self._masks:
+            n = self.next_id
+            raw = np.frombuffer(self.reach[c].to_bytes((n + 7) // 8, 'little'), dtype=np.uint8)
+            reached = np.unpackbits(raw, bitorder='little')[:n].astype(bool)
+            self._masks[c] = reached[self.component]
+        return self._masks[c]
+
+    # Маски достижимых узлов для нескольких источников (массив len(sources) × V)
+    def masks(self, sources):
+        sources = np.asarray(sources, dtype=np.int64)
+        if not self.directed:
+            return self.component[None, :] == self.component[sources][:, None]
+        result = np.zeros((len(sources), self.G.n_nodes), dtype=bool)
+        for k, i in enumerate(sources.tolist()):
+            result[k] = self.reachable(i)
+        return result
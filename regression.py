@@ -0,0 +1,178 @@
+# regression.py
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+from benchmark import run_trial
+
+# Файл базовых замеров рядом с модулем (хранится в репозитории)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Фиксированный набор сценариев проверки: (алгоритм, размер сети, зерно сценария)
+GATE = [
+    (name, size, 0)
+    for name in ('non_oriented_PPA', 'oriented_PPA', 'restricted_PPA', 'algorithm_utils_PPA',
+                 'oriented_ACO', 'non_oriented_DJA', 'non_oriented_ASTAR')
+    for size in (dict(n_suppliers=10, n_dcs=5, n_retailers=20, supplier_density=0.5, retail_density=0.5),
+                 dict(n_suppliers=30, n_dcs=8, n_retailers=60, supplier_density=0.3, retail_density=0.3))
+] + [
+    ('non_oriented_ACO', dict(n_suppliers=5, n_dcs=3, n_retailers=10), 0),
+]
+
+# Допуски: время считается ухудшившимся, если медиана больше базовой на TIME_REL (доля)
+# плюс NOISE_MADS медианных абсолютных отклонений (шум обоих замеров) и не меньше чем на TIME_FLOOR секунд;
+# число итераций — если больше базового на ITER_REL; ошибка check — если больше базовой на ERROR_ABS.
+TIME_REL = 0.25
+NOISE_MADS = 3.0
+TIME_FLOOR = 0.005
+ITER_REL = 0.10
+ERROR_ABS = 1e-6
+# Сценарий попадает в базу, только если решение корректно: ошибка check конечна и не больше VALID_ERROR.
+# Остальные (расходящиеся или заведомо неверные решения) записываются в базу как исключённые с причиной
+# и не замеряются, иначе порог ошибки от NaN или от большой базовой ошибки пропускал бы любой результат.
+VALID_ERROR = 0.05
+
+
+def scenario_key(name, size, seed):
+    dims = f"{size['n_suppliers']}x{size['n_dcs']}x{size['n_retailers']}"
+    return f"{name}/{dims}:{size.get('supplier_density', 1.0)}:{size.get('retail_density', 1.0)}/seed{seed}"
+
+def _mad(values):
+    median = statistics.median(values)
+    return statistics.median(abs(v - median) for v in values)
+
+# Замер одного сценария: runs запусков на одном и том же сценарии, медиана и MAD времени
+def measure(name, size, seed, runs=5):
+    records = [run_trial(name, size, trial, seed, memory=False) for trial in range(runs)]
+    failed = [r['error'] for r in records if r['error']]
+    if failed:
+        return {'error': failed[0]}
+    times = [r['time'] for r in records]
+    iterations = [r['iterations'] for r in records if r['iterations'] is not None]
+    errors = [r['max_relative_error'] for r in records]
+    return {'time_median': statistics.median(times), 'time_mad': _mad(times),
+            'iterations': statistics.median(iterations) if iterations else None,
+            'max_relative_error': max(errors, key=lambda e: math.inf if math.isnan(e) else e)}
+
+# Причина исключения сценария из базы или None, если решение корректно
+def exclusion_reason(result):
+    if 'error' in result:
+        return f"failed: {result['error']}"
+    error = result['max_relative_error']
+    if not math.isfinite(error):
+        return f"non-finite max_relative_error {error}"
+    if error > VALID_ERROR:
+        return f"max_relative_error {error:.4g} > {VALID_ERROR}"
+    return None
+
+# Замер сценариев gate; сценарии с ключами из skip не замеряются
+def measure_gate(runs=5, gate=GATE, verbose=True, skip=()):
+    results = {}
+    for name, size, seed in gate:
+        key = scenario_key(name, size, seed)
+        if key in skip:
+            continue
+        results[key] = measure(name, size, seed, runs)
+        if verbose:
+            print(f"measured {key}: {results[key]}", file=sys.stderr)
+    return results
+
+# Сравнение замеров с базовыми: список строк (сценарий, показатель, база, сейчас, порог) для ухудшений.
+# Нечисловые (NaN, inf) значения в базе или в замере — всегда ухудшение: с ними сравнение с порогом ложно.
+def compare(baseline, current):
+    regressions = []
+    for key, now in current.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if 'error' in now:
+            if 'error' not in base:
+                regressions.append((key, 'error', None, now['error'], None))
+            continue
+        if 'error' in base:
+            continue
+        broken = [metric for metric in ('time_median', 'max_relative_error') for value in (base[metric], now[metric])
+                  if not math.isfinite(value)]
+        if broken:
+            for metric in dict.fromkeys(broken):
+                regressions.append((key, metric, base[metric], now[metric], None))
+            continue
+        noise = NOISE_MADS * max(base['time_mad'], now['time_mad'])
+        limit = base['time_median'] * (1 + TIME_REL) + max(noise, TIME_FLOOR)
+        if now['time_median'] > limit:
+            regressions.append((key, 'time', base['time_median'], now['time_median'], limit))
+        if base['iterations'] is not None and now['iterations'] is not None:
+            limit = base['iterations'] * (1 + ITER_REL)
+            if now['iterations'] > limit:
+                regressions.append((key, 'iterations', base['iterations'], now['iterations'], limit))
+        limit = base['max_relative_error'] + ERROR_ABS
+        if now['max_relative_error'] > limit:
+            regressions.append((key, 'max_relative_error', base['max_relative_error'], now['max_relative_error'], limit))
+    return regressions
+
+def _fmt(value):
+    return '-' if value is None else f"{value:.4g}" if isinstance(value, float) else str(value)
+
+def report(baseline, current, regressions, excluded=None):
+    print(f"{'scenario':60s} {'metric':20s} {'baseline':>10s} {'current':>10s} {'limit':>10s}")
+    for key, reason in (excluded or {}).items():
+        print(f"{key:60s} {'(excluded)':20s} {reason}")
+    flagged = {(key, metric) for key, metric, *_ in regressions}
+    for key, now in current.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:60s} {'(not in baseline)':20s}")
+            continue
+        for metric in ('time_median', 'iterations', 'max_relative_error'):
+            short = 'time' if metric == 'time_median' else metric
+            mark = '  REGRESSION' if (key, short) in flagged or (key, metric) in flagged else ''
+            print(f"{key:60s} {short:20s} {_fmt(base.get(metric)):>10s} {_fmt(now.get(metric)):>10s}{mark}")
+    for key, metric, base, now, limit in regressions:
+        if metric == 'error':
+            print(f"{key}: failed: {now}")
+
+# База: (замеры корректных сценариев, {исключённый сценарий: причина})
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as f:
+        data = json.load(f)
+    return data['scenarios'], data.get('excluded', {})
+
+# Записывает базу; сценарии с некорректным решением (exclusion_reason) попадают в excluded
+def save_baseline(results, runs, path=BASELINE_PATH):
+    scenarios, excluded = {}, {}
+    for key, result in results.items():
+        reason = exclusion_reason(result)
+        if reason is None:
+            scenarios[key] = result
+        else:
+            excluded[key] = reason
+    with open(path, 'w') as f:
+        json.dump({'runs': runs, 'scenarios': scenarios, 'excluded': excluded}, f, indent=1, sort_keys=True,
+                  allow_nan=False)
+    return excluded
+
+# Код возврата: 0 — ухудшений нет, 1 — есть (таблица по сценариям выводится в stdout)
+def main():
+    parser = argparse.ArgumentParser(description='Performance regression gate against the stored benchmark baseline')
+    parser.add_argument('--runs', type=int, default=5, help='runs per scenario (median is compared)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update', action='store_true', help='measure and overwrite the baseline')
+    args = parser.parse_args()
+
+    if args.update:
+        excluded = save_baseline(measure_gate(args.runs), args.runs, args.baseline)
+        for key, reason in excluded.items():
+            print(f"excluded {key}: {reason}")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    baseline, excluded = load_baseline(args.baseline)
+    current = measure_gate(args.runs, skip=excluded)
+    regressions = compare(baseline, current)
+    report(baseline, current, regressions, excluded)
+    print(f"{len(regressions)} regression(s)" if regressions else "no regressions")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,13 @@
-import networkx as nx
 import numpy as np
 from random import choices, random
 from restricted_graph import create_subgraphs
+from seeding import seed_pheromones
+from flow_aggregation import FlowAggregator
+from compact_graph import solver_entry, solver_iter
+from profiling import current
+from iteration import Snapshot, Deadline, run_to_end
+from checkpoint import as_checkpoint, ACO_STATE
+import tracing
 
 alpha = 1      # важность феромона
 beta = 2       # важность эвристики (обратная длина)
@@ -11,139 +17,285 @@ num_ants = 30
 iterations = 100
 
 def init_feromones(graphs):
-    for g in graphs:
-        supplier = g.graph['s_id']
-        demand_nodes = g.nodes[supplier]['demand'].keys()
-
-        for u, v in g.edges:
-            # Усиливаем феромон на ребре, если оно ведёт напрямую от поставщика к потребителю
-            if (u == supplier and v in demand_nodes) or (v == supplier and u in demand_nodes):
-                g.edges[u, v]['pheromone'] = 5.0  # усиленный феромон
-            else:
-                g.edges[u, v]['pheromone'] = 1.0 + np.random.rand() * 0.1  # базовый феромон немного случайный
-
-# Подсчитывает общий поток по всему графу, суммируя потоки, вычисленные на уровне подграфов.
-# Это позволяет обновить потоки на уровне всего графа с учётом всех локальных решений.
-def calculate_total_flow(G, graphs):
-    for edge in G.edges:
-        G.edges[edge]['flow'] = 0
-    for g in graphs:
-        for i, j, flow in g.edges.data('flow'):
-            if flow > 0:
-                G.edges[i, j]['flow'] += flow
-                
-def aco_algorithm(G, demand_data, effective_distance_function, epsilon, get_subgraphs=False, min_capacity = 0, check_every=10):
-    graphs = create_subgraphs(G, demand_data)
+    G = graphs.G
+    ptr, inc_edges, inc_nbrs = G.incidence()
+    # базовый феромон немного случайный
+    pheromone = 1.0 + np.random.rand(*graphs.edge_mask.shape) * 0.1
+    for k, supplier in enumerate(graphs.suppliers):
+        demand_nodes = [G.index[n] for n in graphs.demand[k] if n in G.index]
+        # Усиливаем феромон на ребре, если оно ведёт напрямую от поставщика к потребителю
+        edges = inc_edges[ptr[supplier]:ptr[supplier + 1]]
+        direct = np.isin(inc_nbrs[ptr[supplier]:ptr[supplier + 1]], demand_nodes)
+        pheromone[k, edges[direct]] = 5.0  # усиленный феромон
+    graphs.fill('pheromone', pheromone)
+
+# Для каждого узла подграфа поставщика k считает, какой объём спроса поставщика может пройти через этот узел:
+# сумма спроса всех розничных точек (с ненулевым спросом), достижимых из узла по направлению рёбер.
+# Подграф поставщика замкнут относительно достижимости, поэтому используется общий индекс графа graphs.reach:
+# спрос считается один раз на компоненту сильной связности. Результат — массив длины V.
+def reachable_demand(graphs, k):
+    G = graphs.G
+    reach = graphs.reach
+    targets = [(reach.component[G.index[t]], d) for t, d in graphs.demand[k].items()
+               if d > 0 and t in G.index and graphs.node_mask[k, G.index[t]]]
+
+    nodes = np.flatnonzero(graphs.node_mask[k])
+    components, inverse = np.unique(reach.component[nodes], return_inverse=True)
+    volume = np.array([sum(d for t, d in targets if reach.component_reaches(c, t))
+                       for c in components.tolist()], dtype=float)
+    result = np.zeros(G.n_nodes)
+    result[nodes] = volume[inverse.ravel()]
+    return result
+
+# Индекс остаточной пропускной способности рёбер.
+# potential — верхняя оценка потока, который ещё может пройти по ребру (сумма по подграфам спроса,
+# достижимого через конец ребра); ребро с potential < min_capacity никогда не наберёт минимальный поток
+# и маскируется при построении путей муравьями.
+# flow — поток, закреплённый текущими лучшими решениями поставщиков; обновляется инкрементально.
+# Какие подграфы содержат ребро, видно по столбцу graphs.edge_mask, поэтому удаление рёбер
+# пересчитывает оценки только в затронутых подграфах, без обхода всего G.
+class CapacityIndex:
+    def __init__(self, graphs):
+        self.graphs = graphs
+        self.contrib = np.zeros(graphs.edge_mask.shape)
+        for k in range(len(graphs)):
+            self.contrib[k] = self._contrib(k)
+        self.potential = self.contrib.sum(axis=0)
+        self.flow = np.zeros(graphs.G.n_edges)
+
+    def _contrib(self, k):
+        reach = reachable_demand(self.graphs, k)
+        return np.where(self.graphs.edge_mask[k], reach[self.graphs.G.dst], 0)
+
+    # Маска рёбер, которые ещё могут набрать min_capacity
+    def feasible(self, min_capacity):
+        return self.potential >= min_capacity
+
+    # Закрепляет (sign=1) или снимает (sign=-1) поток решения муравья: {target: рёбра пути}
+    def commit(self, solution, demand, sign=1):
+        for target, path in solution.items():
+            self.flow[path] += sign * demand[target]
+
+    # Удаляет рёбра из G и из тех подграфов, которые их содержат.
+    # Оценки potential пересчитываются лишь для затронутых подграфов.
+    def remove_edges(self, edges):
+        edges = np.asarray(edges, dtype=np.int64)
+        if not len(edges):
+            return 0
+        affected = np.flatnonzero(self.graphs.edge_mask[:, edges].any(axis=1))
+        self.graphs.remove_edges(edges)
+        self.flow[edges] = 0
+        for k in affected:
+            self.potential -= self.contrib[k]
+            self.contrib[k] = self._contrib(k)
+            self.potential += self.contrib[k]
+        return len(affected)
+
+    # Рёбра подграфов, которые уже не смогут набрать min_capacity (по оценке potential)
+    def infeasible_edges(self, min_capacity):
+        return np.flatnonzero(self.graphs.edge_mask.any(axis=0) & (self.potential < min_capacity))
+
+    # Рёбра с закреплённым потоком меньше min_capacity (включая рёбра вне подграфов)
+    def underloaded_edges(self, min_capacity):
+        return np.flatnonzero(self.graphs.G.active & (self.flow < min_capacity))
+
+# Итерации муравьиного алгоритма по одной: после каждой выдаётся Snapshot (номер итерации, суммарная
+# стоимость путей муравьёв); потребитель может прекратить перебор в любой момент. Лучшие найденные решения
+# переносятся в поток G при завершении генератора, в том числе досрочном, поэтому во время перебора
+# flow снимка нулевой. Значение return генератора — подграфы (SubgraphBundle).
+@solver_iter
+def aco_iter(G, demand_data, effective_distance_function, epsilon, min_capacity = 0, check_every=10, init='default', max_iterations=iterations, time_limit=None, checkpoint=None):
+    # time_limit — бюджет времени в секундах на весь запуск (None — без ограничения);
+    # по его исчерпании возвращается текущее решение, в G.stats отмечается, сошёлся ли алгоритм
+    deadline = Deadline(time_limit)
+    G.stats['converged'] = G.stats['timed_out'] = False
+    # замеры фаз, размеров и шагов муравьёв (при выключенном профилировании — пустые вызовы, см. profiling)
+    prof = current()
+    # события трассировки (по умолчанию только предупреждения, см. tracing)
+    tr = tracing.current()
+    with prof.phase('subgraphs'):
+        graphs = create_subgraphs(G, demand_data)
+    # размеры общего графа и массивов подграфов (для учёта памяти)
+    prof.gauge('graph_bytes', G.nbytes)
+    prof.gauge('subgraph_bytes', graphs.nbytes)
     init_feromones(graphs)    
+    # init='shortest_path' — феромоны пропорциональны потокам решения с кратчайшими путями
+    seed_pheromones(graphs, effective_distance_function, init)
+    # Индекс остаточной пропускной способности: рёбра, которые не смогут набрать min_capacity,
+    # муравьи не рассматривают, а удаление рёбер затрагивает только содержащие их подграфы.
+    index = CapacityIndex(graphs)
     
-    # Словарь для хранения лучших решений по каждому графу
-    best_solutions = {g.graph['s_id']: {'cost': float('inf'), 'solution': {}, 'graph': g} for g in graphs}
+    # Словарь для хранения лучших решений по каждому подграфу; путь — список номеров рёбер
+    best_solutions = {s_id: {'cost': float('inf'), 'solution': {}, 'row': k} for k, s_id in enumerate(graphs.s_ids)}
     previous__g_cost = 0
-    for it in range(iterations):
-        total_g_cost = 0
-        for graph in graphs:
-            supplier = graph.graph['s_id']
-            demand = graph.nodes[supplier]['demand']
-            all_paths = []
-            all_costs = []
-
-            for _ in range(num_ants):
-                ant_paths = {}
-                total_cost = 0
-
-                for target, required_flow in demand.items():
-                    if required_flow == 0:
-                        continue
-                    path = construct_path(graph, supplier, target)
-                    if not path:
-                        continue
-                    ant_paths[target] = path
-
-                    flow_sum = 0
-                    for i in range(len(path) - 1):
-                        u, v = path[i], path[i + 1]
-                        flow_sum += effective_distance_function(graph.edges[u, v]['flow'])
-                    total_cost += flow_sum * required_flow
-
-                all_paths.append(ant_paths)
-                all_costs.append(total_cost)
-
-                # Проверяем, что все потребители обслужены
-                required_targets = {target for target, req in demand.items() if req > 0}
-                if required_targets.issubset(ant_paths.keys()):
-                    if total_cost < best_solutions[supplier]['cost']:
-                        best_solutions[supplier]['cost'] = total_cost
-                        best_solutions[supplier]['solution'] = ant_paths
+    # checkpoint — checkpoint.Checkpoint или путь к файлу: каждые checkpoint.every итераций состояние
+    # сохраняется в файл, а если файл уже есть, запуск продолжается с сохранённой итерации
+    checkpoint = as_checkpoint(checkpoint)
+    start = 0
+    if checkpoint is not None:
+        # удалённые рёбра снимаются через индекс, закреплённый поток восстанавливается по лучшим решениям
+        start, extra = checkpoint.restore(graphs, 'restricted_ACO', index.remove_edges)
+        if extra is not None:
+            best_solutions, previous__g_cost = extra['best_solutions'], extra['previous__g_cost']
+            for best in best_solutions.values():
+                index.commit(best['solution'], graphs.demand[best['row']])
+    try:
+        for it in range(start, max_iterations):
+            G.stats['iterations'] = it + 1
+            total_g_cost = 0
+            feasible = index.feasible(min_capacity)
+            for k, supplier in enumerate(graphs.suppliers):
+                if deadline.expired():
+                    break
+                s_id = graphs.s_ids[k]
+                demand = graphs.demand[k]
+                allowed = graphs.edge_mask[k] & feasible
+                all_paths = []
+                all_costs = []
+
+                for _ in range(num_ants):
+                    ant_paths = {}
+                    total_cost = 0
+
+                    for target, required_flow in demand.items():
+                        if required_flow == 0 or target not in G.index:
+                            continue
+                        with prof.phase('construct_path'):
+                            path = construct_path(graphs, k, supplier, G.index[target], allowed=allowed)
+                        if not path:
+                            prof.count('failed_paths')
+                            continue
+                        prof.count('ant_steps', len(path))
+                        ant_paths[target] = path
+
+                        with prof.phase('cost'):
+                            flow_sum = np.sum(effective_distance_function(graphs.flow[k, path]))
+                        total_cost += flow_sum * required_flow
+
+                    all_paths.append(ant_paths)
+                    all_costs.append(total_cost)
+
+                    # Проверяем, что все потребители обслужены
+                    required_targets = {target for target, req in demand.items() if req > 0}
+                    if required_targets.issubset(ant_paths.keys()):
+                        if total_cost < best_solutions[s_id]['cost']:
+                            # переносим закреплённый поток со старого лучшего решения на новое
+                            index.commit(best_solutions[s_id]['solution'], demand, sign=-1)
+                            index.commit(ant_paths, demand)
+                            best_solutions[s_id]['cost'] = total_cost
+                            best_solutions[s_id]['solution'] = ant_paths
             
-            total_g_cost += total_cost
-            # Обновление феромонов после всех муравьёв
-            evaporate_pheromones(graph)
-            reinforce_pheromones(graph, all_paths, all_costs)
+                total_g_cost += total_cost
+                # рёбра путей всех муравьёв поставщика, хранимые до обновления феромонов
+                if prof.enabled:
+                    prof.gauge('ant_path_edges', sum(len(p) for paths in all_paths for p in paths.values()))
+                # Обновление феромонов после всех муравьёв
+                with prof.phase('pheromone'):
+                    evaporate_pheromones(graphs, k)
+                    reinforce_pheromones(graphs, k, all_paths, all_costs)
             
-        print(f"Iteration {it+1}/{iterations}. Total cost: {total_g_cost}")
-        if(abs(previous__g_cost - total_g_cost) <= epsilon): # условие завершения оптимизации
-            break
-        previous__g_cost = total_g_cost
-        total_g_cost = 0
-
-    if it % check_every == 0:
-            edges_to_remove = []
-            for i, j in list(G.edges):
-                flow = G.edges[i, j]['flow']
-                if flow < min_capacity:
-                    edges_to_remove.append((i, j))
-            for edge in edges_to_remove:
-                G.remove_edge(*edge)
-                # Удаляем ребра из подграфов тоже
-                for g in graphs:
-                    if g.has_edge(*edge):
-                        g.remove_edge(*edge)
-            # print(f"Iteration {it}: Removed {len(edges_to_remove)} edges due to capacity constraints")
-        
-    # Применение лучших решений
-    for graph in graphs:
-        supplier = graph.graph['s_id']
-        best_solution = best_solutions[supplier]['solution']
-        demand = graph.nodes[supplier]['demand']
-
-        required_targets = {target for target, req in demand.items() if req > 0}
-        if not best_solution or not required_targets.issubset(best_solution.keys()):
-            # print(f"WARNING: No complete solution found for supplier {supplier}")
-            continue
+            if deadline.expired():
+                # итерация могла быть прервана между поставщиками; решения остальных подграфов — прежние лучшие
+                G.stats['timed_out'] = True
+                tr.info('time_limit', iteration=it + 1)
+                break
+            if tr.sampled(it + 1):
+                tr.info('iteration', iteration=it + 1, total_cost=total_g_cost)
+            converged = abs(previous__g_cost - total_g_cost) <= epsilon # условие завершения оптимизации
+            yield Snapshot(G, graphs, it + 1, cost=total_g_cost, converged=converged)
+            if converged:
+                G.stats['converged'] = True
+                break
+            previous__g_cost = total_g_cost
+            total_g_cost = 0
+
+            if (it + 1) % check_every == 0:
+                # Удаляем рёбра, которые уже не смогут набрать min_capacity.
+                # После удаления оценки пересчитываются только в затронутых подграфах.
+                with prof.phase('pruning'):
+                    edges_to_remove = index.infeasible_edges(min_capacity)
+                    if len(edges_to_remove):
+                        index.remove_edges(edges_to_remove)
+                        drop_broken_solutions(graphs, best_solutions, set(edges_to_remove.tolist()), index)
+                prof.count('removed_edges', len(edges_to_remove))
+                tr.info('pruning', iteration=it + 1, removed=len(edges_to_remove))
+
+            if checkpoint is not None and checkpoint.due(it + 1):
+                with prof.phase('checkpoint'):
+                    checkpoint.save(graphs, 'restricted_ACO', it + 1, ACO_STATE,
+                                    best_solutions=best_solutions, previous__g_cost=previous__g_cost)
+    finally:
+        # Применение лучших решений (в том числе при досрочной остановке перебора)
+        # общий поток по рёбрам G обновляется по мере добавления путей
+        flows = FlowAggregator(graphs)
+        for k, s_id in enumerate(graphs.s_ids):
+            best_solution = best_solutions[s_id]['solution']
+            demand = graphs.demand[k]
 
-        for target, path in best_solution.items():
-            demand_val = demand[target]
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i + 1]
-                graph.edges[u, v]['flow'] += demand_val
+            required_targets = {target for target, req in demand.items() if req > 0}
+            if not best_solution or not required_targets.issubset(best_solution.keys()):
+                # в исходной версии это сообщение было закомментировано, поэтому оно не печатается по умолчанию
+                tr.info('no_solution', supplier=s_id)
+                continue
 
-    calculate_total_flow(G, graphs)
+            with prof.phase('apply_solutions'):
+                for target, path in best_solution.items():
+                    flows.add(k, path, demand[target])
+
+        # Рёбра, на которых закреплённый поток меньше min_capacity, удаляются из G и подграфов
+        with prof.phase('pruning'):
+            edges_to_remove = index.underloaded_edges(min_capacity)
+            index.remove_edges(edges_to_remove)
+        prof.count('removed_edges', len(edges_to_remove))
+
+    return graphs
+
+@solver_entry(native='compact')
+def aco_algorithm(G, demand_data, effective_distance_function, epsilon, get_subgraphs=False, min_capacity = 0, check_every=10, init='default', max_iterations=iterations, time_limit=None, checkpoint=None):
+    graphs = run_to_end(aco_iter(G, demand_data, effective_distance_function, epsilon, min_capacity, check_every, init, max_iterations, time_limit, checkpoint))
     return graphs if get_subgraphs else None
 
 
-def construct_path(graph, start, end, retries=3):
+# Сбрасывает лучшие решения поставщиков, пути которых проходили по удалённым рёбрам,
+# и снимает их поток из индекса.
+def drop_broken_solutions(graphs, best_solutions, removed, index):
+    for best in best_solutions.values():
+        demand = graphs.demand[best['row']]
+        for path in best['solution'].values():
+            if not removed.isdisjoint(path):
+                index.commit(best['solution'], demand, sign=-1)
+                best['cost'] = float('inf')
+                best['solution'] = {}
+                break
+
+
+# Строит путь муравья от start до end (индексы узлов) в подграфе поставщика k
+# по рёбрам, разрешённым маской allowed. Возвращает список номеров рёбер пути или None.
+def construct_path(graphs, k, start, end, retries=3, allowed=None):
+    # шаг по стянутой цепочке ведёт сразу в её дальний конец (hops — номер пути цепочки или -1)
+    adjacency = graphs.walk_adjacency()
+    mask = graphs.edge_mask[k] if allowed is None else allowed
+    hop_ok = graphs.hop_mask(mask)
+    pheromone = graphs.pheromone[k]
+    length = graphs.length[k]
     for _ in range(retries):
-        path = [start]
-        visited = set(path)
+        path = []
+        visited = {start}
         current = start
 
         while current != end:
-            neighbors = [
-                n for n in graph.neighbors(current)
-                if n not in visited and graph.has_edge(current, n)
-            ]
-            if not neighbors:
+            edges, nbrs, hops = adjacency[current]
+            keep = mask[edges] & hop_ok[hops]
+            candidates = [(e, n, h) for e, n, h in zip(edges[keep].tolist(), nbrs[keep].tolist(), hops[keep].tolist())
+                          if n not in visited]
+            if not candidates:
                 break  # тупик
-            weights = []
-            for n in neighbors:
-                edge = graph.edges[current, n]
-                pheromone = edge['pheromone']
-                heuristic = 1 / edge['length'] if edge['length'] > 0 else 1
-                weight = (pheromone ** alpha) * (heuristic ** beta)
-                weights.append(weight)
-
-            next_node = choices(neighbors, weights)[0]
-            path.append(next_node)
+            chosen = [e for e, _, _ in candidates]
+            heuristic = np.where(length[chosen] > 0, 1 / length[chosen], 1)
+            weights = (pheromone[chosen] ** alpha) * (heuristic ** beta)
+
+            edge, next_node, hop = choices(candidates, weights)[0]
+            path.extend(graphs.hop_edges(edge, hop))
             visited.add(next_node)
             current = next_node
 
@@ -152,16 +304,13 @@ def construct_path(graph, start, end, retries=3):
     return None
 
 
-def evaporate_pheromones(graph):
-    for u, v in graph.edges:
-        graph.edges[u, v]['pheromone'] *= (1 - rho)
+def evaporate_pheromones(graphs, k):
+    graphs.pheromone[k] *= (1 - rho)
 
 
-def reinforce_pheromones(graph, paths_list, costs_list):
+def reinforce_pheromones(graphs, k, paths_list, costs_list):
     for paths, cost in zip(paths_list, costs_list):
         if cost == 0:
             continue
         for path in paths.values():
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i + 1]
-                graph.edges[u, v]['pheromone'] += Q_const / cost
+            graphs.pheromone[k, path] += Q_const / cost
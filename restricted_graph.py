@@ -1,6 +1,10 @@
 import networkx as nx
-import random
+import numpy as np
 import matplotlib.pyplot as plt
+from compact_graph import as_networkx
+from shared_subgraphs import SubgraphBundle
+from preprocessing import preprocess_subgraphs
+from reachability import ReachabilityIndex
 
 # Создаёт граф с узлами разных типов (поставщики, распределительные центры, розничные точки)
 # и рёбрами с начальными значениями потока (flow = 0).
@@ -14,44 +18,19 @@ def create_graph(suppliers_nodes_list, dc_nodes_list, retail_nodes_list, edgelis
 
 # Создаёт подграфы для каждого поставщика, который соединяется с распределительными центрами и розничными точками,
 # и добавляет характеристики рёбер и узлов.
+# G — CompactGraph; подграфы — маски над его общей топологией (SubgraphBundle), а не копии графа.
 def create_subgraphs(G, demand_data):
-    graphs = []
-    suppliers = [n for n, t in G.nodes(data='type') if t == 'supplier']
-
-    for supplier in suppliers:
-        # Создаём пустой подграф
-        g = nx.DiGraph()
-        g.graph["s_id"] = supplier
-
-        # Все узлы, достижимые из supplier по направлению рёбер
-        reachable_nodes = nx.descendants(G, supplier)
-        reachable_nodes.add(supplier)
-
-        # Добавляем узлы
-        for node in reachable_nodes:
-            g.add_node(node, **G.nodes[node])
-            g.nodes[node]['pressure'] = 0
-
-        # Добавляем рёбра по направлению из исходного графа
-        for u in reachable_nodes:
-            for v in G.successors(u):
-                if v in reachable_nodes:
-                    g.add_edge(u, v, **G.edges[u, v])
-
-        # Добавляем спрос
-        g.nodes[supplier]['demand'] = demand_data.get(supplier, {})
-
-        # Инициализация параметров рёбер
-        for u, v in g.edges:
-            g.edges[u, v].update({
-                'flow': 0,
-                'conductivity': random.uniform(1e-6, 1),
-                'prev_conductivity': 0,
-                'length': 1
-            })
-
-        graphs.append(g)
-
+    suppliers = G.nodes_of_type('supplier')
+    # Конденсация графа и достижимость между компонентами считаются один раз на весь граф;
+    # строка k — все узлы, достижимые из поставщика k по направлению рёбер
+    reach = ReachabilityIndex(G)
+    node_mask = reach.masks(suppliers)
+    graphs = SubgraphBundle(G, suppliers, node_mask, demand_data, reach)
+    # Оставляем только узлы на путях к потребителям со спросом и стягиваем цепочки узлов степени 2
+    preprocess_subgraphs(graphs)
+
+    # Инициализация параметров рёбер
+    graphs.fill('conductivity', np.random.uniform(1e-6, 1, graphs.edge_mask.shape))
     return graphs
 
 # Функция для равномерного распределения по оси X
@@ -69,6 +48,7 @@ def spread(nodes, y, shift=1, margin=0.05):
 
 # Вывод графа
 def draw_graph(G, edge_label_attr='flow'):
+    G = as_networkx(G)
     fig, ax = plt.subplots(figsize=(16, 8))
     
     # Группируем узлы по типам
@@ -0,0 +1,226 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+import numpy as np
+from compact_graph import EDGE_ATTRS, solver_entry
+from demand import as_demand
+
+# Кэш решений на диске с адресацией по содержимому.
+# Ключ запроса — хеш топологии графа (узлы, рёбра, удалённые рёбра, исходные атрибуты рёбер кроме потока),
+# функции эффективного расстояния (байт-код, константы, замыкание), решателя, спроса, epsilon и параметров.
+# Совпадение ключа означает тот же запрос: решение читается из файла без запуска алгоритма.
+# Запросы с той же топологией, функцией и решателем, но другим спросом или параметрами — «близкие»:
+# решения поставщиков (потоки S × E) последнего такого запроса передаются алгоритму как init (тёплый старт).
+# Стохастические решатели (ACO) для одного ключа возвращают то решение, которое было сохранено первым.
+# Решатель входит в ключ кодом всех функций и классов своего модуля, поэтому исправление решателя
+# делает прежние записи недоступными; изменения общих модулей (подграфы, инициализация и т. п.)
+# учитываются через CACHE_VERSION, который увеличивается при изменениях, влияющих на решения.
+CACHE_VERSION = 1
+
+# Параметры, которые не влияют на решение и в ключ не входят
+NON_SEMANTIC = ('checkpoint',)
+
+
+# Дайджест функции: байт-код, константы (вложенные функции — рекурсивно), имена, значения по умолчанию,
+# значения замыкания и глобальных чисел и строк, на которые ссылается код
+def _function_digest(h, func):
+    func = inspect.unwrap(func)
+    code = getattr(func, '__code__', None)
+    if code is None:
+        h.update(repr(func).encode())
+        return
+    _code_digest(h, code)
+    h.update(repr(func.__defaults__).encode())
+    for cell in func.__closure__ or ():
+        _update(h, cell.cell_contents)
+    for name in code.co_names:
+        value = func.__globals__.get(name)
+        if isinstance(value, (int, float, str, bool)):
+            h.update(f"{name}={value!r}".encode())
+
+def _code_digest(h, code):
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _code_digest(h, const)
+        elif isinstance(const, frozenset):
+            # порядок элементов множества зависит от PYTHONHASHSEED
+            h.update(repr(sorted(map(repr, const))).encode())
+        else:
+            h.update(repr(const).encode())
+
+# Добавляет значение в хеш: массивы — типом, формой и байтами (массивы объектов — значениями),
+# функции — дайджестом, остальное — repr
+def _update(h, value):
+    if isinstance(value, np.ndarray) and value.dtype == object:
+        h.update(repr(value.tolist()).encode())
+    elif isinstance(value, np.ndarray):
+        h.update(f"{value.dtype.str}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif callable(value):
+        _function_digest(h, value)
+    else:
+        text = repr(value)
+        # repr по умолчанию содержит адрес объекта и у одинаковых запросов различался бы
+        if ' at 0x' in text:
+            raise TypeError(f"Cannot use {type(value).__name__} value in a cache key")
+        h.update(text.encode())
+
+# Дайджест решателя: код всех функций и методов классов, определённых в его модуле,
+# и числовые и строковые константы модуля (параметры вроде числа муравьёв)
+def _solver_digest(h, algorithm):
+    algorithm = inspect.unwrap(algorithm)
+    module = sys.modules[algorithm.__module__]
+    h.update(f"{algorithm.__module__}.{algorithm.__qualname__} v{CACHE_VERSION}".encode())
+    for name, member in sorted(vars(module).items()):
+        if isinstance(member, (int, float, str, bool)) and not name.startswith('__'):
+            h.update(f"{name}={member!r}".encode())
+            continue
+        if getattr(member, '__module__', None) != module.__name__:
+            continue
+        if inspect.isclass(member):
+            for _, method in sorted(vars(member).items()):
+                if inspect.isfunction(method):
+                    _code_digest(h, method.__code__)
+        elif inspect.isfunction(member):
+            _code_digest(h, inspect.unwrap(member).__code__)
+
+# Ключи запроса: (базовый — топология, функция, решатель; полный — плюс спрос, epsilon и параметры).
+# time_limit не допускается: решение, прерванное по времени, зависит от скорости машины.
+def cache_keys(G, algorithm, demand_data, effective_distance_function, epsilon, **kwargs):
+    if kwargs.get('time_limit') is not None:
+        raise ValueError("time_limit runs are not cached: the result depends on timing")
+    h = hashlib.sha256()
+    _solver_digest(h, algorithm)
+    h.update(f"directed={G.directed}".encode())
+    for values in (G.node_ids, G.node_type, G.src, G.dst, G.active):
+        _update(h, values)
+    for name in EDGE_ATTRS:
+        if name != 'flow':
+            _update(h, G.edge_attrs[name])
+    _function_digest(h, effective_distance_function)
+    base = h.hexdigest()
+    for values in as_demand(demand_data).csr():
+        _update(h, np.asarray(values))
+    _update(h, epsilon)
+    for name, value in sorted(kwargs.items()):
+        if name in NON_SEMANTIC:
+            continue
+        h.update(name.encode())
+        _update(h, value)
+    return base[:32], h.hexdigest()[:32]
+
+
+# Каталог решений: файл <базовый ключ>-<полный ключ>.npz на запрос. В файле — удалённые рёбра
+# (упакованные биты G.active), поток на активных рёбрах, решения поставщиков (ненулевые элементы S × E)
+# и простые значения G.stats. Запись атомарна (временный файл и os.replace).
+# Вытеснение LRU по размеру: время последнего использования — mtime файла (обновляется при попадании),
+# при превышении max_bytes удаляются давно не использованные файлы.
+class ResultCache:
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, base, key):
+        return os.path.join(self.directory, f"{base}-{key}.npz")
+
+    def _entries(self, prefix=''):
+        names = [name for name in os.listdir(self.directory) if name.startswith(prefix) and name.endswith('.npz')]
+        return [os.path.join(self.directory, name) for name in names]
+
+    # Размер кэша в байтах
+    @property
+    def nbytes(self):
+        return sum(os.path.getsize(path) for path in self._entries())
+
+    # Сохранённое решение запроса или None; попадание обновляет время использования
+    def load(self, base, key):
+        path = self._path(base, key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return _read(path)
+
+    # Решения поставщиков (S × E) последнего использованного близкого запроса или None
+    def nearest(self, base):
+        for path in sorted(self._entries(base), key=os.path.getmtime, reverse=True):
+            entry = _read(path)
+            if entry['subgraph_flow'] is not None:
+                return entry['subgraph_flow']
+        return None
+
+    # Сохраняет решение запроса: поток и удалённые рёбра G, решения поставщиков subgraph_flow (S × E или None)
+    def store(self, base, key, G, subgraph_flow=None):
+        stats = {name: value for name, value in G.stats.items() if isinstance(value, (int, float, str, bool))}
+        arrays = {'active': np.packbits(G.active), 'flow': G.edge_attrs['flow'][G.active],
+                  'stats': np.frombuffer(json.dumps(stats).encode(), dtype=np.uint8)}
+        if subgraph_flow is not None:
+            nonzero = np.flatnonzero(subgraph_flow)
+            arrays.update(subgraph_shape=np.array(subgraph_flow.shape), subgraph_index=nonzero,
+                          subgraph_value=subgraph_flow.ravel()[nonzero])
+        path = self._path(base, key)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
+        self.evict()
+
+    # Удаляет давно не использованные решения, пока кэш больше max_bytes
+    def evict(self):
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in entries)
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+
+    def clear(self):
+        for path in self._entries():
+            os.remove(path)
+
+def _read(path):
+    with np.load(path) as data:
+        entry = {'active': data['active'], 'flow': data['flow'], 'stats': json.loads(data['stats'].tobytes()),
+                 'subgraph_flow': None}
+        if 'subgraph_shape' in data:
+            flow = np.zeros(tuple(data['subgraph_shape']))
+            flow.ravel()[data['subgraph_index']] = data['subgraph_value']
+            entry['subgraph_flow'] = flow
+    return entry
+
+
+# Решение через кэш: algorithm — physarum_algorithm, aco_algorithm, dijkstra_algorithm или astar_algorithm
+# любого модуля, остальные параметры (kwargs) передаются ему. Возвращает G с потоком решения.
+# Тот же запрос читается из кэша; у близкого запроса без явного init алгоритм, принимающий init,
+# стартует с сохранённых решений поставщиков. В G.stats['cache'] — 'hit', 'warm' или 'miss'.
+@solver_entry(native='compact')
+def cached_solve(G, cache, algorithm, demand_data, effective_distance_function, epsilon, **kwargs):
+    base, key = cache_keys(G, algorithm, demand_data, effective_distance_function, epsilon, **kwargs)
+    entry = cache.load(base, key)
+    if entry is not None:
+        G.active[:] = np.unpackbits(entry['active'], count=G.n_edges).astype(bool)
+        G.edge_attrs['flow'][:] = 0
+        G.edge_attrs['flow'][G.active] = entry['flow']
+        G.stats.update(entry['stats'])
+        G.stats['cache'] = 'hit'
+        return G
+
+    parameters = inspect.signature(algorithm).parameters
+    G.stats['cache'] = 'miss'
+    if 'init' in parameters and 'init' not in kwargs:
+        init = cache.nearest(base)
+        if init is not None:
+            kwargs['init'] = init
+            G.stats['cache'] = 'warm'
+    # решения поставщиков сохраняются для тёплого старта близких запросов
+    if 'init' in parameters:
+        kwargs['get_subgraphs'] = True
+    result = algorithm(G, demand_data, effective_distance_function, epsilon, **kwargs)
+    subgraph_flow = None if result is None or result is G else result.flow
+    cache.store(base, key, G, subgraph_flow)
+    return G
@@ -0,0 +1,167 @@
+import numpy as np
+import networkx as nx
+from compact_graph import CompactGraph, TYPE_CODE
+
+# Распределения спроса: (rng, размер, параметры) → целые объёмы
+DEMAND_DISTRIBUTIONS = {
+    # равномерно от demand_low до demand_high включительно (как random.randint)
+    'uniform': lambda rng, size, low, high: rng.integers(low, high + 1, size=size),
+    # пуассоновское со средним (low + high) / 2
+    'poisson': lambda rng, size, low, high: rng.poisson((low + high) / 2, size=size),
+    # логнормальное с медианой (low + high) / 2, обрезанное до [low, high]
+    'lognormal': lambda rng, size, low, high: np.clip(np.rint(rng.lognormal(np.log((low + high) / 2), 0.75, size=size)), low, high).astype(np.int64),
+}
+
+# Сколько ячеек матрицы связей генерируется за один шаг (ограничивает память на больших сетях)
+_CHUNK = 1 << 22
+
+
+# Сценарий транспортной сети: узлы трёх уровней, рёбра и спрос в массивах NumPy.
+# Узлы пронумерованы подряд: поставщики, затем РЦ, затем розничные точки; node_ids — их идентификаторы.
+# src, dst — индексы концов рёбер (ориентация поставщик → РЦ → розница, РЦ → РЦ в обе стороны);
+# demand — матрица спроса поставщиков к розничным точкам (S × R).
+class Scenario:
+    def __init__(self, supplier_ids, dc_ids, retail_ids, src, dst, demand):
+        self.supplier_ids = np.asarray(supplier_ids, dtype=np.int64)
+        self.dc_ids = np.asarray(dc_ids, dtype=np.int64)
+        self.retail_ids = np.asarray(retail_ids, dtype=np.int64)
+        self.node_ids = np.concatenate([self.supplier_ids, self.dc_ids, self.retail_ids])
+        self.node_type = np.repeat([TYPE_CODE['supplier'], TYPE_CODE['dc'], TYPE_CODE['retail']],
+                                   [len(self.supplier_ids), len(self.dc_ids), len(self.retail_ids)])
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.demand = np.asarray(demand)
+
+    @property
+    def n_edges(self):
+        return len(self.src)
+
+    # Списки в формате general_graph
+    @property
+    def suppliers_nodes_list(self):
+        return self.supplier_ids.tolist()
+
+    @property
+    def dc_nodes_list(self):
+        return self.dc_ids.tolist()
+
+    @property
+    def retail_nodes_list(self):
+        return self.retail_ids.tolist()
+
+    @property
+    def edgelist(self):
+        return list(zip(self.node_ids[self.src].tolist(), self.node_ids[self.dst].tolist()))
+
+    # Спрос в формате {поставщик: {розничная точка: объём}} (нулевой спрос не включается)
+    @property
+    def demand_data(self):
+        retail = self.retail_ids.tolist()
+        result = {}
+        for s_id, row in zip(self.supplier_ids.tolist(), self.demand):
+            nonzero = np.flatnonzero(row)
+            result[s_id] = dict(zip([retail[j] for j in nonzero.tolist()], row[nonzero].tolist()))
+        return result
+
+    # Спрос в формате CSR (см. network_file): поставщики, ptr, розничные точки, объёмы
+    def csr(self):
+        rows, cols = np.nonzero(self.demand)
+        ptr = np.zeros(len(self.supplier_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.supplier_ids)), out=ptr[1:])
+        return self.supplier_ids, ptr, self.retail_ids[cols], self.demand[rows, cols].astype(np.float64)
+
+    # Рёбра для неориентированного графа: пары (u, v) и (v, u) сливаются в одно ребро
+    def _undirected_edges(self):
+        pairs = np.stack([np.minimum(self.src, self.dst), np.maximum(self.src, self.dst)], axis=1)
+        _, first = np.unique(pairs, axis=0, return_index=True)
+        first.sort()
+        return self.src[first], self.dst[first]
+
+    # CompactGraph напрямую из массивов, без networkx
+    def to_compact(self, directed=True, pheromone=1.0):
+        src, dst = (self.src, self.dst) if directed else self._undirected_edges()
+        attrs = {'pheromone': np.full(len(src), pheromone)}
+        return CompactGraph(self.node_ids, self.node_type, src, dst, directed, attrs)
+
+    # networkx-граф с типами узлов и нулевым потоком на рёбрах
+    def to_networkx(self, directed=True):
+        G = nx.DiGraph() if directed else nx.Graph()
+        G.add_nodes_from(self.suppliers_nodes_list, type='supplier')
+        G.add_nodes_from(self.dc_nodes_list, type='dc')
+        G.add_nodes_from(self.retail_nodes_list, type='retail')
+        src, dst = (self.src, self.dst) if directed else self._undirected_edges()
+        G.add_edges_from(zip(self.node_ids[src].tolist(), self.node_ids[dst].tolist()), flow=0)
+        return G
+
+
+# Случайные рёбра двудольного графа left × right с вероятностью density;
+# при ensure_each у каждой вершины left остаётся хотя бы одно ребро. Возвращает пары индексов.
+def _bipartite(rng, n_left, n_right, density, ensure_each=True):
+    if density >= 1:
+        return np.repeat(np.arange(n_left), n_right), np.tile(np.arange(n_right), n_left)
+    rows = max(1, _CHUNK // max(n_right, 1))
+    left, right = [], []
+    for start in range(0, n_left, rows):
+        block = rng.random((min(rows, n_left - start), n_right)) < density
+        if ensure_each:
+            empty = ~block.any(axis=1)
+            block[np.flatnonzero(empty), rng.integers(0, n_right, size=empty.sum())] = True
+        i, j = np.nonzero(block)
+        left.append(i + start)
+        right.append(j)
+    return np.concatenate(left), np.concatenate(right)
+
+# Генератор сценариев.
+# n_suppliers, n_dcs, n_retailers — размеры уровней;
+# supplier_density — доля РЦ, с которыми связан поставщик; retail_density — доля РЦ, обслуживающих розничную точку;
+# dc_mesh — полносвязная сеть между РЦ (в обе стороны);
+# demand — распределение из DEMAND_DISTRIBUTIONS с границами demand_low, demand_high,
+# demand_density — доля пар поставщик–розничная точка с ненулевым спросом;
+# supplier_start, dc_start, retail_start — первые идентификаторы уровней (по умолчанию нумерация подряд с 1);
+# seed — зерно генератора: один и тот же seed даёт один и тот же сценарий.
+def generate_scenario(n_suppliers, n_dcs, n_retailers, supplier_density=1.0, retail_density=1.0, dc_mesh=True,
+                      demand='uniform', demand_low=1, demand_high=100, demand_density=1.0,
+                      supplier_start=None, dc_start=None, retail_start=None, seed=None):
+    if demand not in DEMAND_DISTRIBUTIONS:
+        raise ValueError(f"Unknown demand distribution {demand!r}, expected one of {tuple(DEMAND_DISTRIBUTIONS)}")
+    rng = np.random.default_rng(seed)
+    S, D, R = n_suppliers, n_dcs, n_retailers
+    supplier_start = 1 if supplier_start is None else supplier_start
+    dc_start = supplier_start + S if dc_start is None else dc_start
+    retail_start = dc_start + D if retail_start is None else retail_start
+
+    # 1) поставщики → РЦ
+    s, d = _bipartite(rng, S, D, supplier_density)
+    parts_src, parts_dst = [s], [S + d]
+    # 2) РЦ → РЦ (все упорядоченные пары, кроме петель)
+    if dc_mesh and D > 1:
+        a, b = np.nonzero(~np.eye(D, dtype=bool))
+        parts_src.append(S + a)
+        parts_dst.append(S + b)
+    # 3) РЦ → розничные точки
+    r, d = _bipartite(rng, R, D, retail_density)
+    order = np.lexsort((r, d))  # как в general_graph: сначала по РЦ
+    parts_src.append(S + d[order])
+    parts_dst.append(S + D + r[order])
+
+    volumes = DEMAND_DISTRIBUTIONS[demand](rng, (S, R), demand_low, demand_high)
+    if demand_density < 1:
+        volumes = np.where(rng.random((S, R)) < demand_density, volumes, 0)
+    return Scenario(np.arange(supplier_start, supplier_start + S), np.arange(dc_start, dc_start + D),
+                    np.arange(retail_start, retail_start + R),
+                    np.concatenate(parts_src), np.concatenate(parts_dst), volumes)
+
+
+# Именованные наборы параметров generate_scenario
+PRESETS = {
+    # экземпляр general_graph: 100 поставщиков → все 10 РЦ, полносвязные РЦ, РЦ → все 100 розничных точек,
+    # спрос равномерный от 1 до 100
+    'general': dict(n_suppliers=100, n_dcs=10, n_retailers=100, dc_mesh=True,
+                    supplier_start=10001, dc_start=101, retail_start=1001,
+                    demand='uniform', demand_low=1, demand_high=100),
+}
+
+def preset(name, seed=0, **overrides):
+    if name not in PRESETS:
+        raise ValueError(f"Unknown preset {name!r}, expected one of {tuple(PRESETS)}")
+    return generate_scenario(**dict(PRESETS[name], **overrides), seed=seed)
@@ -0,0 +1,71 @@
+import numpy as np
+from compact_graph import shortest_path_tree, tree_path
+
+# Способы начальной инициализации проводимостей (PPA) и феромонов (ACO):
+# default       — как раньше: случайные проводимости, усиленный феромон на прямых рёбрах поставщик → потребитель;
+# shortest_path — по потокам одного назначения спроса по кратчайшим путям.
+# Вместо названия режима можно передать готовые потоки поставщиков — массив S × E
+# (например, решение грубого уровня из multilevel).
+INIT_MODES = ('default', 'shortest_path')
+
+SEED_PHEROMONE = 4.0  # добавка феромона на ребре, через которое идёт весь спрос поставщика
+
+
+# Назначение спроса по кратчайшим путям с учётом потока.
+# Поставщики обрабатываются по очереди: для каждого строится одно дерево кратчайших путей
+# в его подграфе, и спрос каждой розничной точки целиком отправляется по пути в этом дереве.
+# У объединённых поставщиков (несколько источников в строке) дерево одно на всю группу.
+# Вес ребра — эффективное расстояние E(Q) от суммарного потока, уже назначенного на ребро
+# предыдущими поставщиками. Возвращает потоки по рёбрам подграфов (массив S × E).
+def shortest_path_flows(graphs, effective_distance_function):
+    G = graphs.G
+    total = np.zeros(G.n_edges)
+    flows = np.zeros(graphs.edge_mask.shape)
+    for k in range(len(graphs)):
+        weights = np.broadcast_to(np.asarray(effective_distance_function(total), dtype=float), total.shape)
+        sources = list(graphs.supply[k])
+        _, pred = shortest_path_tree(G, sources, weights, graphs.edge_mask[k])
+        for target, volume in graphs.demand[k].items():
+            i = G.index.get(target)
+            if volume <= 0 or i is None or not graphs.node_mask[k, i]:
+                continue
+            path = tree_path(G, pred, sources, i)
+            if path is None:
+                continue
+            flows[k, path] += volume
+        total += flows[k]
+    return flows
+
+def _check_init(init):
+    if isinstance(init, np.ndarray):
+        return True
+    if init not in INIT_MODES:
+        raise ValueError(f"Unknown init mode {init!r}, expected one of {INIT_MODES}")
+    return init != 'default'
+
+# Начальные потоки по рёбрам подграфов (S × E) для режима init
+def _initial_flows(graphs, effective_distance_function, init):
+    if isinstance(init, np.ndarray):
+        # потоки заданы по исходным поставщикам; у объединённых подграфов они сводятся по группам
+        return np.where(graphs.edge_mask, np.abs(graphs.collapse(init)), 0)
+    return shortest_path_flows(graphs, effective_distance_function)
+
+# Начальные проводимости PPA. Проводимость стационарна, когда равна модулю потока,
+# поэтому рёбрам найденного решения сразу ставится их поток; остальные рёбра
+# сохраняют малую случайную проводимость и могут набрать поток в итерациях.
+def seed_conductivities(graphs, effective_distance_function, init='default'):
+    if not _check_init(init):
+        return
+    flows = _initial_flows(graphs, effective_distance_function, init)
+    graphs.conductivity[:] = np.where(flows > 0, flows, graphs.conductivity)
+
+# Начальные феромоны ACO: базовый немного случайный феромон плюс добавка,
+# пропорциональная доле спроса поставщика, идущей через ребро в найденном решении.
+def seed_pheromones(graphs, effective_distance_function, init='default'):
+    if not _check_init(init):
+        return
+    flows = _initial_flows(graphs, effective_distance_function, init)
+    total_demand = graphs.totals
+    total_demand[total_demand == 0] = 1
+    share = flows / total_demand[:, None]
+    graphs.fill('pheromone', 1.0 + np.random.rand(*share.shape) * 0.1 + SEED_PHEROMONE * share)
@@ -0,0 +1,202 @@
+import numpy as np
+import networkx as nx
+from compact_graph import NODE_TYPES, TYPE_CODE
+from demand import as_demand
+
+# Атрибуты рёбер подграфов: для каждого поставщика своя строка массива S × E
+SUBGRAPH_EDGE_ATTRS = ('flow', 'conductivity', 'prev_conductivity', 'length', 'pheromone')
+
+
+# Подграфы поставщиков поверх одной общей топологии.
+# Вместо копии графа на каждого поставщика хранятся маски узлов и рёбер (S × V и S × E)
+# и атрибуты рёбер подграфов — массивы S × E, строка k относится к поставщику suppliers[k].
+# Рёбра, не входящие в подграф, имеют нулевые проводимость, поток и феромон и единичную длину,
+# поэтому векторные вычисления по всей строке не требуют дополнительных проверок маски.
+# reach — индекс достижимости (ReachabilityIndex) графа G, по которому построены маски;
+# он обновляется при удалении рёбер. chains — стянутые цепочки (preprocessing.ChainContraction) или None.
+# supply — для каждой строки словарь {индекс узла-источника: объём}; по умолчанию источник один —
+# сам поставщик со всем своим спросом (несколько источников бывает у объединённых поставщиков, см. aggregation).
+# demand_data — словарь спроса или demand.DemandMatrix; внутри хранится как DemandMatrix.
+# aggregator — flow_aggregation.FlowAggregator, который ведёт общий поток по этим подграфам, или None.
+class SubgraphBundle:
+    def __init__(self, G, suppliers, node_mask, demand_data, reach=None, supply=None):
+        self.G = G
+        self.reach = reach
+        self.suppliers = np.asarray(suppliers, dtype=np.int64)
+        self.s_ids = G.node_ids[self.suppliers].tolist()
+        self.node_mask = node_mask
+        self.edge_mask = node_mask[:, G.src] & node_mask[:, G.dst] & G.active
+        # узлы, входящие хотя бы в один подграф, — по ним идут проходы по узлам
+        self.active_nodes = np.flatnonzero(node_mask.any(axis=0))
+        self.demand_data = as_demand(demand_data)
+        self.demand = [self.demand_data.get(s_id, {}) for s_id in self.s_ids]
+        self.supply = supply or [{s: self.demand_data.total(s_id)} for s, s_id in zip(self.suppliers.tolist(), self.s_ids)]
+
+        shape = self.edge_mask.shape
+        self.flow = np.zeros(shape)
+        self.conductivity = np.zeros(shape)
+        self.prev_conductivity = np.zeros(shape)
+        self.length = np.ones(shape)
+        self.pheromone = np.zeros(shape)
+        self.pressure = np.zeros(node_mask.shape)
+        self.rhs = self._build_rhs()
+        self.chains = None
+        self._walk = None
+        self.aggregator = None
+
+    # Правая часть уравнения для давления: у поставщика — минус весь его спрос,
+    # у розничной точки — её спрос к этому поставщику, у остальных узлов — 0.
+    def _build_rhs(self):
+        rhs = np.zeros(self.node_mask.shape)
+        retail = self.G.node_type == TYPE_CODE['retail']
+        for k, s_id in enumerate(self.s_ids):
+            for source, volume in self.supply[k].items():
+                rhs[k, source] = -volume
+            targets, volume = self.demand_data.row(s_id)
+            i = self.G.indices(targets)
+            keep = i >= 0
+            i, volume = i[keep], volume[keep]
+            keep = retail[i] & self.node_mask[k, i]
+            rhs[k, i[keep]] = volume[keep]
+        return rhs
+
+    # Весь спрос каждой строки (сумма объёмов её источников)
+    @property
+    def totals(self):
+        return np.array([sum(supply.values()) for supply in self.supply], dtype=float)
+
+    def __len__(self):
+        return len(self.suppliers)
+
+    def __getitem__(self, k):
+        return SubgraphView(self, k)
+
+    def __iter__(self):
+        return (SubgraphView(self, k) for k in range(len(self)))
+
+    # Задаёт атрибут рёбер внутри подграфов, вне подграфов оставляет нейтральное значение
+    def fill(self, name, values, outside=0.0):
+        getattr(self, name)[:] = np.where(self.edge_mask, values, outside)
+
+    # Сужает подграфы до узлов node_mask; рёбра вне новых подграфов получают нейтральные значения
+    def restrict(self, node_mask):
+        G = self.G
+        self.node_mask = node_mask
+        self.edge_mask = node_mask[:, G.src] & node_mask[:, G.dst] & G.active
+        self.active_nodes = np.flatnonzero(node_mask.any(axis=0))
+        for name in ('flow', 'conductivity', 'prev_conductivity', 'pheromone'):
+            self.fill(name, getattr(self, name))
+        self.fill('length', self.length, outside=1.0)
+        self.rhs = self._build_rhs()
+        if self.aggregator is not None:
+            self.aggregator.update()
+
+    # Удаляет рёбра (индексы) из общего графа и из всех подграфов
+    def remove_edges(self, edges):
+        edges = np.asarray(edges, dtype=np.int64)
+        edges = edges[self.G.active[edges]]
+        self.G.active[edges] = False
+        if self.reach is not None:
+            self.reach.remove_edges(edges)
+        if self.chains is not None and self.chains.touches(edges):
+            self.chains = type(self.chains)(self)
+        self.G.edge_attrs['flow'][edges] = 0
+        if self.aggregator is not None:
+            self.aggregator.drop(edges)
+        self.edge_mask[:, edges] = False
+        for name in ('flow', 'conductivity', 'prev_conductivity', 'pheromone'):
+            getattr(self, name)[:, edges] = 0
+        self.length[:, edges] = 1
+
+    # Подграфы по исходным поставщикам (у объединённых подграфов см. aggregation.AggregatedBundle)
+    def expand(self):
+        return self
+
+    # Сводит построчные значения исходных поставщиков (массив S × ...) к строкам этих подграфов
+    def collapse(self, values):
+        return values
+
+    # Инцидентность (ptr, номера рёбер, соседи) и узлы для прохода Гаусса — Зейделя по давлениям.
+    # Со стянутыми цепочками номер E + c означает цепочку c, а внутренние узлы цепочек пропускаются.
+    def sweep_incidence(self):
+        if self.chains is None:
+            return self.G.incidence()
+        return self.chains.incidence
+
+    @property
+    def sweep_nodes(self):
+        return self.active_nodes if self.chains is None else self.chains.sweep_nodes
+
+    # Веса рёбер для прохода (S × E) с добавленными весами цепочек
+    def sweep_weights(self, weight):
+        return weight if self.chains is None else self.chains.weights(weight)
+
+    # Давления внутренних узлов цепочек после прохода
+    def finish_sweep(self, weight):
+        if self.chains is not None:
+            self.chains.interpolate(self.pressure, weight)
+
+    # Смежность для обхода муравьёв: (первые рёбра шагов, соседи, номера путей цепочек или -1)
+    def walk_adjacency(self):
+        if self.chains is not None:
+            return self.chains.walk_adjacency()
+        if self._walk is None:
+            self._walk = [(edges, nbrs, np.full(len(edges), -1)) for edges, nbrs in self.G.walk_adjacency()]
+        return self._walk
+
+    # Разрешённость шагов по маске рёбер; индекс -1 (обычное ребро) всегда разрешён
+    def hop_mask(self, mask):
+        return np.ones(1, dtype=bool) if self.chains is None else self.chains.hop_mask(mask)
+
+    # Рёбра шага: само ребро или все рёбра цепочки
+    def hop_edges(self, edge, hop):
+        return [edge] if hop < 0 else self.chains.paths[hop]
+
+    @property
+    def nbytes(self):
+        arrays = [self.node_mask, self.edge_mask, self.pressure, self.rhs]
+        arrays += [getattr(self, name) for name in SUBGRAPH_EDGE_ATTRS]
+        return sum(a.nbytes for a in arrays)
+
+
+# Лёгкое представление подграфа одного поставщика: ничего не копирует,
+# читает маски и строку k атрибутов общего SubgraphBundle.
+class SubgraphView:
+    def __init__(self, bundle, k):
+        self.bundle = bundle
+        self.k = k
+        self.graph = {'s_id': bundle.s_ids[k]}
+
+    @property
+    def nodes(self):
+        return self.bundle.G.node_ids[self.bundle.node_mask[self.k]].tolist()
+
+    @property
+    def edge_ids(self):
+        return np.flatnonzero(self.bundle.edge_mask[self.k])
+
+    @property
+    def edges(self):
+        G = self.bundle.G
+        e = self.edge_ids
+        return list(zip(G.node_ids[G.src[e]].tolist(), G.node_ids[G.dst[e]].tolist()))
+
+    # Аналог g.edges.data(attr): список (u, v, значение)
+    def edge_data(self, attr):
+        values = getattr(self.bundle, attr)[self.k, self.edge_ids].tolist()
+        return [(u, v, value) for (u, v), value in zip(self.edges, values)]
+
+    # Материализует подграф в networkx (например, для отрисовки)
+    def to_networkx(self, attrs=SUBGRAPH_EDGE_ATTRS):
+        G = self.bundle.G
+        g = nx.DiGraph() if G.directed else nx.Graph()
+        g.graph['s_id'] = self.graph['s_id']
+        types = G.node_type[self.bundle.node_mask[self.k]]
+        g.add_nodes_from((node, {'type': NODE_TYPES[t]}) for node, t in zip(self.nodes, types))
+        g.nodes[self.graph['s_id']]['demand'] = self.bundle.demand[self.k]
+        e = self.edge_ids
+        values = {name: getattr(self.bundle, name)[self.k, e].tolist() for name in attrs}
+        for n, (u, v) in enumerate(self.edges):
+            g.add_edge(u, v, **{name: values[name][n] for name in attrs})
+        return g
+
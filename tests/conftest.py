@@ -0,0 +1,33 @@
+import os
+import sys
+
+# Модули репозитория лежат в корне, без пакета: корень добавляется в путь импорта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import importlib
+import random
+import numpy as np
+import pytest
+from benchmark import ALGORITHMS, effective_distance_func, EPSILON
+from scenarios import generate_scenario
+
+
+# Небольшой сценарий, на котором решатели работают доли секунды
+@pytest.fixture(scope='session')
+def scenario():
+    return generate_scenario(n_suppliers=6, n_dcs=4, n_retailers=12, seed=1)
+
+# Запуск решателя из benchmark.ALGORITHMS на сценарии с фиксированным зерном ГСЧ:
+# run_solver(name, G=None, **kwargs) — G по умолчанию строится из сценария заново; возвращает G
+@pytest.fixture
+def run_solver(scenario):
+    def run(name, G=None, **kwargs):
+        module, function, directed, extra = ALGORITHMS[name]
+        algorithm = getattr(importlib.import_module(module), function)
+        if G is None:
+            G = scenario.to_compact(directed=directed)
+        random.seed(0)
+        np.random.seed(0)
+        algorithm(G, scenario, effective_distance_func, EPSILON, **{**extra, **kwargs})
+        return G
+    return run
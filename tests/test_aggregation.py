@@ -0,0 +1,55 @@
+import networkx as nx
+import numpy as np
+import non_oriented_PPA
+from aggregation import AggregatedBundle, aggregate_subgraphs, group_suppliers
+from benchmark import effective_distance_func, EPSILON
+from compact_graph import CompactGraph
+from non_oriented_graph import create_subgraphs
+from validation import validate_flows
+
+# Поставщики 1 и 2 с одинаковыми соседями и пропорциональным спросом, у поставщика 3 доли спроса другие
+DEMAND = {1: {100: 2, 101: 4}, 2: {100: 1, 101: 2}, 3: {100: 3, 101: 1}}
+
+
+def network():
+    G = nx.Graph()
+    G.add_nodes_from([1, 2, 3], type='supplier')
+    G.add_nodes_from([10, 11], type='dc')
+    G.add_nodes_from([100, 101], type='retail')
+    G.add_edges_from((s, dc) for s in (1, 2, 3) for dc in (10, 11))
+    G.add_edges_from((dc, r) for dc in (10, 11) for r in (100, 101))
+    return CompactGraph.from_networkx(G)
+
+
+def test_groups_need_same_topology_and_proportional_demand():
+    G = network()
+    np.random.seed(0)
+    graphs = create_subgraphs(G, DEMAND)
+    assert [[graphs.s_ids[k] for k in members] for members in group_suppliers(graphs)] == [[1, 2], [3]]
+    aggregated = aggregate_subgraphs(graphs)
+    assert isinstance(aggregated, AggregatedBundle) and len(aggregated) == 2
+    assert aggregated.supply[0] == {G.index[1]: 6, G.index[2]: 3}
+    np.testing.assert_array_equal(aggregated.collapse(graphs.flow + 1), [graphs.flow[:2].sum(axis=0) + 2, graphs.flow[2] + 1])
+
+def test_nothing_to_group_returns_the_bundle():
+    G = network()
+    graphs = create_subgraphs(G, {1: {100: 2, 101: 4}, 3: {100: 3, 101: 1}})
+    assert aggregate_subgraphs(graphs) is graphs
+
+def test_expand_splits_group_flow_by_demand_share():
+    G = network()
+    np.random.seed(0)
+    graphs = non_oriented_PPA.physarum_algorithm(G, DEMAND, effective_distance_func, EPSILON, aggregate=True,
+                                                 get_subgraphs=True)
+    dc_retail = (G.node_type[G.src] != 0) & (G.node_type[G.dst] != 0)
+    assert graphs.flow[1, dc_retail].any()
+    np.testing.assert_allclose(graphs.flow[0, dc_retail], 2 * graphs.flow[1, dc_retail])
+    # рёбра поставщика несут только его собственный поток
+    own = (G.node_ids[G.src] == 2) | (G.node_ids[G.dst] == 2)
+    assert not graphs.flow[0, own].any()
+
+def test_aggregated_solve_meets_demand():
+    G = network()
+    np.random.seed(0)
+    non_oriented_PPA.physarum_algorithm(G, DEMAND, effective_distance_func, EPSILON, aggregate=True)
+    assert validate_flows(G, DEMAND).max_relative_error < 0.05
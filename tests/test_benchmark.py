@@ -0,0 +1,49 @@
+import csv
+import json
+import pytest
+import benchmark
+from benchmark import ALGORITHMS, FIELDS, SIZES
+
+
+def test_parse_size():
+    assert benchmark.parse_size('10x5x20') == dict(n_suppliers=10, n_dcs=5, n_retailers=20)
+    assert benchmark.parse_size('10X5X20:0.5') == dict(n_suppliers=10, n_dcs=5, n_retailers=20,
+                                                       supplier_density=0.5, retail_density=0.5)
+    assert benchmark.parse_size('10x5x20:0.5:0.2')['retail_density'] == 0.2
+
+# restricted_ACO даже на tiny работает секунды (см. test_restricted_aco)
+FAST = [name for name in ALGORITHMS if name != 'restricted_ACO']
+
+def test_every_algorithm_runs_on_the_tiny_size():
+    records = benchmark.run_benchmark(SIZES['tiny'], FAST, trials=1, memory=False, verbose=False)
+    assert [r['algorithm'] for r in records] == FAST
+    for record in records:
+        assert set(record) == set(FIELDS)
+        assert record['error'] is None, record['algorithm']
+        assert record['time'] > 0 and record['n_edges'] == 3 * 5 + 3 * 2 + 3 * 10
+        assert record['peak_memory'] is None
+
+def test_trial_with_memory_accounting():
+    record = benchmark.run_trial('non_oriented_PPA', SIZES['tiny'][0], trial=0, seed=3)
+    assert record['error'] is None and record['seed'] == 3
+    assert record['peak_memory'] > 0 and record['iterations'] > 0
+    assert any(key.startswith('phase:') for key in record['memory_breakdown'])
+
+def test_failing_algorithm_is_recorded(monkeypatch):
+    monkeypatch.setitem(ALGORITHMS, 'broken', ('non_oriented_PPA', 'missing_function', False, {}))
+    record = benchmark.run_trial('broken', SIZES['tiny'][0], trial=0, seed=0, memory=False)
+    assert record['error'].startswith('AttributeError') and record['time'] is None
+
+def test_records_are_written(tmp_path):
+    records = [benchmark.run_trial('non_oriented_DJA', SIZES['tiny'][0], trial=0, seed=0)]
+    benchmark.write_json(records, tmp_path / 'run.json')
+    benchmark.write_csv(records, tmp_path / 'run.csv')
+    assert json.loads((tmp_path / 'run.json').read_text()) == records
+    with open(tmp_path / 'run.csv', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == list(FIELDS) and rows[0]['algorithm'] == 'non_oriented_DJA'
+    assert json.loads(rows[0]['memory_breakdown']) == records[0]['memory_breakdown']
+
+def test_unknown_preset_is_parsed_as_size():
+    with pytest.raises(ValueError):
+        benchmark.parse_size('tiny')
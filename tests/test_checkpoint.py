@@ -0,0 +1,68 @@
+import json
+import os
+import numpy as np
+import pytest
+import checkpoint
+from checkpoint import Checkpoint
+
+# Решатель, полное число итераций и итерация, после которой запуск прерывается
+CASES = [('algorithm_utils_PPA', 12, 5), ('non_oriented_PPA', 12, 5), ('oriented_PPA', 5, 2),
+         ('restricted_PPA', 40, 20), ('non_oriented_ACO', 6, 2), ('oriented_ACO', 6, 2),
+         ('restricted_ACO', 6, 2)]
+
+
+@pytest.mark.parametrize('name, iterations, stop', CASES)
+def test_resume_matches_uninterrupted_run(tmp_path, run_solver, name, iterations, stop):
+    path = str(tmp_path / 'run.state')
+    whole = run_solver(name, max_iterations=iterations)
+    run_solver(name, max_iterations=stop, checkpoint=Checkpoint(path, every=1))
+    resumed = run_solver(name, max_iterations=iterations, checkpoint=path)
+    np.testing.assert_array_equal(resumed.edge_attrs['flow'], whole.edge_attrs['flow'])
+    np.testing.assert_array_equal(resumed.active, whole.active)
+    assert resumed.stats['iterations'] == whole.stats['iterations']
+
+def test_checkpoint_of_another_solver_is_rejected(tmp_path, run_solver):
+    path = str(tmp_path / 'run.state')
+    run_solver('non_oriented_PPA', max_iterations=2, checkpoint=Checkpoint(path, every=1))
+    with pytest.raises(ValueError):
+        run_solver('oriented_PPA', max_iterations=3, checkpoint=path)
+
+def test_state_file_is_updated_in_place(tmp_path, run_solver):
+    path = str(tmp_path / 'run.state')
+    saved = Checkpoint(path, every=1)
+    run_solver('non_oriented_PPA', max_iterations=2, checkpoint=saved)
+    size, inode = os.path.getsize(path), os.stat(path).st_ino
+    with open(path + '.json') as f:
+        meta = json.load(f)
+    assert (meta['iteration'], meta['slot']) == (2, 1) and size == 2 * meta['slot_size']
+    # продолжение пишет в тот же файл, поочерёдно в оба слота
+    run_solver('non_oriented_PPA', max_iterations=5, checkpoint=Checkpoint(path, every=1))
+    with open(path + '.json') as f:
+        meta = json.load(f)
+    assert (meta['iteration'], meta['slot']) == (5, 0)
+    assert (os.path.getsize(path), os.stat(path).st_ino) == (size, inode)
+
+def test_interrupted_save_keeps_previous_state(tmp_path, run_solver, monkeypatch):
+    path = str(tmp_path / 'run.state')
+    whole = run_solver('non_oriented_PPA', max_iterations=6)
+    run_solver('non_oriented_PPA', max_iterations=3, checkpoint=Checkpoint(path, every=1))
+    # запись слота прошла, а метаданные не заменены: последней остаётся итерация 3
+    def fail(*args):
+        raise OSError('interrupted')
+    monkeypatch.setattr(checkpoint.os, 'replace', fail)
+    with pytest.raises(OSError):
+        run_solver('non_oriented_PPA', max_iterations=5, checkpoint=Checkpoint(path, every=1))
+    monkeypatch.undo()
+    resumed = run_solver('non_oriented_PPA', max_iterations=6, checkpoint=path)
+    np.testing.assert_array_equal(resumed.edge_attrs['flow'], whole.edge_attrs['flow'])
+
+def test_extra_state_round_trips_through_json():
+    extra = {'best_solutions': {7: {'cost': float('inf'), 'solution': {11: [0, 36]}, 'row': 0}},
+             'prev_cost': np.float64(2.5), 'pruner': (np.arange(4), np.zeros(4, dtype=np.int64)),
+             'rng': np.random.get_state()}
+    decoded = checkpoint._decode(json.loads(json.dumps(checkpoint._encode(extra))))
+    assert decoded['best_solutions'] == extra['best_solutions'] and decoded['prev_cost'] == 2.5
+    edges, below = decoded['pruner']
+    np.testing.assert_array_equal(edges, np.arange(4))
+    assert below.dtype == np.int64
+    np.random.set_state(decoded['rng'])
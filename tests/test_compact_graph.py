@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from benchmark import ALGORITHMS
+
+
+@pytest.mark.parametrize('name', ['non_oriented_PPA', 'oriented_PPA', 'restricted_PPA', 'oriented_ACO', 'non_oriented_DJA'])
+def test_overlay_leaves_base_untouched(scenario, run_solver, name):
+    directed = ALGORITHMS[name][2]
+    base = scenario.to_compact(directed=directed)
+    attrs = {key: values.copy() for key, values in base.edge_attrs.items()}
+    active = base.active.copy()
+
+    solved = run_solver(name, base.overlay())
+    for key, values in attrs.items():
+        np.testing.assert_array_equal(base.edge_attrs[key], values)
+    np.testing.assert_array_equal(base.active, active)
+    assert base.stats == {}
+
+    # на оверлее решение то же, что на отдельной копии графа
+    fresh = run_solver(name)
+    np.testing.assert_array_equal(solved.edge_attrs['flow'], fresh.edge_attrs['flow'])
+    np.testing.assert_array_equal(solved.active, fresh.active)
+
+def test_overlay_topology_is_shared_and_read_only(scenario):
+    base = scenario.to_compact(directed=True)
+    view = base.overlay()
+    assert np.shares_memory(view.src, base.src)
+    assert not np.shares_memory(view.edge_attrs['flow'], base.edge_attrs['flow'])
+    with pytest.raises(ValueError):
+        view.src[0] = 1
+    base.src[0] = base.src[0]
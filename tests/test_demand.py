@@ -0,0 +1,48 @@
+import collections
+import numpy as np
+from demand import DemandMatrix, as_demand
+from scenarios import generate_scenario
+
+
+def dict_totals(demand_data):
+    suppliers = {s: sum(row.values()) for s, row in demand_data.items()}
+    retail = collections.Counter()
+    for row in demand_data.values():
+        retail.update(row)
+    return suppliers, dict(retail)
+
+def assert_totals(matrix, demand_data):
+    suppliers, retail = dict_totals(demand_data)
+    assert dict(zip(matrix.suppliers.tolist(), matrix.supplier_totals.tolist())) == suppliers
+    assert {s: matrix.total(s) for s in demand_data} == suppliers
+    ids, totals = matrix.retail_totals
+    assert dict(zip(ids.tolist(), totals.tolist())) == retail
+
+
+def test_totals_match_dict_demand():
+    demand_data = generate_scenario(n_suppliers=8, n_dcs=3, n_retailers=15, seed=4).demand_data
+    matrix = DemandMatrix.from_dict(demand_data)
+    assert matrix.to_dict() == demand_data
+    assert matrix.nnz == sum(len(row) for row in demand_data.values())
+    assert_totals(matrix, demand_data)
+    assert matrix.total(-1) == 0
+
+def test_constructors_agree():
+    demand_data = {1: {10: 2, 11: 3}, 2: {11: 1.5}, 3: {}}
+    matrix = as_demand(demand_data)
+    assert_totals(matrix, demand_data)
+    dense = DemandMatrix.from_dense([1, 2, 3], [10, 11], [[2, 3], [0, 1.5], [0, 0]])
+    assert dense.to_dict() == demand_data
+    # повторяющиеся пары складываются, нулевые суммы не хранятся
+    entries = DemandMatrix.from_entries([1, 1, 2, 1, 2, 2], [10, 11, 11, 11, 12, 12], [2, 1, 1.5, 2, 4, -4])
+    assert entries.to_dict() == {1: {10: 2, 11: 3}, 2: {11: 1.5}}
+    np.testing.assert_array_equal(entries.supplier_totals, [5, 1.5])
+
+# Пары с нулевым объёмом из словаря сохраняются: demand[s] совпадает с исходной строкой
+def test_zero_entries_of_dict_are_kept():
+    demand_data = {1: {10: 0, 11: 3}, 2: {10: 0}}
+    matrix = DemandMatrix.from_dict(demand_data)
+    assert matrix.to_dict() == demand_data
+    assert matrix[2] == {10: 0}
+    assert matrix.nnz == 3
+    assert_totals(matrix, demand_data)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from flow_aggregation import FlowAggregator
+from non_oriented_graph import create_subgraphs
+
+
+@pytest.fixture
+def graphs(scenario):
+    graphs = create_subgraphs(scenario.to_compact(directed=False), scenario)
+    graphs.flow[:] = np.random.default_rng(0).normal(size=graphs.flow.shape)
+    return graphs
+
+
+def test_total_is_the_graph_flow_array(graphs):
+    aggregator = FlowAggregator(graphs)
+    assert aggregator.total is graphs.G.edge_attrs['flow']
+    np.testing.assert_allclose(aggregator.total, np.clip(graphs.flow, 0, None).sum(axis=0))
+    assert graphs.aggregator is aggregator
+
+def test_signed_sum(graphs):
+    for incremental in (True, False):
+        aggregator = FlowAggregator(graphs, positive=False, incremental=incremental)
+        np.testing.assert_allclose(aggregator.total, graphs.flow.sum(axis=0))
+
+def test_row_update_matches_full_recompute(graphs):
+    aggregator = FlowAggregator(graphs)
+    graphs.flow[[1, 3]] *= -2
+    graphs.flow[4] += 1
+    aggregator.update([1, 3, 4])
+    np.testing.assert_allclose(aggregator.total, np.clip(graphs.flow, 0, None).sum(axis=0))
+    np.testing.assert_allclose(aggregator.contrib, np.clip(graphs.flow, 0, None))
+
+def test_add_accumulates_repeated_edges(graphs):
+    aggregator = FlowAggregator(graphs)
+    before, row = aggregator.total.copy(), graphs.flow[2].copy()
+    aggregator.add(2, [5, 7, 5], 3.0)
+    row[[5, 7]] += [6.0, 3.0]
+    np.testing.assert_allclose(graphs.flow[2], row)
+    untouched = np.ones(len(before), dtype=bool)
+    untouched[[5, 7]] = False
+    np.testing.assert_array_equal(aggregator.total[untouched], before[untouched])
+    np.testing.assert_allclose(aggregator.total, np.clip(graphs.flow, 0, None).sum(axis=0))
+
+def test_drop_clears_removed_edges(graphs):
+    aggregator = FlowAggregator(graphs)
+    aggregator.drop([0, 2])
+    assert not aggregator.total[[0, 2]].any() and not aggregator.contrib[:, [0, 2]].any()
+    # при следующем обновлении строки удалённые рёбра остаются пустыми, если поток строки на них обнулён
+    graphs.flow[:, [0, 2]] = 0
+    aggregator.update([0])
+    assert not aggregator.total[[0, 2]].any()
+
+def test_full_recompute_has_no_contrib(graphs):
+    aggregator = FlowAggregator(graphs, incremental=False)
+    assert aggregator.contrib is None
+    graphs.flow *= 2
+    np.testing.assert_allclose(aggregator.update(), np.clip(graphs.flow, 0, None).sum(axis=0))
+    with pytest.raises(ValueError):
+        aggregator.update([0])
+    aggregator.drop([1])
+    assert aggregator.total[1] == 0
@@ -0,0 +1,58 @@
+import collections
+import numpy as np
+import pytest
+from compact_graph import TYPE_CODE
+from ingest import ingest_network
+
+LANES = [(1, 10), (10, 20), (1, 10), (10, 1), (2, 10), (10, 21), (2, 10), (10, 20), (2, 21)]
+ORDERS = [(1, 20, 3), (1, 20, 4), (2, 20, 1), (2, 21, 5), (1, 21, 2), (2, 21, 1), (1, 20, -7)]
+
+
+def write_csv(path, header, rows):
+    path.write_text(header + '\n' + ''.join(','.join(map(str, row)) + '\n' for row in rows))
+    return path
+
+def edge_set(G):
+    ids = G.node_ids
+    pairs = zip(ids[G.src].tolist(), ids[G.dst].tolist())
+    return set(pairs) if G.directed else {tuple(sorted(pair)) for pair in pairs}
+
+
+# Маленький chunk_lines проверяет слияние блоков: повторы полос и заказов попадают в разные блоки
+@pytest.mark.parametrize('chunk_lines', [1, 2, 1 << 20])
+@pytest.mark.parametrize('directed', [True, False])
+def test_duplicate_lanes_and_orders_are_merged(tmp_path, directed, chunk_lines):
+    edges = write_csv(tmp_path / 'lanes.csv', 'from,to', LANES)
+    orders = write_csv(tmp_path / 'orders.csv', 'supplier,retail,volume', ORDERS)
+    G, demand = ingest_network(edges, orders, directed=directed, chunk_lines=chunk_lines)
+
+    expected = set(LANES) if directed else {tuple(sorted(lane)) for lane in LANES}
+    assert G.n_edges == len(expected)
+    assert edge_set(G) == expected
+
+    volumes = collections.defaultdict(dict)
+    for s, r, v in ORDERS:
+        volumes[s][r] = volumes[s].get(r, 0) + v
+    # объём пары (1, 20) в сумме нулевой и не хранится
+    del volumes[1][20]
+    assert demand.to_dict() == volumes
+
+    types = dict(zip(G.node_ids.tolist(), G.node_type.tolist()))
+    assert types == {1: TYPE_CODE['supplier'], 2: TYPE_CODE['supplier'], 10: TYPE_CODE['dc'],
+                     20: TYPE_CODE['retail'], 21: TYPE_CODE['retail']}
+
+def test_node_types_from_node_file(tmp_path):
+    edges = write_csv(tmp_path / 'lanes.csv', 'from,to', LANES + [(10, 30)])
+    nodes = write_csv(tmp_path / 'nodes.csv', 'id,type', [(1, 'supplier'), (2, 'supplier'), (10, 'dc'),
+                                                          (20, 'retail'), (21, 'retail'), (30, 'retail'), (40, 'dc')])
+    G, demand = ingest_network(edges, node_path=nodes, chunk_lines=2)
+    types = dict(zip(G.node_ids.tolist(), G.node_type.tolist()))
+    # 30 — розничная точка без заказов, 40 — узел без полос
+    assert types[30] == TYPE_CODE['retail']
+    assert types[40] == TYPE_CODE['dc']
+    assert len(demand) == 0
+
+    with pytest.raises(ValueError):
+        ingest_network(write_csv(tmp_path / 'more.csv', 'from,to', [(1, 50)]), node_path=nodes)
+    with pytest.raises(ValueError):
+        ingest_network(edges, node_path=write_csv(tmp_path / 'bad.csv', 'id,type', [(1, 'depot')]))
@@ -0,0 +1,121 @@
+import random
+import numpy as np
+import pytest
+import iteration
+import non_oriented_PPA
+import oriented_ACO
+from benchmark import effective_distance_func, EPSILON
+from compact_graph import CompactGraph
+from iteration import BestIterate
+from non_oriented_PPA import physarum_iter
+from validation import validate_flows
+
+
+# Срок, который тест может исчерпать в нужный момент (deadline.end = 0)
+@pytest.fixture
+def deadline(monkeypatch):
+    created = []
+    def make(time_limit, Deadline=iteration.Deadline):
+        created.append(Deadline(time_limit))
+        return created[-1]
+    monkeypatch.setattr(iteration, 'Deadline', make)
+    return created
+
+def error_and_cost(G, scenario):
+    report = validate_flows(G, scenario)
+    flow = np.where(G.active, G.edge_attrs['flow'], 0)
+    return report.supplier_error + report.consumer_error, float(flow @ effective_distance_func(flow))
+
+
+def test_best_iterate_prefers_lower_error_then_lower_cost(scenario):
+    G = scenario.to_compact(directed=False)
+    best = BestIterate(G, non_oriented_PPA.create_subgraphs(G, scenario), scenario)
+    # нулевой поток не выполняет спрос
+    best.update(1, cost=0.0)
+    solved = scenario.to_compact(directed=False)
+    non_oriented_PPA.physarum_algorithm(solved, scenario, effective_distance_func, EPSILON)
+    G.edge_attrs['flow'][:] = solved.edge_attrs['flow']
+    # спрос выполнен лучше — итерация лучше, хотя дороже
+    best.update(2, cost=10.0)
+    assert best.iteration == 2 and best.error < 100
+    # та же ошибка: дороже — не лучше, дешевле — лучше
+    best.update(3, cost=20.0)
+    assert best.iteration == 2
+    best.update(4, cost=5.0)
+    assert best.iteration == 4
+    G.edge_attrs['flow'][:] = 0
+    best.restore()
+    np.testing.assert_array_equal(G.edge_attrs['flow'], solved.edge_attrs['flow'])
+    assert G.stats['best_iteration'] == 4
+
+def test_timeout_restores_the_best_iterate(scenario, deadline):
+    G = scenario.to_compact(directed=False)
+    seen = {}
+    for snapshot in physarum_iter(G, scenario, effective_distance_func, EPSILON, time_limit=60):
+        seen[snapshot.iteration] = (error_and_cost(G, scenario), np.array(snapshot.flow))
+        if snapshot.iteration == 8:
+            deadline[0].end = 0.0
+    best = min(seen, key=lambda it: seen[it][0])
+    assert G.stats['timed_out'] and G.stats['iterations'] == 8
+    assert G.stats['best_iteration'] == best
+    np.testing.assert_array_equal(G.edge_attrs['flow'], seen[best][1])
+
+def test_deadline_is_checked_after_pressures(scenario, deadline, monkeypatch):
+    # срок истекает во время расчёта давлений: итерация не засчитывается, потоки не обновляются
+    pressures = non_oriented_PPA.calculate_node_pressures
+    def slow_pressures(graphs):
+        pressures(graphs)
+        deadline[0].end = 0.0
+    monkeypatch.setattr(non_oriented_PPA, 'calculate_node_pressures', slow_pressures)
+    G = scenario.to_compact(directed=False)
+    assert list(physarum_iter(G, scenario, effective_distance_func, EPSILON, time_limit=60)) == []
+    assert G.stats['timed_out'] and G.stats['iterations'] == 0
+    assert not G.edge_attrs['flow'].any()
+
+@pytest.mark.parametrize('name', ['non_oriented_DJA', 'non_oriented_ASTAR'])
+def test_router_marks_partial_routing(run_solver, name):
+    assert run_solver(name).stats['partial'] is False
+    G = run_solver(name, time_limit=0)
+    assert G.stats['partial'] and G.stats['timed_out']
+
+
+def test_physarum_iter_matches_the_algorithm(scenario):
+    G, H = scenario.to_compact(directed=False), scenario.to_compact(directed=False)
+    np.random.seed(0)
+    snapshots = [(s.iteration, s.residual, s.cost, s.converged)
+                 for s in physarum_iter(G, scenario, effective_distance_func, EPSILON)]
+    np.random.seed(0)
+    non_oriented_PPA.physarum_algorithm(H, scenario, effective_distance_func, EPSILON)
+    assert [it for it, *_ in snapshots] == list(range(1, G.stats['iterations'] + 1))
+    assert all(residual is not None and cost is None for _, residual, cost, _ in snapshots)
+    assert [converged for *_, converged in snapshots] == [False] * (len(snapshots) - 1) + [G.stats['converged']]
+    np.testing.assert_array_equal(G.edge_attrs['flow'], H.edge_attrs['flow'])
+
+def test_snapshot_views_are_read_only(scenario):
+    G = scenario.to_compact(directed=False)
+    snapshot = next(physarum_iter(G, scenario, effective_distance_func, EPSILON))
+    assert np.shares_memory(snapshot.flow, G.edge_attrs['flow'])
+    with pytest.raises(ValueError):
+        snapshot.flow[0] = 1.0
+    with pytest.raises(ValueError):
+        snapshot.subgraph_flow[0, 0] = 1.0
+    assert snapshot.active_edges == G.active.sum()
+    assert G.edge_attrs['flow'].flags.writeable
+
+def test_early_stop_writes_back_to_networkx(scenario):
+    G = scenario.to_networkx(directed=False)
+    for snapshot in physarum_iter(G, scenario, effective_distance_func, EPSILON):
+        if snapshot.iteration == 3:
+            flow = np.array(snapshot.flow)
+            break
+    compact = CompactGraph.from_networkx(G)
+    np.testing.assert_array_equal(compact.edge_attrs['flow'], flow)
+    assert G.graph['stats']['iterations'] == 3
+
+def test_aco_iter_reports_cost(scenario):
+    G = scenario.to_compact(directed=True)
+    random.seed(0)
+    np.random.seed(0)
+    snapshots = list(oriented_ACO.aco_iter(G, scenario, effective_distance_func, EPSILON))
+    assert snapshots and all(s.cost is not None and s.residual is None for s in snapshots)
+    assert [s.iteration for s in snapshots] == list(range(1, len(snapshots) + 1))
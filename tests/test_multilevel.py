@@ -0,0 +1,64 @@
+import networkx as nx
+import numpy as np
+import non_oriented_PPA
+from benchmark import effective_distance_func, EPSILON
+from compact_graph import CompactGraph
+from multilevel import RetailCoarsening, multilevel_solve
+from validation import validate_flows
+
+# Розничные точки 100 и 101 обслуживаются одними и теми же РЦ и сливаются в один узел, у 102 соседи другие
+DEMAND = {1: {100: 1, 101: 3, 102: 2}, 2: {100: 2, 101: 2}}
+
+
+def network(retail=(100, 101, 102)):
+    G = nx.Graph()
+    G.add_nodes_from([1, 2], type='supplier')
+    G.add_nodes_from([10, 11], type='dc')
+    G.add_nodes_from(retail, type='retail')
+    G.add_edges_from((s, dc) for s in (1, 2) for dc in (10, 11))
+    G.add_edges_from((dc, r) for r in retail for dc in ((11,) if r == 102 else (10, 11)))
+    return CompactGraph.from_networkx(G)
+
+
+def test_retail_with_same_neighbours_is_merged():
+    G = network()
+    coarsening = RetailCoarsening(G, DEMAND)
+    assert coarsening.reduced
+    assert coarsening.graph.node_ids.tolist() == [1, 2, 10, 11, 100, 102]
+    assert coarsening.node_map[G.index[101]] == coarsening.node_map[G.index[100]]
+    assert coarsening.graph.n_edges == 7
+    assert coarsening.demand_data.to_dict() == {1: {100: 4, 102: 2}, 2: {100: 4}}
+
+def test_prolong_splits_flow_by_demand_share():
+    G = network()
+    coarsening = RetailCoarsening(G, DEMAND)
+    flow = coarsening.prolong(np.ones((2, coarsening.graph.n_edges)))
+    np.testing.assert_allclose(flow[:, G.edge_id(10, 100)], [0.25, 0.5])
+    np.testing.assert_allclose(flow[:, G.edge_id(10, 101)], [0.75, 0.5])
+    # рёбра вне кластеров переносятся без изменений
+    np.testing.assert_allclose(flow[:, G.edge_id(1, 10)], 1)
+    np.testing.assert_allclose(flow[:, G.edge_id(11, 102)], 1)
+
+def test_nothing_to_merge_solves_the_original_problem():
+    demand = {1: {100: 1, 102: 2}, 2: {100: 2}}
+    G, H = network((100, 102)), network((100, 102))
+    assert not RetailCoarsening(G, demand).reduced
+    np.random.seed(0)
+    multilevel_solve(G, non_oriented_PPA.physarum_algorithm, demand, effective_distance_func, EPSILON)
+    np.random.seed(0)
+    non_oriented_PPA.physarum_algorithm(H, demand, effective_distance_func, EPSILON)
+    np.testing.assert_array_equal(G.edge_attrs['flow'], H.edge_attrs['flow'])
+
+def test_multilevel_solve_meets_demand(scenario):
+    G = scenario.to_compact(directed=False)
+    assert RetailCoarsening(G, scenario).reduced
+    np.random.seed(0)
+    multilevel_solve(G, non_oriented_PPA.physarum_algorithm, scenario, effective_distance_func, EPSILON)
+    assert validate_flows(G, scenario).max_relative_error < 0.05
+
+def test_small_network_is_solved_through_the_coarse_level():
+    G = network()
+    np.random.seed(0)
+    multilevel_solve(G, non_oriented_PPA.physarum_algorithm, DEMAND, effective_distance_func, EPSILON)
+    report = validate_flows(G, DEMAND)
+    assert report.passed and report.max_relative_error < 1e-3
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from compact_graph import EDGE_ATTRS
+from network_file import save_network, load_network
+from scenarios import generate_scenario
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_save_load_round_trip(tmp_path, directed):
+    scenario = generate_scenario(n_suppliers=6, n_dcs=4, n_retailers=12, seed=1)
+    G = scenario.to_compact(directed=directed)
+    G.edge_attrs['flow'][:] = np.arange(G.n_edges)
+    G.active[::5] = False
+    path = tmp_path / 'network.bin'
+    save_network(path, G, scenario)
+
+    loaded, demand = load_network(path)
+    assert loaded.directed == directed
+    for name in ('node_ids', 'node_type', 'src', 'dst', 'out_ptr', 'out_edges', 'in_ptr', 'in_edges', 'active'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(G, name))
+    for name in EDGE_ATTRS:
+        np.testing.assert_array_equal(loaded.edge_attrs[name], G.edge_attrs[name])
+    assert demand.to_dict() == scenario.demand_data
+
+def test_loaded_graph_is_copy_on_write(tmp_path):
+    G = generate_scenario(n_suppliers=3, n_dcs=2, n_retailers=5, seed=0).to_compact(directed=True)
+    path = tmp_path / 'network.bin'
+    save_network(path, G)
+    loaded, demand = load_network(path)
+    assert demand is None
+    loaded.edge_attrs['flow'][:] = 7
+    loaded.active[:] = False
+    with pytest.raises(ValueError):
+        loaded.src[0] = 1
+    # изменения остаются в памяти процесса, файл прежний
+    reloaded, _ = load_network(path)
+    np.testing.assert_array_equal(reloaded.edge_attrs['flow'], G.edge_attrs['flow'])
+    assert reloaded.active.all()
@@ -0,0 +1,78 @@
+import networkx as nx
+import numpy as np
+import pytest
+import non_oriented_graph
+import non_oriented_PPA
+import oriented_graph
+import oriented_PPA
+from compact_graph import CompactGraph
+from preprocessing import _block_path_nodes
+
+DEMAND = {1: {100: 5, 101: 3}, 2: {100: 4, 101: 2}}
+
+
+# Сеть с тремя цепочками транзитных узлов степени 2: 1 — 10 — 11 — 12 — 20, 1 — 21 — 22 — 20 и 2 — 23 — 100
+def chain_network(directed):
+    G = nx.DiGraph() if directed else nx.Graph()
+    G.add_nodes_from([1, 2], type='supplier')
+    G.add_nodes_from([100, 101], type='retail')
+    G.add_nodes_from([10, 11, 12, 20, 21, 22, 23], type='dc')
+    G.add_edges_from([(1, 10), (10, 11), (11, 12), (12, 20), (1, 21), (21, 22), (22, 20),
+                      (2, 20), (2, 23), (23, 100), (20, 100), (20, 101), (1, 101)])
+    for u, v in G.edges:
+        G.edges[u, v]['length'] = 1.0 + (u + v) % 3
+    return CompactGraph.from_networkx(G)
+
+# Давления подграфов после сходимости прохода Гаусса — Зейделя. Давление определено с точностью
+# до постоянной, поэтому сравниваются давления относительно поставщика (узлы вне подграфа — 0).
+def solved_pressures(graph_module, ppa_module, directed, contract):
+    np.random.seed(0)
+    graphs = graph_module.create_subgraphs(chain_network(directed), DEMAND)
+    assert graphs.chains.n_chains == 3
+    if not contract:
+        graphs.chains = None
+    for _ in range(3000):
+        ppa_module.calculate_node_pressures(graphs)
+    relative = graphs.pressure - graphs.pressure[np.arange(len(graphs)), graphs.suppliers][:, None]
+    return np.where(graphs.node_mask, relative, 0)
+
+
+@pytest.mark.parametrize('graph_module, ppa_module, directed', [
+    (non_oriented_graph, non_oriented_PPA, False),
+    (oriented_graph, oriented_PPA, True),
+])
+def test_chain_contraction_gives_uncontracted_pressures(graph_module, ppa_module, directed):
+    contracted = solved_pressures(graph_module, ppa_module, directed, contract=True)
+    plain = solved_pressures(graph_module, ppa_module, directed, contract=False)
+    assert np.abs(contracted).max() > 0
+    np.testing.assert_allclose(contracted, plain, atol=1e-9)
+
+
+# Путь 1 — 10 — 100 с треугольником 10 — 11 — 12, присоединённым к пути одной точкой:
+# узлы 11 и 12 не лежат ни на одном пути поставщик → потребитель и удаляются из подграфа
+def test_dangling_cycle_is_pruned():
+    G = nx.Graph()
+    G.add_node(1, type='supplier')
+    G.add_nodes_from([10, 11, 12], type='dc')
+    G.add_node(100, type='retail')
+    G.add_edges_from([(1, 10), (10, 100), (10, 11), (11, 12), (12, 10)])
+    graphs = non_oriented_graph.create_subgraphs(CompactGraph.from_networkx(G), {1: {100: 5}})
+    assert graphs[0].graph['s_id'] == 1
+    assert sorted(graphs.G.node_ids[graphs.node_mask[0]].tolist()) == [1, 10, 100]
+    assert np.count_nonzero(graphs.edge_mask[0]) == 2
+
+# Узлы, оставленные по дереву блоков, — ровно узлы простых путей от поставщика к потребителям
+@pytest.mark.parametrize('seed', range(8))
+def test_block_pruning_matches_simple_paths(seed):
+    rng = np.random.default_rng(seed)
+    H = nx.gnm_random_graph(14, 20, seed=seed)
+    G = CompactGraph.from_networkx(H)
+    mask = np.ones(G.n_nodes, dtype=bool)
+    terminal = np.zeros(G.n_nodes, dtype=bool)
+    terminal[rng.choice(np.arange(1, G.n_nodes), size=3, replace=False)] = True
+    kept = _block_path_nodes(G, mask, terminal, 0)
+    expected = {0}
+    for t in np.flatnonzero(terminal).tolist():
+        for path in nx.all_simple_paths(H, 0, t):
+            expected.update(path)
+    assert set(np.flatnonzero(kept).tolist()) == expected
@@ -0,0 +1,110 @@
+import importlib
+import time
+import tracemalloc
+import numpy as np
+import pytest
+import non_oriented_DJA
+import non_oriented_PPA
+import profiling
+from profiling import MemoryProfiler, Profiler, current, format_report, profile_run
+from benchmark import ALGORITHMS, effective_distance_func, EPSILON
+
+
+def test_phases_counters_and_gauges_accumulate():
+    prof = Profiler()
+    for _ in range(3):
+        with prof.phase('work'):
+            time.sleep(0.001)
+    with pytest.raises(RuntimeError):
+        with prof.phase('failing'):
+            raise RuntimeError
+    prof.count('steps')
+    prof.count('steps', 4)
+    prof.gauge('bytes', 10)
+    prof.gauge('bytes', 5)
+    report = prof.report()
+    assert report['phases']['work']['calls'] == 3 and report['phases']['work']['time'] >= 0.003
+    assert report['phases']['failing']['calls'] == 1
+    assert report['counters'] == {'steps': 5} and report['gauges'] == {'bytes': 10}
+
+def test_profiling_is_off_outside_profile_run():
+    assert not current().enabled
+    with current().phase('anything'):
+        current().count('ignored')
+    prof = Profiler()
+    with profiling.profiling(prof):
+        assert current() is prof
+    assert not current().enabled
+
+@pytest.mark.parametrize('name', ['non_oriented_PPA', 'oriented_ACO', 'non_oriented_DJA'])
+def test_solver_phases_are_recorded(scenario, name):
+    module, function, directed, extra = ALGORITHMS[name]
+    algorithm = getattr(importlib.import_module(module), function)
+    G = scenario.to_compact(directed=directed)
+    np.random.seed(0)
+    _, report = profile_run(algorithm, G, scenario, effective_distance_func, EPSILON, **extra)
+    assert G.stats['profile'] is report
+    assert report['phases'] and all(p['calls'] > 0 for p in report['phases'].values())
+    assert sum(p['time'] for p in report['phases'].values()) <= report['time']
+    assert 'cprofile' not in report and 'memory' not in report
+
+def test_ppa_loop_phases(scenario):
+    G = scenario.to_compact(directed=False)
+    np.random.seed(0)
+    _, report = profile_run(non_oriented_PPA.physarum_algorithm, G, scenario, effective_distance_func, EPSILON)
+    phases = report['phases']
+    iterations = G.stats['iterations']
+    for phase in ('pressures', 'flow_conductivity', 'total_flow', 'edge_length', 'term_criteria'):
+        assert phases[phase]['calls'] == iterations
+    assert phases['subgraphs']['calls'] == 1
+    assert report['counters']['removed_edges'] == G.n_edges - G.active.sum()
+    assert report['gauges']['graph_bytes'] == G.nbytes
+
+def test_networkx_graph_keeps_the_report(scenario):
+    G = scenario.to_networkx(directed=False)
+    _, report = profile_run(non_oriented_DJA.dijkstra_algorithm, G, scenario, effective_distance_func, EPSILON,
+                            cprofile=True, top=5)
+    assert G.graph['stats']['profile'] is report
+    assert 'dijkstra_algorithm' in report['cprofile']
+    assert report['counters']['edge_relaxations'] > 0
+
+def test_format_report():
+    report = {'time': 2.0, 'phases': {'a': {'time': 0.5, 'calls': 2}, 'b': {'time': 1.0, 'calls': 1}},
+              'counters': {'steps': 7}, 'gauges': {}}
+    lines = format_report(report).splitlines()
+    assert [line.split()[0] for line in lines[1:3]] == ['b', 'a']
+    assert lines[3].split()[-2:] == ['0.5000', '25.0%']
+    assert lines[4].split() == ['steps', '7']
+
+
+def test_memory_profiler_tracks_phase_allocations():
+    tracemalloc.start()
+    try:
+        prof = MemoryProfiler()
+        with prof.phase('kept'):
+            kept = np.ones(2**18)
+        with prof.phase('temporary'):
+            np.ones(2**19).sum()
+        report = prof.report()
+    finally:
+        tracemalloc.stop()
+    memory = report['memory']['phases']
+    assert memory['kept']['allocated'] >= kept.nbytes and memory['kept']['peak'] >= kept.nbytes
+    # временный массив освобождён к концу фазы, но виден в её пике
+    assert memory['temporary']['allocated'] < 2**12 and memory['temporary']['peak'] >= 2**22
+    assert report['memory']['peak'] >= 2**22
+    assert report['phases']['kept']['calls'] == 1
+
+def test_profile_run_with_memory(scenario):
+    G = scenario.to_compact(directed=False)
+    np.random.seed(0)
+    _, report = profile_run(non_oriented_PPA.physarum_algorithm, G, scenario, effective_distance_func, EPSILON,
+                            memory=True)
+    assert not tracemalloc.is_tracing()
+    memory = report['memory']
+    assert set(memory['phases']) == set(report['phases'])
+    assert memory['peak'] >= max(m['peak'] for m in memory['phases'].values()) > 0
+    assert memory['rss_peak'] > memory['peak']
+    assert report['gauges']['subgraph_bytes'] > 0
+    text = format_report(report)
+    assert 'peak (tracemalloc)' in text and 'peak RSS (process)' in text
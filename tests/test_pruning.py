@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import non_oriented_PPA
+from benchmark import effective_distance_func, EPSILON
+from non_oriented_graph import create_subgraphs
+from pruning import EdgePruner
+from validation import validate_flows
+
+
+@pytest.fixture
+def graphs(scenario):
+    graphs = create_subgraphs(scenario.to_compact(directed=False), scenario)
+    graphs.G.edge_attrs['flow'][:] = 10.0
+    return graphs
+
+# Задаёт поток ребра e и возвращает кандидатов на удаление
+def check(pruner, e, flow):
+    pruner.graphs.G.edge_attrs['flow'][e] = flow
+    return pruner.candidates().tolist()
+
+
+def test_without_patience_low_edges_go_at_once(graphs):
+    G = graphs.G
+    G.edge_attrs['flow'][[3, 8]] = 0.5
+    pruner = EdgePruner(graphs, threshold=1.0)
+    assert pruner.prune().tolist() == [3, 8]
+    assert not G.active[[3, 8]].any() and G.active.sum() == G.n_edges - 2
+    assert not graphs.edge_mask[:, [3, 8]].any()
+    assert len(pruner.prune()) == 0
+
+def test_patience_needs_consecutive_checks(graphs):
+    pruner = EdgePruner(graphs, threshold=1.0, patience=3)
+    assert check(pruner, 3, 0.5) == []
+    assert check(pruner, 3, 0.5) == []
+    assert check(pruner, 3, 5.0) == []
+    # подъём потока выше порога сбросил счётчик
+    assert check(pruner, 3, 0.5) == []
+    assert check(pruner, 3, 0.5) == []
+    assert check(pruner, 3, 0.5) == [3]
+
+def test_margin_band_keeps_the_count(graphs):
+    pruner = EdgePruner(graphs, threshold=1.0, patience=3, margin=0.5)
+    assert check(pruner, 3, 0.5) == []
+    # поток в полосе [1.0, 1.5) не удаляет ребро, но и не сбрасывает счётчик
+    assert check(pruner, 3, 1.2) == []
+    assert check(pruner, 3, 0.5) == []
+    assert check(pruner, 3, 0.5) == [3]
+    # поток на верхней границе полосы сбрасывает счётчик
+    assert check(pruner, 3, 1.5) == []
+    assert check(pruner, 3, 0.5) == []
+
+def test_edges_removed_elsewhere_are_skipped(graphs):
+    pruner = EdgePruner(graphs, threshold=1.0)
+    graphs.remove_edges(np.array([3]))
+    graphs.G.edge_attrs['flow'][3] = 0.0
+    assert pruner.prune().tolist() == []
+    assert 3 not in pruner.edges.tolist()
+
+def test_solve_with_hysteresis_meets_demand(scenario):
+    G = scenario.to_compact(directed=False)
+    np.random.seed(0)
+    non_oriented_PPA.physarum_algorithm(G, scenario, effective_distance_func, EPSILON, prune_patience=3, prune_margin=0.5)
+    assert validate_flows(G, scenario).max_relative_error < 0.05
+    assert G.active.sum() < G.n_edges
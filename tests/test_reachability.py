@@ -0,0 +1,40 @@
+import networkx as nx
+import numpy as np
+import pytest
+from compact_graph import CompactGraph
+from scenarios import generate_scenario
+from reachability import ReachabilityIndex
+
+
+# Граф networkx из активных рёбер CompactGraph на индексах узлов
+def active_graph(G):
+    graph = nx.DiGraph() if G.directed else nx.Graph()
+    graph.add_nodes_from(range(G.n_nodes))
+    graph.add_edges_from(zip(G.src[G.active].tolist(), G.dst[G.active].tolist()))
+    return graph
+
+def assert_matches_networkx(G, index):
+    graph = active_graph(G)
+    for i in range(G.n_nodes):
+        expected = nx.descendants(graph, i) | {i}
+        assert set(np.flatnonzero(index.reachable(i)).tolist()) == expected
+
+
+# Сеть сценария (без циклов) и случайный граф с циклами, где компоненты сильной связности нетривиальны
+GRAPHS = {
+    'scenario': lambda directed: generate_scenario(n_suppliers=6, n_dcs=4, n_retailers=12, seed=3).to_compact(directed=directed),
+    'random': lambda directed: CompactGraph.from_networkx(nx.gnp_random_graph(40, 0.08, seed=5, directed=directed)),
+}
+
+@pytest.mark.parametrize('directed', [True, False])
+@pytest.mark.parametrize('graph', sorted(GRAPHS))
+def test_reachable_matches_descendants_after_remove_edges(graph, directed):
+    G = GRAPHS[graph](directed)
+    index = ReachabilityIndex(G)
+    assert_matches_networkx(G, index)
+    rng = np.random.default_rng(0)
+    # рёбра удаляются пачками, пока граф не распадётся на отдельные узлы
+    for edges in np.array_split(rng.permutation(G.n_edges), 6):
+        G.active[edges] = False
+        index.remove_edges(edges)
+        assert_matches_networkx(G, index)
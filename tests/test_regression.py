@@ -0,0 +1,70 @@
+import json
+import math
+import pytest
+import regression
+from regression import compare, exclusion_reason
+
+BASE = {'time_median': 1.0, 'time_mad': 0.01, 'iterations': 10, 'max_relative_error': 0.01}
+
+
+def result(**changes):
+    return {**BASE, **changes}
+
+
+def test_noise_within_limits_passes():
+    assert compare({'a': BASE}, {'a': result(time_median=1.2, iterations=11, max_relative_error=0.01)}) == []
+
+def test_slower_run_is_flagged():
+    [(key, metric, base, now, limit)] = compare({'a': BASE}, {'a': result(time_median=1.4)})
+    assert (key, metric, base, now) == ('a', 'time', 1.0, 1.4)
+    assert limit == pytest.approx(1.0 * (1 + regression.TIME_REL) + regression.NOISE_MADS * 0.01)
+
+def test_noisy_measurements_widen_the_time_limit():
+    assert compare({'a': BASE}, {'a': result(time_median=1.4, time_mad=0.1)}) == []
+
+def test_iterations_and_error_are_flagged():
+    regressions = compare({'a': BASE}, {'a': result(iterations=12, max_relative_error=0.02)})
+    assert [metric for _, metric, *_ in regressions] == ['iterations', 'max_relative_error']
+
+def test_missing_iterations_are_not_compared():
+    assert compare({'a': result(iterations=None)}, {'a': result(iterations=50)}) == []
+
+def test_non_finite_values_always_fail():
+    regressions = compare({'a': BASE, 'b': BASE},
+                          {'a': result(max_relative_error=math.nan), 'b': result(time_median=math.inf)})
+    assert [(key, metric) for key, metric, *_ in regressions] == [('a', 'max_relative_error'), ('b', 'time_median')]
+
+def test_new_failures_and_unknown_scenarios():
+    regressions = compare({'a': BASE, 'b': {'error': 'old'}},
+                          {'a': {'error': 'ValueError: x'}, 'b': {'error': 'old'}, 'c': BASE})
+    assert regressions == [('a', 'error', None, 'ValueError: x', None)]
+
+def test_exclusion_reason():
+    assert exclusion_reason(BASE) is None
+    assert exclusion_reason({'error': 'ValueError: x'}) == 'failed: ValueError: x'
+    assert exclusion_reason(result(max_relative_error=math.nan)).startswith('non-finite')
+    assert exclusion_reason(result(max_relative_error=1.0)).startswith('max_relative_error 1 >')
+
+def test_baseline_keeps_only_valid_scenarios(tmp_path):
+    path = tmp_path / 'baseline.json'
+    excluded = regression.save_baseline({'good': BASE, 'nan': result(max_relative_error=math.nan),
+                                         'wrong': result(max_relative_error=0.5)}, runs=3, path=path)
+    assert set(excluded) == {'nan', 'wrong'}
+    # NaN в файл не попадает: файл остаётся корректным JSON
+    assert json.loads(path.read_text())['runs'] == 3
+    assert regression.load_baseline(path) == ({'good': BASE}, excluded)
+
+def test_gate_skips_excluded_scenarios(monkeypatch):
+    measured = []
+    monkeypatch.setattr(regression, 'measure', lambda name, size, seed, runs: measured.append(name) or BASE)
+    gate = [('oriented_PPA', dict(n_suppliers=2, n_dcs=2, n_retailers=2), 0),
+            ('oriented_ACO', dict(n_suppliers=2, n_dcs=2, n_retailers=2), 0)]
+    results = regression.measure_gate(gate=gate, verbose=False, skip={regression.scenario_key(*gate[1])})
+    assert measured == ['oriented_PPA'] and list(results) == ['oriented_PPA/2x2x2:1.0:1.0/seed0']
+
+def test_measure_reports_median_and_mad():
+    size = dict(n_suppliers=3, n_dcs=2, n_retailers=4)
+    measured = regression.measure('non_oriented_DJA', size, 0, runs=3)
+    assert set(measured) == set(BASE) and measured['iterations'] is None
+    assert measured['time_median'] > 0 and measured['max_relative_error'] <= regression.VALID_ERROR
+    assert regression._mad([1.0, 2.0, 4.0]) == 1.0
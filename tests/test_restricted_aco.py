@@ -0,0 +1,64 @@
+import random
+import networkx as nx
+import numpy as np
+from compact_graph import CompactGraph
+from restricted_ACO import CapacityIndex, construct_path, init_feromones
+from restricted_graph import create_subgraphs
+
+# Поставщик 1, РЦ 10 и 11, магазины 100 (спрос 5) и 101 (спрос 3): к 101 ведут два пути
+DEMAND = {1: {100: 5, 101: 3}}
+
+
+def network():
+    G = nx.DiGraph()
+    G.add_node(1, type='supplier')
+    G.add_nodes_from([10, 11], type='dc')
+    G.add_nodes_from([100, 101], type='retail')
+    G.add_edges_from([(1, 10), (10, 100), (10, 101), (1, 11), (11, 101)])
+    G = CompactGraph.from_networkx(G)
+    np.random.seed(0)
+    return G, create_subgraphs(G, DEMAND)
+
+def potentials(G, index):
+    return {(u, v): index.potential[G.edge_id(u, v)] for u, v in [(1, 10), (10, 100), (10, 101), (1, 11), (11, 101)]}
+
+
+def test_potential_is_the_demand_reachable_through_the_edge():
+    G, graphs = network()
+    index = CapacityIndex(graphs)
+    assert potentials(G, index) == {(1, 10): 8, (10, 100): 5, (10, 101): 3, (1, 11): 3, (11, 101): 3}
+    feasible = index.feasible(4)
+    assert [G.node_ids[[G.src[e], G.dst[e]]].tolist() for e in np.flatnonzero(feasible)] == [[1, 10], [10, 100]]
+
+def test_commit_and_withdraw_flow():
+    G, graphs = network()
+    index = CapacityIndex(graphs)
+    path = [G.edge_id(1, 10), G.edge_id(10, 101)]
+    index.commit({101: path}, DEMAND[1])
+    assert index.flow[path].tolist() == [3, 3]
+    assert index.underloaded_edges(3).tolist() == sorted({G.edge_id(10, 100), G.edge_id(1, 11), G.edge_id(11, 101)})
+    index.commit({101: path}, DEMAND[1], sign=-1)
+    assert not index.flow.any()
+
+def test_removal_updates_potentials_of_affected_subgraphs():
+    G, graphs = network()
+    index = CapacityIndex(graphs)
+    assert index.remove_edges([G.edge_id(10, 100)]) == 1
+    assert not G.active[G.edge_id(10, 100)] and not graphs.edge_mask[0, G.edge_id(10, 100)]
+    assert potentials(G, index)[1, 10] == 3
+    assert index.remove_edges([]) == 0
+
+def test_ants_only_walk_feasible_edges():
+    G, graphs = network()
+    index = CapacityIndex(graphs)
+    allowed = graphs.edge_mask[0] & index.feasible(4)
+    init_feromones(graphs)
+    random.seed(0)
+    for _ in range(20):
+        path = construct_path(graphs, 0, G.index[1], G.index[100], allowed=allowed)
+        assert path == [G.edge_id(1, 10), G.edge_id(10, 100)]
+    assert construct_path(graphs, 0, G.index[1], G.index[101], allowed=allowed) is None
+
+def test_min_capacity_leaves_no_underloaded_edges(run_solver):
+    G = run_solver('restricted_ACO', min_capacity=2, max_iterations=5)
+    assert not (G.active & (G.edge_attrs['flow'] < 2)).any()
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from benchmark import effective_distance_func, EPSILON
+from non_oriented_DJA import dijkstra_algorithm
+from non_oriented_PPA import physarum_algorithm
+from result_cache import ResultCache, cached_solve, cache_keys
+
+
+# Решение через кэш на графе сценария: solve(cache, algorithm, demand_data=None, **kwargs) → G
+@pytest.fixture
+def solve(scenario):
+    def run(cache, algorithm, demand_data=None, **kwargs):
+        G = scenario.to_compact(directed=False)
+        np.random.seed(0)
+        cached_solve(G, cache, algorithm, scenario if demand_data is None else demand_data,
+                     effective_distance_func, EPSILON, **kwargs)
+        return G
+    return run
+
+
+def test_hit_returns_the_stored_solution(tmp_path, solve):
+    cache = ResultCache(str(tmp_path))
+    first = solve(cache, physarum_algorithm, max_iterations=20)
+    second = solve(cache, physarum_algorithm, max_iterations=20)
+    assert (first.stats['cache'], second.stats['cache']) == ('miss', 'hit')
+    np.testing.assert_array_equal(second.edge_attrs['flow'], first.edge_attrs['flow'])
+    np.testing.assert_array_equal(second.active, first.active)
+    assert second.stats['iterations'] == first.stats['iterations']
+
+def test_close_request_starts_warm(tmp_path, scenario, solve):
+    cache = ResultCache(str(tmp_path))
+    solve(cache, physarum_algorithm, max_iterations=20)
+    # другой спрос на той же сети — тёплый старт с сохранённых решений поставщиков
+    demand_data = {s: {r: 2 * v for r, v in row.items()} for s, row in scenario.demand_data.items()}
+    assert solve(cache, physarum_algorithm, demand_data, max_iterations=20).stats['cache'] == 'warm'
+    # явный init отключает тёплый старт; алгоритм без init всегда решает заново
+    assert solve(cache, physarum_algorithm, demand_data, init='shortest_path').stats['cache'] == 'miss'
+    assert solve(cache, dijkstra_algorithm).stats['cache'] == 'miss'
+    assert solve(cache, dijkstra_algorithm).stats['cache'] == 'hit'
+
+def test_keys(tmp_path, scenario):
+    G = scenario.to_compact(directed=False)
+    args = (G, physarum_algorithm, scenario, effective_distance_func, EPSILON)
+    base, key = cache_keys(*args)
+    # контрольная точка не меняет решение и в ключ не входит
+    assert cache_keys(*args, checkpoint=str(tmp_path / 'run.npz')) == (base, key)
+    other_base, other_key = cache_keys(*args, max_iterations=3)
+    assert other_base == base and other_key != key
+    assert cache_keys(G, dijkstra_algorithm, *args[2:])[0] != base
+    with pytest.raises(ValueError):
+        cache_keys(*args, time_limit=1.0)
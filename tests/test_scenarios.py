@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from demand import as_demand
+from scenarios import DEMAND_DISTRIBUTIONS, generate_scenario, preset
+
+
+def test_same_seed_gives_same_scenario():
+    a, b = (generate_scenario(20, 5, 50, supplier_density=0.4, retail_density=0.3, demand_density=0.5, seed=7)
+            for _ in range(2))
+    np.testing.assert_array_equal(a.src, b.src)
+    np.testing.assert_array_equal(a.dst, b.dst)
+    np.testing.assert_array_equal(a.demand, b.demand)
+    c = generate_scenario(20, 5, 50, supplier_density=0.4, retail_density=0.3, demand_density=0.5, seed=8)
+    assert not np.array_equal(a.demand, c.demand)
+
+def test_full_density_layers():
+    s = generate_scenario(3, 4, 5, seed=0)
+    assert s.n_edges == 3 * 4 + 4 * 3 + 4 * 5
+    assert s.suppliers_nodes_list == [1, 2, 3] and s.dc_nodes_list == [4, 5, 6, 7]
+    assert s.retail_nodes_list == [8, 9, 10, 11, 12]
+    assert generate_scenario(3, 4, 5, dc_mesh=False, seed=0).n_edges == 3 * 4 + 4 * 5
+
+def test_sparse_layers_keep_every_node_connected():
+    s = generate_scenario(30, 8, 200, supplier_density=0.05, retail_density=0.05, dc_mesh=False, seed=3)
+    supplier_edges = s.node_type[s.src] == 0
+    assert s.n_edges < 30 * 8 + 200 * 8
+    assert set(s.src[supplier_edges].tolist()) == set(range(30))
+    assert set(s.dst[~supplier_edges].tolist()) == set(range(38, 238))
+
+@pytest.mark.parametrize('demand', sorted(DEMAND_DISTRIBUTIONS))
+def test_demand_stays_within_bounds(demand):
+    s = generate_scenario(10, 3, 40, demand=demand, demand_low=5, demand_high=20, seed=0)
+    assert s.demand.shape == (10, 40)
+    if demand != 'poisson':
+        assert s.demand.min() >= 5 and s.demand.max() <= 20
+
+def test_demand_density_and_formats():
+    s = generate_scenario(10, 3, 40, demand_density=0.3, seed=2)
+    assert 0 < np.count_nonzero(s.demand) < s.demand.size
+    assert as_demand(s.demand_data).nnz == np.count_nonzero(s.demand)
+    suppliers, ptr, retail, volume = s.csr()
+    for k, supplier in enumerate(suppliers.tolist()):
+        row = dict(zip(retail[ptr[k]:ptr[k + 1]].tolist(), volume[ptr[k]:ptr[k + 1]].tolist()))
+        assert row == s.demand_data[supplier]
+
+def test_unknown_names_raise():
+    with pytest.raises(ValueError):
+        generate_scenario(2, 2, 2, demand='pareto')
+    with pytest.raises(ValueError):
+        preset('huge')
+
+def test_general_preset_ids_and_overrides():
+    s = preset('general')
+    assert s.supplier_ids[0] == 10001 and s.dc_ids[0] == 101 and s.retail_ids[0] == 1001
+    assert s.n_edges == 100 * 10 + 10 * 9 + 10 * 100
+    assert len(preset('general', n_retailers=7).retail_ids) == 7
+
+def test_graph_views_agree():
+    s = generate_scenario(4, 3, 6, seed=1)
+    directed, undirected = s.to_compact(), s.to_compact(directed=False)
+    assert directed.n_edges == s.n_edges
+    # пары РЦ в обе стороны сливаются в одно неориентированное ребро
+    assert undirected.n_edges == s.n_edges - 3
+    G = s.to_networkx()
+    assert G.number_of_edges() == s.n_edges and set(G.edges) == set(s.edgelist)
+    assert s.to_networkx(directed=False).number_of_edges() == undirected.n_edges
@@ -0,0 +1,42 @@
+import io
+import networkx as nx
+import tracing
+from benchmark import effective_distance_func
+from restricted_ACO import aco_algorithm
+from tracing import Tracer, DEBUG, INFO, WARNING
+
+
+def test_levels_sampling_and_capacity():
+    tr = Tracer(level=INFO, capacity=3, sample_every=2)
+    tr.debug('dropped')
+    for iteration in range(1, 6):
+        if tr.sampled(iteration):
+            tr.info('iteration', iteration=iteration)
+    tr.warning('warned', supplier=1)
+    tr.info('last')
+    assert [event[2] for event in tr.events()] == ['iteration', 'warned', 'last']
+    assert [event[2] for event in tr.events(WARNING)] == ['warned']
+    assert not tr.enabled(DEBUG)
+    out = io.StringIO()
+    tr.dump(out, WARNING)
+    assert out.getvalue().rstrip().endswith('WARNING warned supplier=1')
+
+def test_echo_prints_events(capsys):
+    Tracer(echo=True).warning('no_path', supplier=1, retail=2)
+    assert 'no_path supplier=1 retail=2' in capsys.readouterr().out
+
+
+# Поставщик без полного решения в restricted_ACO (в исходном коде print был закомментирован):
+# событие пишется уровнем INFO, а трассировщик по умолчанию ничего не печатает
+def test_no_solution_is_silent_by_default(capsys):
+    G = nx.DiGraph()
+    G.add_node(1, type='supplier')
+    G.add_node(10, type='dc')
+    G.add_nodes_from([100, 101], type='retail')
+    G.add_edges_from([(1, 10), (10, 100)])
+    demand_data = {1: {100: 5, 101: 3}}
+    with tracing.tracing(Tracer(level=INFO)) as tr:
+        aco_algorithm(G.copy(), demand_data, effective_distance_func, 0.1)
+    assert [event[3] for event in tr.events(INFO) if event[2] == 'no_solution'] == [{'supplier': 1}]
+    aco_algorithm(G.copy(), demand_data, effective_distance_func, 0.1)
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,71 @@
+import networkx as nx
+import numpy as np
+import general_graph
+from compact_graph import CompactGraph
+from oriented_graph import create_subgraphs
+from validation import validate_flows
+
+DEMAND = {1: {100: 3, 101: 2}}
+
+
+# Поставщик 1 → РЦ 10 → розничные точки 100 и 101; flows — поток рёбер в порядке добавления
+def network(flows, directed=True):
+    G = nx.DiGraph() if directed else nx.Graph()
+    G.add_node(1, type='supplier')
+    G.add_node(10, type='dc')
+    G.add_nodes_from([100, 101], type='retail')
+    G.add_edges_from([(1, 10), (10, 100), (10, 101)])
+    G = CompactGraph.from_networkx(G)
+    for (u, v), value in zip([(1, 10), (10, 100), (10, 101)], flows):
+        G.edge_attrs['flow'][G.edge_id(u, v)] = value
+    return G
+
+
+def test_balanced_flow_passes():
+    report = validate_flows(network([5, 3, 2]), DEMAND)
+    assert report.passed and report.max_relative_error == 0
+    assert report.mismatches() == {}
+    # поток округляется, как в прежней проверке
+    assert validate_flows(network([5.2, 2.9, 2.1]), DEMAND).passed
+
+def test_shortage_is_reported():
+    report = validate_flows(network([4, 2, 2]), DEMAND)
+    assert not report.passed
+    assert report.mismatches() == {1: -1.0, 100: -1.0}
+    np.testing.assert_allclose(report.supplier_error, 20)
+    np.testing.assert_allclose(report.consumer_error, 100 / 6)
+    np.testing.assert_allclose(report.max_relative_error, 1 / 3)
+    np.testing.assert_array_equal(report.retail_residual, [-1, 0])
+
+def test_inactive_edges_carry_no_flow():
+    G = network([5, 3, 2])
+    G.active[G.edge_id(10, 101)] = False
+    assert validate_flows(G, DEMAND).mismatches() == {101: -2.0}
+
+def test_missing_retail_node_counts_as_unserved():
+    report = validate_flows(network([5, 3, 2]), {1: {100: 3, 101: 2, 999: 4}})
+    assert report.mismatches() == {1: -4.0, 999: -4.0}
+
+def test_undirected_graph_sums_incident_flow():
+    G = network([5, 3, 2], directed=False)
+    assert validate_flows(G, DEMAND).passed
+    # без направления отгрузка поставщика — весь поток его рёбер, в том числе к точкам без спроса
+    assert validate_flows(G, {1: {100: 3}}).mismatches() == {1: 2.0}
+
+def test_networkx_graph_is_accepted():
+    G = network([4, 2, 2]).to_networkx()
+    assert validate_flows(G, DEMAND).mismatches() == {1: -1.0, 100: -1.0}
+
+def test_commodity_residual():
+    G = network([5, 3, 2])
+    graphs = create_subgraphs(G, DEMAND)
+    assert validate_flows(G, DEMAND).commodity_residual is None
+    graphs.flow[0] = G.edge_attrs['flow']
+    np.testing.assert_array_equal(validate_flows(G, DEMAND, graphs).commodity_residual, [0])
+    # поток строки теряется в РЦ: суммарные потоки графа при этом сходятся
+    graphs.flow[0, G.edge_id(1, 10)] = 7
+    np.testing.assert_array_equal(validate_flows(G, DEMAND, graphs).commodity_residual, [2])
+
+def test_check_prints_the_summary(capsys):
+    assert not general_graph.check(network([4, 2, 2]), DEMAND)
+    assert capsys.readouterr().out.startswith('Flow check failed with sum_supplier_error 20.000')
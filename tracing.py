@@ -0,0 +1,98 @@
+import collections
+import contextlib
+import sys
+import time
+import numpy as np
+
+# Уровни событий трассировки; OFF — трассировка выключена
+DEBUG, INFO, WARNING, OFF = 10, 20, 30, 100
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING'}
+
+
+# Структурная трассировка алгоритмов вместо print.
+# Событие — кортеж (время, уровень, имя, поля): поля хранятся как есть и форматируются только при выводе
+# (dump или echo), поэтому массивы передаются копиями, если алгоритм продолжит их менять.
+# События уровня ниже level отбрасываются, не строясь; события итераций (sampled) записываются
+# только на каждой sample_every-й итерации. Хранятся последние capacity событий (кольцевой буфер).
+# echo=True — событие сразу печатается в stdout (только для редких событий: предупреждения, отладка).
+# В горячих циклах дорогие поля строятся только под проверкой:
+#     if tr.enabled(DEBUG):
+#         tr.emit(DEBUG, 'edge_length', length=graphs.length.copy())
+class Tracer:
+    def __init__(self, level=INFO, capacity=10000, sample_every=1, echo=False):
+        self.level = level
+        self.sample_every = sample_every
+        self.echo = echo
+        self.buffer = collections.deque(maxlen=capacity)
+
+    def enabled(self, level):
+        return level >= self.level
+
+    # Записывать ли событие итерации iteration уровня level
+    def sampled(self, iteration, level=INFO):
+        return level >= self.level and iteration % self.sample_every == 0
+
+    def emit(self, level, name, **fields):
+        if level < self.level:
+            return
+        event = (time.time(), level, name, fields)
+        self.buffer.append(event)
+        if self.echo:
+            print(format_event(event))
+
+    def debug(self, name, **fields):
+        self.emit(DEBUG, name, **fields)
+
+    def info(self, name, **fields):
+        self.emit(INFO, name, **fields)
+
+    def warning(self, name, **fields):
+        self.emit(WARNING, name, **fields)
+
+    # События буфера (не старше чем level), от старых к новым
+    def events(self, level=DEBUG):
+        return [event for event in self.buffer if event[1] >= level]
+
+    def clear(self):
+        self.buffer.clear()
+
+    # Выводит события буфера строками в файл target (путь или открытый файл)
+    def dump(self, target, level=DEBUG):
+        if isinstance(target, str):
+            with open(target, 'w', encoding='utf-8') as f:
+                return self.dump(f, level)
+        for event in self.events(level):
+            target.write(format_event(event) + '\n')
+
+
+# Строка события: время, уровень, имя и поля key=value (массивы — списком значений)
+def format_event(event):
+    t, level, name, fields = event
+    parts = [time.strftime('%H:%M:%S', time.localtime(t)) + f".{int(t % 1 * 1000):03d}",
+             LEVEL_NAMES.get(level, str(level)), name]
+    for key, value in fields.items():
+        if isinstance(value, np.ndarray):
+            value = np.array2string(value, threshold=sys.maxsize, max_line_width=sys.maxsize, separator=',')
+        parts.append(f"{key}={value}")
+    return ' '.join(parts)
+
+
+# По умолчанию записываются и печатаются только предупреждения — события, которые исходный код печатал
+# (no_path в Dijkstra и A*, no_solution в non_oriented_ACO); сообщения, закомментированные в исходном коде,
+# пишутся уровнем INFO;
+# итерационные и отладочные события отбрасываются без форматирования
+_current = Tracer(level=WARNING, capacity=1000, echo=True)
+
+# Активный трассировщик
+def current():
+    return _current
+
+# Делает tracer активным на время блока with
+@contextlib.contextmanager
+def tracing(tracer):
+    global _current
+    previous, _current = _current, tracer
+    try:
+        yield tracer
+    finally:
+        _current = previous
@@ -0,0 +1,100 @@
+import numpy as np
+from compact_graph import CompactGraph
+from demand import as_demand
+
+
+# Результат проверки сохранения потока.
+# supplier_ids / supplier_expected / supplier_actual — поставщики, их спрос и отгрузка;
+# retail_ids / retail_expected / retail_actual — розничные точки, спрос к ним и поступление;
+# residual = actual - expected. supplier_error и consumer_error — средняя относительная ошибка в процентах
+# по округлённым потокам (как в прежнем general_graph.check), max_relative_error — наибольшая из них.
+# commodity_residual — для каждого поставщика наибольший по узлам дисбаланс его собственного потока
+# (только если переданы подграфы), иначе None.
+class ValidationReport:
+    def __init__(self, supplier_ids, supplier_expected, supplier_actual,
+                 retail_ids, retail_expected, retail_actual, commodity_residual=None):
+        self.supplier_ids = supplier_ids
+        self.supplier_expected = supplier_expected
+        self.supplier_actual = supplier_actual
+        self.retail_ids = retail_ids
+        self.retail_expected = retail_expected
+        self.retail_actual = retail_actual
+        self.commodity_residual = commodity_residual
+        supplier_rel = _relative(supplier_expected, supplier_actual)
+        retail_rel = _relative(retail_expected, retail_actual)
+        self.supplier_error = supplier_rel.mean() * 100 if len(supplier_rel) else 0.0
+        self.consumer_error = retail_rel.mean() * 100 if len(retail_rel) else 0.0
+        self.max_relative_error = float(max(supplier_rel.max(initial=0), retail_rel.max(initial=0)))
+
+    @property
+    def supplier_residual(self):
+        return self.supplier_actual - self.supplier_expected
+
+    @property
+    def retail_residual(self):
+        return self.retail_actual - self.retail_expected
+
+    @property
+    def passed(self):
+        return self.supplier_error + self.consumer_error == 0
+
+    # Узлы с ненулевой ошибкой после округления: {идентификатор: остаток}
+    def mismatches(self):
+        result = {}
+        for ids, expected, actual in ((self.supplier_ids, self.supplier_expected, self.supplier_actual),
+                                      (self.retail_ids, self.retail_expected, self.retail_actual)):
+            bad = np.round(actual) != expected
+            result.update(zip(ids[bad].tolist(), (actual - expected)[bad].tolist()))
+        return result
+
+    def summary(self):
+        return (f"sum_supplier_error {self.supplier_error:.3f} and sum_consumer_error {self.consumer_error:.3f}"
+                f" (max relative error {self.max_relative_error:.3f})")
+
+# Относительная ошибка округлённого потока; при нулевом ожидании — абсолютная
+def _relative(expected, actual):
+    diff = np.abs(np.round(actual) - expected)
+    return np.where(expected > 0, diff / np.where(expected > 0, expected, 1), diff)
+
+
+# Проверка сохранения потока по потокам графа и явно переданному спросу.
+# Отгрузка поставщика — сумма потоков активных рёбер, выходящих из него, поступление в розничную точку —
+# сумма потоков входящих рёбер. В неориентированном графе направление потока по ребру не хранится,
+# поэтому и отгрузка, и поступление узла — сумма потоков всех инцидентных ему рёбер: поток, проходящий
+# через поставщика или розничную точку транзитом (или идущий к поставщику), засчитывается дважды
+# и отражается в ошибке. Исходная проверка check() брала порядок концов ребра в networkx, который
+# в неориентированном графе произволен, поэтому направление supplier → retail здесь не восстанавливается.
+# Суммы считаются через bincount по концам рёбер, без обхода графа в Python.
+# graphs — подграфы (SubgraphBundle) с построчными потоками: тогда дополнительно для каждого поставщика
+# проверяется сохранение его собственного потока в каждом узле (приток − отток = правая часть rhs).
+def validate_flows(G, demand_data, graphs=None):
+    if not isinstance(G, CompactGraph):
+        G = CompactGraph.from_networkx(G)
+    demand_data = as_demand(demand_data)
+    flow = np.where(G.active, G.edge_attrs['flow'], 0)
+    outflow = np.bincount(G.src, weights=flow, minlength=G.n_nodes)
+    inflow = np.bincount(G.dst, weights=flow, minlength=G.n_nodes)
+    if not G.directed:
+        outflow = inflow = outflow + inflow
+
+    supplier_ids = np.asarray(demand_data.suppliers)
+    s = G.indices(supplier_ids)
+    supplier_actual = np.where(s >= 0, outflow[np.maximum(s, 0)], 0)
+
+    retail_ids, retail_expected = demand_data.retail_totals
+    r = G.indices(retail_ids)
+    retail_actual = np.where(r >= 0, inflow[np.maximum(r, 0)], 0)
+
+    commodity = None
+    if graphs is not None:
+        # приток − отток каждого узла для каждой строки подграфов: суммы по инцидентности узла,
+        # поток ребра берётся со знаком + в его конце dst и со знаком − в начале src
+        ptr, inc_edges, inc_nbrs = G.incidence()
+        sign = np.where(G.dst[inc_edges] == inc_nbrs, -1.0, 1.0)
+        cumulative = np.zeros((len(graphs), len(inc_edges) + 1))
+        np.cumsum(graphs.flow[:, inc_edges] * sign, axis=1, out=cumulative[:, 1:])
+        balance = cumulative[:, ptr[1:]] - cumulative[:, ptr[:-1]]
+        commodity = np.abs(np.where(graphs.node_mask, balance - graphs.rhs, 0)).max(axis=1, initial=0)
+
+    return ValidationReport(supplier_ids, demand_data.supplier_totals, supplier_actual,
+                            retail_ids, retail_expected, retail_actual, commodity)